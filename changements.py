@@ -0,0 +1,69 @@
+"""
+Bus de notification des changements publiés par les managers de db.py
+"""
+
+import threading
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+INSERTION = "insert"
+MODIFICATION = "update"
+SUPPRESSION = "delete"
+
+
+class Changement(NamedTuple):
+    """Modification validée d'une table.
+
+    ids contient les ids des lignes de la table, sauf pour group_members et
+    presences où ce sont les ids des membres concernés. parent_id est l'id du
+    groupe (group_members, messages) ou de l'événement (presences), None sinon.
+    """
+    table: str
+    operation: str
+    ids: Tuple[int, ...]
+    parent_id: Optional[int] = None
+
+
+class BusChangements:
+    """Diffuse les changements aux abonnés, dans le thread qui a écrit.
+
+    Les abonnés Qt passent par changements_qt.PontChangements pour être
+    appelés dans le thread de l'interface.
+    """
+
+    def __init__(self):
+        self._abonnes: List[Callable[[Changement], None]] = []
+        self._verrou = threading.Lock()
+
+    def abonner(self, rappel: Callable[[Changement], None]) -> Callable[[], None]:
+        """Enregistre rappel; retourne la fonction de désabonnement"""
+        with self._verrou:
+            self._abonnes.append(rappel)
+        return lambda: self.desabonner(rappel)
+
+    def desabonner(self, rappel: Callable[[Changement], None]):
+        with self._verrou:
+            if rappel in self._abonnes:
+                self._abonnes.remove(rappel)
+
+    def publier(self, changements: Iterable[Changement]):
+        with self._verrou:
+            abonnes = list(self._abonnes)
+        for changement in changements:
+            for rappel in abonnes:
+                try:
+                    rappel(changement)
+                except Exception as e:
+                    # Un abonné défaillant ne doit pas faire échouer l'écriture
+                    print(f"Erreur abonné changements: {e}")
+
+
+def fusionner(changements: Iterable[Changement]) -> List[Changement]:
+    """Regroupe les changements de même (table, operation, parent_id), ordre conservé"""
+    groupes = {}
+    for c in changements:
+        cle = (c.table, c.operation, c.parent_id)
+        groupes.setdefault(cle, []).extend(c.ids)
+    return [
+        Changement(table, operation, tuple(dict.fromkeys(ids)), parent_id)
+        for (table, operation, parent_id), ids in groupes.items()
+    ]
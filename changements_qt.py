@@ -0,0 +1,28 @@
+"""
+Pont entre le bus de changements (db.py) et les signaux Qt des pages
+"""
+
+from PySide6.QtCore import QObject, Signal
+
+
+class PontChangements(QObject):
+    """Réémet chaque changement du bus comme signal Qt.
+
+    Le pont vit dans le thread de l'interface: un changement publié depuis un
+    autre thread est livré aux pages par la boucle d'événements Qt.
+    """
+    changement = Signal(object)
+
+    def __init__(self, bus, parent=None):
+        super().__init__(parent)
+        self._desabonner = bus.abonner(self.changement.emit)
+        self.destroyed.connect(self._desabonner)
+
+
+def obtenir_pont(db) -> PontChangements:
+    """Pont unique par DBManager, créé au premier appel (depuis le thread de l'interface)"""
+    pont = getattr(db, '_pont_qt', None)
+    if pont is None:
+        pont = PontChangements(db.bus)
+        db._pont_qt = pont
+    return pont
@@ -1,10 +1,17 @@
 import os
+import re
 import sqlite3
+import atexit
 from pathlib import Path
 from datetime import datetime, date, timedelta
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Iterable, Iterator
 from functools import lru_cache
+from contextlib import contextmanager
+from collections import OrderedDict
 import threading
+import weakref
+
+from changements import BusChangements, Changement, INSERTION, MODIFICATION, SUPPRESSION, fusionner
 
 APP_NAME = "PerspectiVo"
 
@@ -28,18 +35,946 @@ def get_app_db_path() -> Path:
     return app_folder / "perspectivo.db"
 
 
+# --- Dates --------------------------------------------------------------------
+# Les dates sont aussi stockées en entier (jours depuis le 1970-01-01, heures en
+# minutes depuis minuit), calculés ici à l'écriture: les filtres par période et
+# les séries temporelles deviennent des parcours d'index en SQL.
+
+_EPOQUE = date(1970, 1, 1).toordinal()
+_RE_DATE_ISO = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+_RE_DATE_FR = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+_RE_HEURE = re.compile(r"(\d{1,2})[:hH](\d{2})")
+
+
+def jour_depuis_texte(texte: Optional[str]) -> Optional[int]:
+    """'2024-09-01', '2024-09-01 10:00:00', '2024-09-01T10:00:00.5' ou '01/09/2024' -> jours; None si illisible"""
+    if not texte:
+        return None
+    texte = texte.strip()
+    m = _RE_DATE_ISO.match(texte)
+    if m:
+        annee, mois, jour = (int(x) for x in m.groups())
+    else:
+        m = _RE_DATE_FR.match(texte)
+        if not m:
+            return None
+        jour, mois, annee = (int(x) for x in m.groups())
+    try:
+        return date(annee, mois, jour).toordinal() - _EPOQUE
+    except ValueError:
+        return None
+
+
+def jour_depuis_date(d: date) -> int:
+    return d.toordinal() - _EPOQUE
+
+
+def date_depuis_jour(jour: int) -> date:
+    return date.fromordinal(jour + _EPOQUE)
+
+
+def minutes_depuis_heure(texte: Optional[str]) -> Optional[int]:
+    """'18:30', '18:30:00' ou '18h30' -> 1110; None si illisible"""
+    if not texte:
+        return None
+    m = _RE_HEURE.match(texte.strip())
+    if not m:
+        return None
+    heures, minutes = int(m.group(1)), int(m.group(2))
+    if heures > 23 or minutes > 59:
+        return None
+    return heures * 60 + minutes
+
+
+# --- Migrations ---------------------------------------------------------------
+# Chaque migration reçoit un curseur déjà dans une transaction. La version du
+# schéma (PRAGMA user_version) correspond au nombre de migrations appliquées:
+# ne jamais réordonner ni modifier une migration publiée, en ajouter une nouvelle.
+
+def _migration_index_requetes(cur):
+    """Index pour les chemins d'accès chauds (présences, groupes, événements, messages)"""
+    # Couvrant pour calculer_taux_presence: (member_id, present) + date
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_presences_member ON presences(member_id, present, date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_presences_event ON presences(event_id, present)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_presences_date ON presences(date)")
+    # group_members(group_id, ...) est déjà couvert par l'index UNIQUE(group_id, member_id)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_group_members_member ON group_members(member_id, group_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_date ON events(date, heure)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_groupe ON events(groupe_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_groupe ON messages(groupe_id, sent_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_sent_at ON messages(sent_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_members_nom ON members(nom, prenoms)")
+
+
+def _reconstruire_resumes(cur):
+    """Recalcule les résumés de présence depuis la table presences"""
+    cur.execute("DELETE FROM member_attendance_summary")
+    cur.execute("""
+        INSERT INTO member_attendance_summary (member_id, present_count, total_count, last_presence_date)
+        SELECT member_id, SUM(present = 1), COUNT(*), MAX(CASE WHEN present = 1 THEN date END)
+        FROM presences
+        GROUP BY member_id
+    """)
+    cur.execute("DELETE FROM event_attendance_summary")
+    cur.execute("""
+        INSERT INTO event_attendance_summary (event_id, present_count, total_count, last_presence_date)
+        SELECT event_id, SUM(present = 1), COUNT(*), MAX(CASE WHEN present = 1 THEN date END)
+        FROM presences
+        WHERE event_id IS NOT NULL
+        GROUP BY event_id
+    """)
+
+
+def _sql_resume_presence(table: str, cle: str) -> List[str]:
+    """Triggers qui maintiennent {table} (compteurs par {cle}) à jour depuis presences"""
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_ai AFTER INSERT ON presences
+        WHEN NEW.{cle} IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO {table} ({cle}) VALUES (NEW.{cle});
+            UPDATE {table} SET
+                total_count = total_count + 1,
+                present_count = present_count + (NEW.present = 1),
+                last_presence_date = CASE
+                    WHEN NEW.present = 1 AND (last_presence_date IS NULL OR NEW.date > last_presence_date)
+                    THEN NEW.date ELSE last_presence_date END
+            WHERE {cle} = NEW.{cle};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_ad AFTER DELETE ON presences
+        WHEN OLD.{cle} IS NOT NULL
+        BEGIN
+            UPDATE {table} SET
+                total_count = total_count - 1,
+                present_count = present_count - (OLD.present = 1),
+                last_presence_date = CASE
+                    WHEN OLD.present = 1 AND OLD.date = last_presence_date
+                    THEN (SELECT MAX(date) FROM presences WHERE {cle} = OLD.{cle} AND present = 1)
+                    ELSE last_presence_date END
+            WHERE {cle} = OLD.{cle};
+            DELETE FROM {table} WHERE {cle} = OLD.{cle} AND total_count <= 0;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_au AFTER UPDATE OF {cle}, present, date ON presences
+        BEGIN
+            UPDATE {table} SET
+                total_count = total_count - 1,
+                present_count = present_count - (OLD.present = 1)
+            WHERE {cle} = OLD.{cle};
+            INSERT OR IGNORE INTO {table} ({cle}) SELECT NEW.{cle} WHERE NEW.{cle} IS NOT NULL;
+            UPDATE {table} SET
+                total_count = total_count + 1,
+                present_count = present_count + (NEW.present = 1)
+            WHERE {cle} = NEW.{cle};
+            UPDATE {table} SET last_presence_date = (
+                SELECT MAX(p.date) FROM presences p WHERE p.{cle} = {table}.{cle} AND p.present = 1
+            )
+            WHERE {cle} IN (OLD.{cle}, NEW.{cle});
+            DELETE FROM {table} WHERE {cle} = OLD.{cle} AND total_count <= 0;
+        END
+        """,
+    ]
+
+
+def _migration_resumes_presence(cur):
+    """Tables de résumé des présences par membre et par événement, tenues à jour par triggers"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS member_attendance_summary (
+            member_id INTEGER PRIMARY KEY,
+            present_count INTEGER NOT NULL DEFAULT 0,
+            total_count INTEGER NOT NULL DEFAULT 0,
+            last_presence_date TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS event_attendance_summary (
+            event_id INTEGER PRIMARY KEY,
+            present_count INTEGER NOT NULL DEFAULT 0,
+            total_count INTEGER NOT NULL DEFAULT 0,
+            last_presence_date TEXT
+        )
+    """)
+    for sql in _sql_resume_presence("member_attendance_summary", "member_id"):
+        cur.execute(sql)
+    for sql in _sql_resume_presence("event_attendance_summary", "event_id"):
+        cur.execute(sql)
+    # Les clés étrangères ne sont pas appliquées: nettoyer à la suppression du parent
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_members_ad_summary AFTER DELETE ON members
+        BEGIN
+            DELETE FROM member_attendance_summary WHERE member_id = OLD.id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_events_ad_summary AFTER DELETE ON events
+        BEGIN
+            DELETE FROM event_attendance_summary WHERE event_id = OLD.id;
+        END
+    """)
+    _reconstruire_resumes(cur)
+
+
+def _migration_prenoms_non_nuls(cur):
+    """prenoms NULL -> '' pour que la pagination par clé (nom, prenoms, id) soit totale"""
+    cur.execute("UPDATE members SET prenoms = '' WHERE prenoms IS NULL")
+
+
+COLONNES_RECHERCHE = ("nom", "prenoms", "email", "contact", "ecole", "filiere", "residence")
+
+
+def _migration_recherche_fts(cur):
+    """Index plein texte des membres (FTS5), synchronisé par triggers"""
+    colonnes = ", ".join(COLONNES_RECHERCHE)
+    nouvelles = ", ".join(f"NEW.{c}" for c in COLONNES_RECHERCHE)
+    anciennes = ", ".join(f"OLD.{c}" for c in COLONNES_RECHERCHE)
+    try:
+        # remove_diacritics: "Gnahoré" est trouvé par "gnahore"; prefix: index des préfixes courts
+        cur.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5(
+                {colonnes},
+                content='members', content_rowid='id',
+                tokenize="unicode61 remove_diacritics 2",
+                prefix='2 3'
+            )
+        """)
+    except sqlite3.OperationalError:
+        # SQLite compilé sans FTS5: rechercher_membres se rabat sur LIKE
+        return
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_members_fts_ai AFTER INSERT ON members BEGIN
+            INSERT INTO members_fts (rowid, {colonnes}) VALUES (NEW.id, {nouvelles});
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_members_fts_ad AFTER DELETE ON members BEGIN
+            INSERT INTO members_fts (members_fts, rowid, {colonnes}) VALUES ('delete', OLD.id, {anciennes});
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_members_fts_au AFTER UPDATE ON members BEGIN
+            INSERT INTO members_fts (members_fts, rowid, {colonnes}) VALUES ('delete', OLD.id, {anciennes});
+            INSERT INTO members_fts (rowid, {colonnes}) VALUES (NEW.id, {nouvelles});
+        END
+    """)
+    cur.execute("INSERT INTO members_fts (members_fts) VALUES ('rebuild')")
+
+
+def _migration_dates_entieres(cur):
+    """Colonnes entières indexées pour les dates d'inscription et d'événement"""
+    cur.execute("ALTER TABLE members ADD COLUMN inscription_jour INTEGER")
+    cur.execute("ALTER TABLE events ADD COLUMN date_jour INTEGER")
+    cur.execute("ALTER TABLE events ADD COLUMN heure_minutes INTEGER")
+
+    cur.execute("SELECT id, date_inscription FROM members")
+    cur.executemany("UPDATE members SET inscription_jour = ? WHERE id = ?",
+                    [(jour_depuis_texte(texte), i) for i, texte in cur.fetchall()])
+    cur.execute("SELECT id, date, heure FROM events")
+    cur.executemany("UPDATE events SET date_jour = ?, heure_minutes = ? WHERE id = ?",
+                    [(jour_depuis_texte(d), minutes_depuis_heure(h), i) for i, d, h in cur.fetchall()])
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_members_inscription_jour ON members(inscription_jour)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_date_jour ON events(date_jour, heure_minutes)")
+
+
+def _migration_resumes_archives(cur):
+    """Compteurs des présences déplacées dans la base d'archive (voir db_archive)"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS member_attendance_archive (
+            member_id INTEGER NOT NULL,
+            annee INTEGER NOT NULL,
+            present_count INTEGER NOT NULL DEFAULT 0,
+            total_count INTEGER NOT NULL DEFAULT 0,
+            last_presence_date TEXT,
+            PRIMARY KEY (member_id, annee)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS event_attendance_archive (
+            event_id INTEGER PRIMARY KEY,
+            present_count INTEGER NOT NULL DEFAULT 0,
+            total_count INTEGER NOT NULL DEFAULT 0,
+            last_presence_date TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_members_ad_archive AFTER DELETE ON members
+        BEGIN
+            DELETE FROM member_attendance_archive WHERE member_id = OLD.id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_events_ad_archive AFTER DELETE ON events
+        BEGIN
+            DELETE FROM event_attendance_archive WHERE event_id = OLD.id;
+        END
+    """)
+
+
+# Tables synchronisées entre postes (voir db_sync), dans l'ordre des dépendances
+TABLES_SYNC = ("groups", "members", "events", "presences")
+
+# Identifiant aléatoire au format UUID v4, calculé par SQLite
+_SQL_UUID = (
+    "lower(hex(randomblob(4))) || '-' || lower(hex(randomblob(2))) || '-4' || "
+    "substr(lower(hex(randomblob(2))), 2) || '-' || substr('89ab', 1 + (abs(random()) % 4), 1) || "
+    "substr(lower(hex(randomblob(2))), 2) || '-' || lower(hex(randomblob(6)))"
+)
+
+# Version d'une modification: horodatage UTC à la milliseconde + poste d'origine
+_SQL_MAINTENANT = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+_SQL_APPAREIL = "(SELECT valeur FROM sync_meta WHERE cle = 'appareil')"
+
+# Pendant l'application de changements reçus, db_sync écrit lui-même le journal
+_SQL_SAISIE_LOCALE = "NOT EXISTS (SELECT 1 FROM sync_meta WHERE cle = 'application_distante')"
+
+# Pendant un archivage (db_archive), les présences quittent la base sans être supprimées
+_SQL_HORS_ARCHIVAGE = "NOT EXISTS (SELECT 1 FROM sync_meta WHERE cle = 'archivage')"
+
+
+def _sql_journal(table: str, uuid: str, operation: str) -> str:
+    return f"""
+        INSERT OR REPLACE INTO change_log (table_name, uuid, operation, modifie_le, appareil)
+        VALUES ('{table}', {uuid}, '{operation}', {_SQL_MAINTENANT}, {_SQL_APPAREIL});
+    """
+
+
+def _migration_synchronisation(cur):
+    """Identifiants globaux (uuid) et journal des changements pour la synchronisation"""
+    cur.execute("CREATE TABLE IF NOT EXISTS sync_meta (cle TEXT PRIMARY KEY, valeur TEXT)")
+    cur.execute(f"INSERT OR IGNORE INTO sync_meta (cle, valeur) VALUES ('appareil', {_SQL_UUID})")
+    # Une ligne par (table, uuid): seule la dernière version de chaque ligne est gardée,
+    # le journal grandit avec le nombre de lignes modifiées, pas de modifications
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            uuid TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            modifie_le TEXT NOT NULL,
+            appareil TEXT NOT NULL,
+            UNIQUE (table_name, uuid)
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_change_log_appareil ON change_log(appareil, seq)")
+
+    colonnes_donnees = {}
+    for table in TABLES_SYNC:
+        cur.execute(f"PRAGMA table_info({table})")
+        colonnes_donnees[table] = [r[1] for r in cur.fetchall() if r[1] != "id"]
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN uuid TEXT")
+        cur.execute(f"UPDATE {table} SET uuid = {_SQL_UUID}")
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_uuid ON {table}(uuid)")
+        # Les lignes existantes partent à la première synchronisation
+        cur.execute(f"""
+            INSERT OR IGNORE INTO change_log (table_name, uuid, operation, modifie_le, appareil)
+            SELECT '{table}', uuid, 'upsert', {_SQL_MAINTENANT}, {_SQL_APPAREIL} FROM {table}
+        """)
+
+    for table in TABLES_SYNC:
+        # uuid attribué par trigger (ALTER TABLE n'accepte pas de valeur par défaut calculée);
+        # le trigger de mise à jour ne porte que sur les colonnes de données
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_ai AFTER INSERT ON {table}
+            WHEN {_SQL_SAISIE_LOCALE}
+            BEGIN
+                UPDATE {table} SET uuid = {_SQL_UUID} WHERE id = NEW.id AND uuid IS NULL;
+                {_sql_journal(table, f"(SELECT uuid FROM {table} WHERE id = NEW.id)", "upsert")}
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_au
+            AFTER UPDATE OF {", ".join(colonnes_donnees[table])} ON {table}
+            WHEN {_SQL_SAISIE_LOCALE} AND NEW.uuid IS NOT NULL
+            BEGIN
+                {_sql_journal(table, "NEW.uuid", "upsert")}
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_ad AFTER DELETE ON {table}
+            WHEN {_SQL_SAISIE_LOCALE} AND OLD.uuid IS NOT NULL
+            BEGIN
+                {_sql_journal(table, "OLD.uuid", "delete")}
+            END
+        """)
+
+    # Appartenances: identifiées par 'uuid du groupe:uuid du membre'
+    cle_appartenance = (
+        "(SELECT uuid FROM groups WHERE id = {0}.group_id) || ':' || "
+        "(SELECT uuid FROM members WHERE id = {0}.member_id)"
+    )
+    cur.execute(f"""
+        INSERT OR IGNORE INTO change_log (table_name, uuid, operation, modifie_le, appareil)
+        SELECT 'group_members', {cle_appartenance.format('gm')}, 'upsert', {_SQL_MAINTENANT}, {_SQL_APPAREIL}
+        FROM group_members gm WHERE {cle_appartenance.format('gm')} IS NOT NULL
+    """)
+    for evenement, ligne, operation in (("INSERT", "NEW", "upsert"), ("DELETE", "OLD", "delete")):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_group_members_sync_a{evenement[0].lower()}
+            AFTER {evenement} ON group_members
+            WHEN {_SQL_SAISIE_LOCALE} AND {cle_appartenance.format(ligne)} IS NOT NULL
+            BEGIN
+                {_sql_journal("group_members", cle_appartenance.format(ligne), operation)}
+            END
+        """)
+
+    # L'index plein texte n'a pas à être réécrit quand seul l'uuid change
+    colonnes = ", ".join(COLONNES_RECHERCHE)
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'trg_members_fts_au'")
+    if cur.fetchone():
+        nouvelles = ", ".join(f"NEW.{c}" for c in COLONNES_RECHERCHE)
+        anciennes = ", ".join(f"OLD.{c}" for c in COLONNES_RECHERCHE)
+        cur.execute("DROP TRIGGER trg_members_fts_au")
+        cur.execute(f"""
+            CREATE TRIGGER trg_members_fts_au AFTER UPDATE OF {colonnes} ON members BEGIN
+                INSERT INTO members_fts (members_fts, rowid, {colonnes}) VALUES ('delete', OLD.id, {anciennes});
+                INSERT INTO members_fts (rowid, {colonnes}) VALUES (NEW.id, {nouvelles});
+            END
+        """)
+
+
+def _migration_departs_membres(cur):
+    """Membres supprimés (jour d'inscription et jour de départ) pour l'évolution des effectifs"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS member_departures (
+            id INTEGER PRIMARY KEY,
+            member_id INTEGER NOT NULL,
+            inscription_jour INTEGER,
+            depart_jour INTEGER NOT NULL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_member_departures_depart ON member_departures(depart_jour)")
+    # Jour local, comme date_inscription (datetime.now())
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_members_ad_depart AFTER DELETE ON members
+        BEGIN
+            INSERT INTO member_departures (member_id, inscription_jour, depart_jour)
+            VALUES (OLD.id, OLD.inscription_jour,
+                    CAST(julianday('now', 'localtime') - 2440587.5 AS INTEGER));
+        END
+    """)
+
+
+def _migration_archivage_hors_journal(cur):
+    """Les présences déplacées vers l'archive ne sont pas journalisées comme suppressions"""
+    # Sinon la synchronisation supprimerait l'historique des autres postes, qui n'ont pas l'archive
+    cur.execute("DROP TRIGGER IF EXISTS trg_presences_sync_ad")
+    cur.execute(f"""
+        CREATE TRIGGER trg_presences_sync_ad AFTER DELETE ON presences
+        WHEN {_SQL_SAISIE_LOCALE} AND {_SQL_HORS_ARCHIVAGE} AND OLD.uuid IS NOT NULL
+        BEGIN
+            {_sql_journal("presences", "OLD.uuid", "delete")}
+        END
+    """)
+
+
+MIGRATIONS = [
+    _migration_index_requetes,
+    _migration_resumes_presence,
+    _migration_prenoms_non_nuls,
+    _migration_recherche_fts,
+    _migration_dates_entieres,
+    _migration_resumes_archives,
+    _migration_synchronisation,
+    _migration_departs_membres,
+    _migration_archivage_hors_journal,
+]
+
+# Nombre maximal d'ids par clause IN (...)
+TAILLE_LOT_IN = 900
+
+# Taille par défaut des lots lus avec fetchmany
+TAILLE_LOT_LECTURE = 500
+
+
+def _iter_lots(cur: sqlite3.Cursor, batch_size: int) -> Iterator[Any]:
+    """Parcourt le résultat de cur par lots de batch_size lignes"""
+    while True:
+        lignes = cur.fetchmany(batch_size)
+        if not lignes:
+            return
+        yield from lignes
+
+
+# --- Enregistrements -------------------------------------------------------------
+# Lignes compactes (__slots__) construites directement par la row factory du
+# curseur, sans passer par sqlite3.Row puis dict. L'accès de type dict
+# (m['nom'], m.get('ecole')) est conservé pour les pages existantes.
+# Les SELECT listent les colonnes explicitement, dans l'ordre de COLONNES:
+# c'est aussi l'ordre des tuples renvoyés en mode tuples=True.
+
+class Enregistrement:
+    __slots__ = ()
+    COLONNES: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fabrique = staticmethod(lambda _cur, ligne: cls(*ligne))
+
+    @classmethod
+    def colonnes_sql(cls, alias: str = "") -> str:
+        """Liste de colonnes pour un SELECT, préfixée par alias si donné"""
+        prefixe = f"{alias}." if alias else ""
+        return ", ".join(prefixe + c for c in cls.COLONNES)
+
+    def __getitem__(self, cle: str):
+        if cle not in self.COLONNES:
+            raise KeyError(cle)
+        return getattr(self, cle)
+
+    def __setitem__(self, cle: str, valeur):
+        if cle not in self.COLONNES:
+            raise KeyError(cle)
+        setattr(self, cle, valeur)
+
+    def __contains__(self, cle) -> bool:
+        return cle in self.COLONNES
+
+    def __iter__(self):
+        return iter(self.COLONNES)
+
+    def __len__(self) -> int:
+        return len(self.COLONNES)
+
+    def __eq__(self, autre) -> bool:
+        if type(autre) is not type(self):
+            return NotImplemented
+        return self.en_tuple() == autre.en_tuple()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        champs = ", ".join(f"{c}={getattr(self, c)!r}" for c in self.COLONNES)
+        return f"{type(self).__name__}({champs})"
+
+    def get(self, cle: str, defaut=None):
+        return getattr(self, cle) if cle in self.COLONNES else defaut
+
+    def keys(self) -> List[str]:
+        return list(self.COLONNES)
+
+    def en_tuple(self) -> tuple:
+        return tuple(getattr(self, c) for c in self.COLONNES)
+
+    def en_dict(self) -> Dict[str, Any]:
+        return {c: getattr(self, c) for c in self.COLONNES}
+
+
+class Member(Enregistrement):
+    COLONNES = ("id", "nom", "prenoms", "contact", "email", "residence", "ecole", "filiere",
+                "date_inscription", "created_at", "inscription_jour")
+    __slots__ = COLONNES
+
+    def __init__(self, id, nom, prenoms, contact, email, residence, ecole, filiere,
+                 date_inscription, created_at, inscription_jour=None):
+        self.id = id
+        self.nom = nom
+        self.prenoms = prenoms
+        self.contact = contact
+        self.email = email
+        self.residence = residence
+        self.ecole = ecole
+        self.filiere = filiere
+        self.date_inscription = date_inscription
+        self.created_at = created_at
+        self.inscription_jour = inscription_jour
+
+
+class Event(Enregistrement):
+    COLONNES = ("id", "nom", "date", "heure", "lieu", "description", "groupe_id", "created_at",
+                "date_jour", "heure_minutes")
+    __slots__ = COLONNES
+
+    def __init__(self, id, nom, date, heure, lieu, description, groupe_id, created_at,
+                 date_jour=None, heure_minutes=None):
+        self.id = id
+        self.nom = nom
+        self.date = date
+        self.heure = heure
+        self.lieu = lieu
+        self.description = description
+        self.groupe_id = groupe_id
+        self.created_at = created_at
+        self.date_jour = date_jour
+        self.heure_minutes = heure_minutes
+
+
+class Group(Enregistrement):
+    # Les trois dernières colonnes sont des agrégats, voir obtenir_groupes_agreges()
+    COLONNES = ("id", "nom", "description", "couleur", "created_at",
+                "nombre_membres", "assiduite", "nombre_evenements")
+    __slots__ = COLONNES
+
+    def __init__(self, id, nom, description, couleur, created_at,
+                 nombre_membres=0, assiduite=0.0, nombre_evenements=0):
+        self.id = id
+        self.nom = nom
+        self.description = description
+        self.couleur = couleur
+        self.created_at = created_at
+        self.nombre_membres = nombre_membres
+        self.assiduite = assiduite
+        self.nombre_evenements = nombre_evenements
+
+
+class Presence(Enregistrement):
+    COLONNES = ("id", "member_id", "event_id", "date", "present", "created_at")
+    __slots__ = COLONNES
+
+    def __init__(self, id, member_id, event_id, date, present, created_at):
+        self.id = id
+        self.member_id = member_id
+        self.event_id = event_id
+        self.date = date
+        self.present = present
+        self.created_at = created_at
+
+
+COLONNES_MEMBRE = Member.colonnes_sql()
+COLONNES_EVENEMENT = Event.colonnes_sql()
+COLONNES_PRESENCE = Presence.colonnes_sql()
+
+
+class CacheTaux:
+    """Cache LRU borné des taux de présence, une entrée par membre.
+
+    Chaque entrée porte le data_version au moment du calcul: une écriture
+    validée par un autre processus rend donc toutes les entrées caduques.
+    Les écritures de l'application n'invalident que le membre concerné, via
+    invalider().
+    """
+
+    def __init__(self, taille_max: int = 5000):
+        self.taille_max = taille_max
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0  # incrémenté à chaque invalidation
+        self._entrees: "OrderedDict[int, Tuple[float, int]]" = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def lire(self, member_id: int, version: int) -> Optional[float]:
+        with self._verrou:
+            entree = self._entrees.get(member_id)
+            if entree is None or entree[1] != version:
+                self.misses += 1
+                return None
+            self._entrees.move_to_end(member_id)
+            self.hits += 1
+            return entree[0]
+
+    def ecrire(self, member_id: int, taux: float, version: int, generation: int):
+        self.ecrire_plusieurs({member_id: taux}, version, generation)
+
+    def ecrire_plusieurs(self, taux: Dict[int, float], version: int, generation: int):
+        with self._verrou:
+            # Une invalidation a eu lieu pendant le calcul: la valeur est peut-être déjà périmée
+            if generation != self.generation:
+                return
+            for member_id, valeur in taux.items():
+                self._entrees[member_id] = (valeur, version)
+                self._entrees.move_to_end(member_id)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def invalider(self, member_id: int):
+        with self._verrou:
+            self.generation += 1
+            self._entrees.pop(member_id, None)
+
+    def vider(self):
+        with self._verrou:
+            self.generation += 1
+            self._entrees.clear()
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'taille': len(self._entrees),
+                'taille_max': self.taille_max,
+                'hits': self.hits,
+                'misses': self.misses,
+                'taux_succes': (self.hits / total) if total else 0.0,
+            }
+
+
+class _PorteurConnexion:
+    """Connexion de lecture rangée dans le threading.local d'un thread.
+
+    Quand le thread se termine, son threading.local est libéré et la
+    connexion est fermée par le finalizer.
+    """
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        weakref.finalize(self, conn.close)
+
+
+class PoolConnexions:
+    """Une connexion d'écriture partagée + une connexion de lecture par thread.
+
+    La base passe en mode WAL: les lecteurs voient le dernier état validé
+    sans bloquer l'écrivain et sans être bloqués par lui.
+    """
+
+    def __init__(self, db_path: Path, timeout: float = 5.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.verrou_ecriture = threading.RLock()
+        self._local = threading.local()
+        self._porteurs = weakref.WeakSet()
+        self._verrou_porteurs = threading.Lock()
+
+        self.ecrivain = self._ouvrir()
+        self.ecrivain.execute("PRAGMA journal_mode = WAL")
+        # Sûr en WAL: seule une coupure de courant peut perdre la dernière transaction
+        self.ecrivain.execute("PRAGMA synchronous = NORMAL")
+
+    def _ouvrir(self, lecture_seule: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # Même lecture des dates texte en SQL qu'en Python (voir db_colonnes._SQL_JOUR)
+        conn.create_function("jour_depuis_texte", 1, jour_depuis_texte, deterministic=True)
+        if lecture_seule:
+            conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def lecteur(self) -> sqlite3.Connection:
+        """Connexion de lecture propre au thread appelant (créée au premier appel)"""
+        porteur = getattr(self._local, 'porteur', None)
+        if porteur is None:
+            porteur = _PorteurConnexion(self._ouvrir(lecture_seule=True))
+            self._local.porteur = porteur
+            with self._verrou_porteurs:
+                self._porteurs.add(porteur)
+        return porteur.conn
+
+    def data_version(self) -> int:
+        """Change à chaque commit d'une autre connexion que l'écrivain (autre processus)
+
+        Lu sur l'écrivain sans prendre verrou_ecriture: la connexion est en mode
+        sérialisé et le PRAGMA n'ouvre ni ne termine de transaction.
+        """
+        return self.ecrivain.execute("PRAGMA data_version").fetchone()[0]
+
+    def fermer(self):
+        with self._verrou_porteurs:
+            porteurs = list(self._porteurs)
+            self._porteurs.clear()
+        for porteur in porteurs:
+            porteur.conn.close()
+        with self.verrou_ecriture:
+            self.ecrivain.close()
+
+
 class DBManager:
     def __init__(self, db_path: Optional[Path] = None):
         self.db_path = db_path or get_app_db_path()
-        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        self.pool = PoolConnexions(self.db_path)
+        self.conn = self.pool.ecrivain
+        self.cache_taux = CacheTaux()
+        self._profondeur_transaction = 0
+        self._thread_transaction = None
+        self._taux_a_invalider = set()
+        self.bus = BusChangements()
+        self._changements_en_attente: List[Changement] = []
+        self._instantane = threading.local()  # connexion de instantane_lecture(), par thread
+        self.profileur = None
+        if os.environ.get("PERSPECTIVO_PROFIL"):
+            self.activer_profil()
         self._init_schema()
+        self.fts_disponible = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'members_fts'"
+        ).fetchone() is not None
+
+    def activer_profil(self, **options):
+        """Mesure les requêtes passées par cursor() et lecture() (voir db_profiler).
+
+        Activé au démarrage par la variable d'environnement PERSPECTIVO_PROFIL=1;
+        les requêtes lentes et les motifs N+1 vont dans requetes_lentes.log.
+        """
+        from db_profiler import ProfileurRequetes
+
+        if self.profileur is None:
+            self.profileur = ProfileurRequetes(Path(self.db_path).parent / "requetes_lentes.log", **options)
+        return self.profileur
+
+    def _curseur(self, conn: sqlite3.Connection) -> sqlite3.Cursor:
+        if self.profileur is not None:
+            return conn.cursor(self.profileur.fabrique)
+        return conn.cursor()
 
     def cursor(self):
-        return self.conn.cursor()
+        """Curseur sur la connexion d'écriture (INSERT/UPDATE/DELETE), dans un bloc transaction().
+
+        La connexion d'écriture est partagée entre les threads: seul le bloc
+        transaction() tient le verrou d'écriture de l'exécution jusqu'au commit.
+        """
+        if not self._profondeur_transaction or self._thread_transaction != threading.get_ident():
+            raise RuntimeError("Écriture hors d'un bloc transaction() du thread courant")
+        return self._curseur(self.conn)
+
+    def lecture(self, type_ligne: Optional[type] = None, tuples: bool = False):
+        """Curseur sur la connexion de lecture du thread courant (SELECT)
+
+        type_ligne: classe d'Enregistrement construite pour chaque ligne;
+        tuples=True: tuples bruts (le plus léger, pour les traitements en masse).
+        Sinon sqlite3.Row.
+        """
+        if self._profondeur_transaction and self._thread_transaction == threading.get_ident():
+            # Voir ses propres écritures non encore validées
+            cur = self._curseur(self.conn)
+        else:
+            cur = self._curseur(getattr(self._instantane, 'conn', None) or self.pool.lecteur())
+        if tuples:
+            cur.row_factory = None
+        elif type_ligne is not None:
+            cur.row_factory = type_ligne.fabrique
+        return cur
+
+    @contextmanager
+    def instantane_lecture(self):
+        """Lectures cohérentes entre elles pour tout le bloc.
+
+        Dans le bloc, lecture() du thread courant utilise une connexion dédiée
+        ouverte dans une seule transaction de lecture: en WAL, toutes les
+        requêtes voient la base telle qu'elle était à l'entrée, sans bloquer
+        les écritures des autres threads. Un bloc imbriqué réutilise l'instantané.
+        """
+        if self.en_instantane():
+            yield self
+            return
+        conn = self.pool._ouvrir(lecture_seule=True)
+        try:
+            conn.execute("BEGIN")
+            # La première lecture fixe l'instantané
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            self._instantane.conn = conn
+            yield self
+        finally:
+            self._instantane.conn = None
+            conn.rollback()
+            conn.close()
+
+    def en_instantane(self) -> bool:
+        return getattr(self._instantane, 'conn', None) is not None
 
     def commit(self):
-        self.conn.commit()
+        with self.pool.verrou_ecriture:
+            # Dans une transaction(), c'est la sortie du bloc qui valide
+            if not self._profondeur_transaction:
+                self.conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """Unité de travail: un seul commit (et un seul fsync) pour tout le bloc.
+
+        Les commit() des managers appelés dans le bloc sont suspendus. Les
+        blocs imbriqués deviennent des SAVEPOINT: une exception n'annule que
+        le bloc concerné. Le verrou d'écriture est tenu pendant tout le bloc.
+        Les changements publiés dans le bloc sont diffusés après le commit.
+        """
+        a_diffuser = []
+        with self.pool.verrou_ecriture:
+            profondeur = self._profondeur_transaction
+            cur = self.conn.cursor()
+            if profondeur == 0:
+                if self.conn.in_transaction:
+                    self.conn.commit()
+                cur.execute("BEGIN")
+                self._thread_transaction = threading.get_ident()
+            else:
+                cur.execute(f"SAVEPOINT sp_{profondeur}")
+            marque = len(self._changements_en_attente)
+            self._profondeur_transaction += 1
+            try:
+                yield self
+            except BaseException:
+                self._profondeur_transaction -= 1
+                del self._changements_en_attente[marque:]
+                if profondeur == 0:
+                    self.conn.rollback()
+                    self._fin_transaction()
+                else:
+                    cur.execute(f"ROLLBACK TO sp_{profondeur}")
+                    cur.execute(f"RELEASE sp_{profondeur}")
+                raise
+            else:
+                self._profondeur_transaction -= 1
+                if profondeur == 0:
+                    try:
+                        self.conn.commit()
+                    except BaseException:
+                        self._changements_en_attente.clear()
+                        raise
+                    finally:
+                        a_diffuser = self._fin_transaction()
+                else:
+                    cur.execute(f"RELEASE sp_{profondeur}")
+        if a_diffuser:
+            # Hors du verrou: les abonnés peuvent relire la base
+            self.bus.publier(a_diffuser)
+
+    def _fin_transaction(self) -> List[Changement]:
+        """Termine la transaction; retourne les changements validés à diffuser"""
+        self._thread_transaction = None
+        taux, self._taux_a_invalider = self._taux_a_invalider, set()
+        for member_id in taux:
+            self.cache_taux.invalider(member_id)
+        changements, self._changements_en_attente = self._changements_en_attente, []
+        return fusionner(changements)
+
+    def publier(self, table: str, operation: str, ids: Iterable[int], parent_id: Optional[int] = None):
+        """Annonce un changement validé; dans une transaction, à la sortie du bloc"""
+        changement = Changement(table, operation, tuple(ids), parent_id)
+        if not changement.ids:
+            return
+        if self._profondeur_transaction and self._thread_transaction == threading.get_ident():
+            self._changements_en_attente.append(changement)
+        else:
+            self.bus.publier([changement])
+
+    def invalider_taux(self, member_ids: Iterable[int]):
+        """Invalide le cache de taux; dans une transaction, une seconde fois à la sortie"""
+        member_ids = set(member_ids)
+        for member_id in member_ids:
+            self.cache_taux.invalider(member_id)
+        if self._profondeur_transaction:
+            # Une valeur calculée avant le commit (ou annulée par rollback) ne doit pas survivre
+            self._taux_a_invalider.update(member_ids)
+
+    def fermer(self):
+        with self.pool.verrou_ecriture:
+            try:
+                # Met à jour les statistiques du planificateur si nécessaire (peu coûteux)
+                self.conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+        executeur = getattr(self, '_executeur', None)  # voir db_async
+        if executeur is not None:
+            executeur.arreter()
+        if self.profileur is not None:
+            self.profileur.ecrire_rapport()
+            self.profileur.fermer()
+        self.pool.fermer()
+
+    def data_version(self) -> int:
+        """Change à chaque modification validée par un autre processus.
+
+        Les écritures de l'application ne le changent pas: elles invalident
+        précisément (invalider_taux, bus de changements). Ne prend pas le
+        verrou d'écriture: pas d'attente derrière une transaction() en cours.
+        """
+        return self.pool.data_version()
+
+    def instantane_colonnes(self, presences: bool = True, groupes: bool = True):
+        """Instantané NumPy (membres, présences, groupes) pour les statistiques, voir db_colonnes"""
+        # Import local: numpy n'est nécessaire que pour les statistiques
+        from db_colonnes import charger_instantane
+        return charger_instantane(self, presences=presences, groupes=groupes)
 
     def _init_schema(self):
         cur = self.conn.cursor()
@@ -132,137 +1067,393 @@ class DBManager:
         );
         """)
         self.conn.commit()
+        self._appliquer_migrations()
+
+    def version_schema(self) -> int:
+        cur = self.conn.cursor()
+        cur.execute("PRAGMA user_version")
+        return cur.fetchone()[0]
+
+    def _appliquer_migrations(self):
+        """Met à niveau le fichier en place, une migration par transaction"""
+        version = self.version_schema()
+        if version >= len(MIGRATIONS):
+            return
+
+        cur = self.conn.cursor()
+        for numero, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            try:
+                cur.execute("BEGIN")
+                migration(cur)
+                # user_version est transactionnel: rollback => version inchangée
+                cur.execute(f"PRAGMA user_version = {numero}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+        # Statistiques pour le planificateur après création d'index
+        cur.execute("ANALYZE")
+        self.conn.commit()
     
+    def reconstruire_resumes_presence(self):
+        """Reconstruit member/event_attendance_summary (après import ou réparation manuelle)"""
+        with self.transaction():
+            _reconstruire_resumes(self.conn.cursor())
+        self.clear_caches()
+
     def clear_caches(self):
-        """Efface tous les caches - appeler après modification"""
-        for manager in getattr(self, '_managers', []):
-            if hasattr(manager, '_cache_taux'):
-                manager._cache_taux.clear()
+        """Efface tous les caches - appeler après une modification en masse hors managers"""
+        self.cache_taux.vider()
 
 
 class MembresManager:
     def __init__(self, db: DBManager):
         self.db = db
-        self._cache_taux = {}  # Cache pour taux_presence
+        self._cache_taux = db.cache_taux  # Partagé avec PresencesManager pour l'invalidation
 
     def ajouter_membre(self, nom: str, prenoms: str = "", contact: str = "", residence: str = "",
                        email: str = "", ecole: str = "", filiere: str = "") -> int:
-        cur = self.db.cursor()
-        cur.execute("""
-            INSERT INTO members (nom, prenoms, contact, email, residence, ecole, filiere, date_inscription)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (nom, prenoms, contact, email, residence, ecole, filiere, datetime.now().isoformat()))
-        self.db.commit()
-        self._cache_taux.clear()
+        maintenant = datetime.now()
+        with self.db.transaction():
+            cur = self.db.cursor()
+            cur.execute("""
+                INSERT INTO members (nom, prenoms, contact, email, residence, ecole, filiere,
+                                     date_inscription, inscription_jour)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (nom, prenoms or "", contact, email, residence, ecole, filiere,
+                  maintenant.isoformat(), jour_depuis_date(maintenant.date())))
+            self.db.publier("members", INSERTION, [cur.lastrowid])
         return cur.lastrowid
 
-    def obtenir_tous_membres(self) -> List[Dict[str, Any]]:
-        cur = self.db.cursor()
-        cur.execute("SELECT * FROM members ORDER BY nom, prenoms")
-        return [dict(r) for r in cur.fetchall()]
+    def ajouter_membres_bulk(self, membres: Iterable[Dict[str, Any]]) -> int:
+        """Ajoute plusieurs membres (dicts avec les champs d'ajouter_membre) en une transaction"""
+        maintenant = datetime.now().isoformat()
+        lignes = []
+        for m in membres:
+            date_inscription = m.get('date_inscription') or maintenant
+            lignes.append((m['nom'], m.get('prenoms') or "", m.get('contact', ""), m.get('email', ""),
+                           m.get('residence', ""), m.get('ecole', ""), m.get('filiere', ""),
+                           date_inscription, jour_depuis_texte(date_inscription)))
+        if not lignes:
+            return 0
+        with self.db.transaction():
+            cur = self.db.cursor()
+            cur.executemany("""
+                INSERT INTO members (nom, prenoms, contact, email, residence, ecole, filiere,
+                                     date_inscription, inscription_jour)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, lignes)
+            # Ids consécutifs: AUTOINCREMENT et verrou d'écriture tenu pendant tout le bloc
+            dernier = cur.execute("SELECT last_insert_rowid()").fetchone()[0]
+            self.db.publier("members", INSERTION, range(dernier - len(lignes) + 1, dernier + 1))
+        return len(lignes)
 
-    def obtenir_membre(self, member_id: int) -> Optional[Dict[str, Any]]:
-        cur = self.db.cursor()
-        cur.execute("SELECT * FROM members WHERE id = ?", (member_id,))
-        r = cur.fetchone()
-        return dict(r) if r else None
+    def obtenir_tous_membres(self) -> List[Member]:
+        cur = self.db.lecture(Member)
+        cur.execute(f"SELECT {COLONNES_MEMBRE} FROM members ORDER BY nom, prenoms")
+        return cur.fetchall()
+
+    def iter_membres(self, batch_size: int = TAILLE_LOT_LECTURE,
+                     tuples: bool = False) -> Iterator[Member]:
+        """Comme obtenir_tous_membres, sans tout charger en mémoire.
+
+        tuples=True: tuples dans l'ordre de Member.COLONNES.
+        """
+        cur = self.db.lecture(Member, tuples)
+        cur.execute(f"SELECT {COLONNES_MEMBRE} FROM members ORDER BY nom, prenoms, id")
+        yield from _iter_lots(cur, batch_size)
+
+    def obtenir_membres_page(self, after: Optional[Tuple[str, str, int]] = None,
+                             limit: int = 200) -> List[Member]:
+        """Page suivante triée par (nom, prenoms, id), après la clé `after` du dernier membre reçu"""
+        cur = self.db.lecture(Member)
+        if after is None:
+            cur.execute(f"SELECT {COLONNES_MEMBRE} FROM members ORDER BY nom, prenoms, id LIMIT ?",
+                        (limit,))
+        else:
+            nom, prenoms, member_id = after
+            cur.execute(f"""
+                SELECT {COLONNES_MEMBRE} FROM members
+                WHERE (nom, prenoms, id) > (?, ?, ?)
+                ORDER BY nom, prenoms, id
+                LIMIT ?
+            """, (nom, prenoms or "", member_id, limit))
+        return cur.fetchall()
+
+    def rechercher_membres(self, query: str, limit: Optional[int] = 50) -> List[Member]:
+        """Recherche par préfixe, insensible à la casse et aux accents, sur tous les champs texte.
+
+        Chaque mot saisi doit correspondre au début d'un mot d'un des champs
+        (nom, prénoms, email, contact, école, filière, résidence).
+        """
+        termes = re.findall(r"\w+", query)
+        if not termes:
+            return []
+        limit = -1 if limit is None else limit
+        cur = self.db.lecture(Member)
+        if self.db.fts_disponible:
+            expression = " ".join(f'"{t}"*' for t in termes)
+            cur.execute(f"""
+                SELECT {Member.colonnes_sql("m")} FROM members_fts f
+                JOIN members m ON m.id = f.rowid
+                WHERE members_fts MATCH ?
+                ORDER BY f.rank
+                LIMIT ?
+            """, (expression, limit))
+        else:
+            condition = " OR ".join(f"{c} LIKE ?" for c in COLONNES_RECHERCHE)
+            where = " AND ".join(f"({condition})" for _ in termes)
+            params = [f"%{t}%" for t in termes for _ in COLONNES_RECHERCHE]
+            cur.execute(f"SELECT {COLONNES_MEMBRE} FROM members WHERE {where} ORDER BY nom, prenoms LIMIT ?",
+                        params + [limit])
+        return cur.fetchall()
+
+    @staticmethod
+    def cle_page(membre: Member) -> Tuple[str, str, int]:
+        """Clé à passer comme `after` pour obtenir la page suivant ce membre"""
+        return membre['nom'], membre['prenoms'] or "", membre['id']
+
+    def obtenir_membre(self, member_id: int) -> Optional[Member]:
+        cur = self.db.lecture(Member)
+        cur.execute(f"SELECT {COLONNES_MEMBRE} FROM members WHERE id = ?", (member_id,))
+        return cur.fetchone()
 
     def supprimer_membre(self, member_id: int):
-        cur = self.db.cursor()
-        cur.execute("DELETE FROM members WHERE id = ?", (member_id,))
-        self.db.commit()
-        self._cache_taux.clear()
+        with self.db.transaction():
+            self.db.cursor().execute("DELETE FROM members WHERE id = ?", (member_id,))
+            self.db.invalider_taux([member_id])
+            self.db.publier("members", SUPPRESSION, [member_id])
 
     def modifier_membre(self, member_id: int, **fields):
         if not fields:
             return
+        if 'prenoms' in fields:
+            fields['prenoms'] = fields['prenoms'] or ""
+        if 'date_inscription' in fields:
+            fields['inscription_jour'] = jour_depuis_texte(fields['date_inscription'])
         keys = ", ".join(f"{k}=?" for k in fields.keys())
         vals = list(fields.values()) + [member_id]
-        cur = self.db.cursor()
-        cur.execute(f"UPDATE members SET {keys} WHERE id = ?", vals)
-        self.db.commit()
-        self._cache_taux.clear()
+        with self.db.transaction():
+            self.db.cursor().execute(f"UPDATE members SET {keys} WHERE id = ?", vals)
+            self.db.publier("members", MODIFICATION, [member_id])
+
+    def obtenir_membres_filtres(self, inscrits_apres: Optional[int] = None,
+                                group_id: Optional[int] = None) -> List[Member]:
+        """Membres inscrits strictement après le jour inscrits_apres et/ou membres du groupe"""
+        conditions, params = [], []
+        if inscrits_apres is not None:
+            # Date illisible (inscription_jour NULL): exclu dès qu'une période est demandée
+            conditions.append("inscription_jour > ?")
+            params.append(inscrits_apres)
+        if group_id is not None:
+            conditions.append("id IN (SELECT member_id FROM group_members WHERE group_id = ?)")
+            params.append(group_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cur = self.db.lecture(Member)
+        cur.execute(f"SELECT {COLONNES_MEMBRE} FROM members {where} ORDER BY nom, prenoms", params)
+        return cur.fetchall()
+
+    def compter_inscriptions_par_jour(self) -> List[Tuple[int, int]]:
+        """(jour, nombre d'inscriptions) par jour croissant, dates illisibles exclues"""
+        cur = self.db.lecture()
+        cur.execute("""
+            SELECT inscription_jour, COUNT(*) FROM members
+            WHERE inscription_jour IS NOT NULL
+            GROUP BY inscription_jour ORDER BY inscription_jour
+        """)
+        return [tuple(r) for r in cur.fetchall()]
+
+    def compter_departs_par_jour(self) -> List[Tuple[int, int, int]]:
+        """(jour, inscriptions, départs) des membres supprimés, par jour croissant.
 
-    def obtenir_membres_du_groupe(self, group_id: int) -> List[Dict[str, Any]]:
-        cur = self.db.cursor()
+        Les membres sans date d'inscription lisible sont ignorés, comme dans
+        compter_inscriptions_par_jour.
+        """
+        cur = self.db.lecture()
         cur.execute("""
-            SELECT m.* FROM members m
+            SELECT jour, SUM(inscription), SUM(depart) FROM (
+                SELECT inscription_jour AS jour, 1 AS inscription, 0 AS depart FROM member_departures
+                WHERE inscription_jour IS NOT NULL
+                UNION ALL
+                SELECT depart_jour, 0, 1 FROM member_departures
+                WHERE inscription_jour IS NOT NULL
+            )
+            GROUP BY jour ORDER BY jour
+        """)
+        return [tuple(r) for r in cur.fetchall()]
+
+    def obtenir_membres_du_groupe(self, group_id: int) -> List[Member]:
+        cur = self.db.lecture(Member)
+        cur.execute(f"""
+            SELECT {Member.colonnes_sql("m")} FROM members m
             JOIN group_members gm ON gm.member_id = m.id
             WHERE gm.group_id = ?
             ORDER BY m.nom, m.prenoms
         """, (group_id,))
-        return [dict(r) for r in cur.fetchall()]
+        return cur.fetchall()
 
     def calculer_taux_presence(self, member_id: int) -> float:
         """Retourne le taux de présence avec cache"""
-        if member_id in self._cache_taux:
-            return self._cache_taux[member_id]
+        # Dans un instantané, le cache (état courant) pourrait ne pas concorder
+        avec_cache = not self.db.en_instantane()
+        version = self.db.data_version()
+        result = self._cache_taux.lire(member_id, version) if avec_cache else None
+        if result is not None:
+            return result
+        generation = self._cache_taux.generation
         
-        cur = self.db.cursor()
-        cur.execute("SELECT COUNT(*) FROM presences WHERE member_id = ?", (member_id,))
-        total = cur.fetchone()[0] or 0
+        cur = self.db.lecture()
+        cur.execute("""
+            SELECT present_count, total_count FROM member_attendance_summary WHERE member_id = ?
+        """, (member_id,))
+        r = cur.fetchone()
         
-        if total == 0:
+        if not r or not r[1]:
             result = 0.0
         else:
-            cur.execute("SELECT COUNT(*) FROM presences WHERE member_id = ? AND present = 1", (member_id,))
-            present = cur.fetchone()[0] or 0
-            result = round((present / total) * 100, 2)
+            result = round((r[0] / r[1]) * 100, 2)
         
-        self._cache_taux[member_id] = result
+        if avec_cache:
+            self._cache_taux.ecrire(member_id, result, version, generation)
         return result
 
+    def calculer_taux_presence_bulk(self, member_ids: Optional[List[int]] = None) -> Dict[int, float]:
+        """Taux de présence de tous les membres (ou de member_ids) en une seule requête"""
+        version = self.db.data_version()
+        generation = self._cache_taux.generation
+        cur = self.db.lecture()
+        if member_ids is None:
+            cur.execute("""
+                SELECT m.id, s.total_count, s.present_count FROM members m
+                LEFT JOIN member_attendance_summary s ON s.member_id = m.id
+            """)
+            lignes = cur.fetchall()
+            taux = {r[0]: 0.0 for r in lignes}
+        else:
+            taux = {mid: 0.0 for mid in member_ids}
+            ids = list(taux)
+            lignes = []
+            # Rester sous la limite de variables SQLite (999 sur les anciennes versions)
+            for i in range(0, len(ids), TAILLE_LOT_IN):
+                lot = ids[i:i + TAILLE_LOT_IN]
+                cur.execute(f"""
+                    SELECT member_id, total_count, present_count FROM member_attendance_summary
+                    WHERE member_id IN ({", ".join("?" * len(lot))})
+                """, lot)
+                lignes.extend(cur.fetchall())
+
+        for member_id, total, present in lignes:
+            if member_id in taux and total:
+                taux[member_id] = round(((present or 0) / total) * 100, 2)
+
+        if not self.db.en_instantane():
+            # Valeurs d'un instantané: peut-être déjà dépassées, ne pas les mettre en cache
+            self._cache_taux.ecrire_plusieurs(taux, version, generation)
+        return taux
+
 
 class GroupesManager:
     def __init__(self, db: DBManager):
         self.db = db
 
     def ajouter_groupe(self, nom: str, description: str = "", couleur: str = "") -> int:
-        cur = self.db.cursor()
-        cur.execute("INSERT INTO groups (nom, description, couleur) VALUES (?, ?, ?)", 
-                   (nom, description, couleur))
-        self.db.commit()
+        with self.db.transaction():
+            cur = self.db.cursor()
+            cur.execute("INSERT INTO groups (nom, description, couleur) VALUES (?, ?, ?)", 
+                       (nom, description, couleur))
+            self.db.publier("groups", INSERTION, [cur.lastrowid])
         return cur.lastrowid
 
-    def obtenir_tous_groupes(self) -> List[Dict[str, Any]]:
-        cur = self.db.cursor()
-        cur.execute("SELECT * FROM groups ORDER BY nom")
-        groupes = [dict(r) for r in cur.fetchall()]
-        
-        # CORRIGÉ: Ajouter le nombre de membres pour chaque groupe
-        for g in groupes:
-            cur.execute("SELECT COUNT(*) FROM group_members WHERE group_id = ?", (g['id'],))
-            g['nombre_membres'] = cur.fetchone()[0] or 0
-        
-        return groupes
+    # Agrégats par groupe en une requête: nombre de membres, assiduité moyenne
+    # (taux de présence des membres, 0 pour un membre sans présence, comme
+    # calculer_taux_presence) et nombre d'événements rattachés.
+    _SQL_GROUPES_AGREGES = """
+        WITH par_groupe AS (
+            SELECT gm.group_id,
+                   COUNT(*) AS nombre_membres,
+                   AVG(CASE WHEN s.total_count > 0
+                            THEN ROUND(100.0 * s.present_count / s.total_count, 2)
+                            ELSE 0 END) AS assiduite
+            FROM group_members gm
+            JOIN members m ON m.id = gm.member_id
+            LEFT JOIN member_attendance_summary s ON s.member_id = gm.member_id
+            GROUP BY gm.group_id
+        ),
+        evenements_groupe AS (
+            SELECT groupe_id, COUNT(*) AS nombre_evenements
+            FROM events WHERE groupe_id IS NOT NULL
+            GROUP BY groupe_id
+        )
+        SELECT g.id, g.nom, g.description, g.couleur, g.created_at,
+               COALESCE(pg.nombre_membres, 0),
+               COALESCE(pg.assiduite, 0.0),
+               COALESCE(eg.nombre_evenements, 0)
+        FROM groups g
+        LEFT JOIN par_groupe pg ON pg.group_id = g.id
+        LEFT JOIN evenements_groupe eg ON eg.groupe_id = g.id
+    """
 
-    def obtenir_groupe(self, group_id: int) -> Optional[Dict[str, Any]]:
-        cur = self.db.cursor()
-        cur.execute("SELECT * FROM groups WHERE id = ?", (group_id,))
-        r = cur.fetchone()
-        if not r:
-            return None
-        
-        groupe = dict(r)
-        cur.execute("SELECT COUNT(*) FROM group_members WHERE group_id = ?", (group_id,))
-        groupe['nombre_membres'] = cur.fetchone()[0] or 0
-        return groupe
+    def obtenir_groupes_agreges(self) -> List[Group]:
+        """Tous les groupes avec nombre_membres, assiduite et nombre_evenements"""
+        cur = self.db.lecture(Group)
+        cur.execute(self._SQL_GROUPES_AGREGES + " ORDER BY g.nom")
+        return cur.fetchall()
+
+    def obtenir_tous_groupes(self) -> List[Group]:
+        return self.obtenir_groupes_agreges()
+
+    def obtenir_groupe(self, group_id: int) -> Optional[Group]:
+        cur = self.db.lecture(Group)
+        cur.execute(self._SQL_GROUPES_AGREGES + " WHERE g.id = ?", (group_id,))
+        return cur.fetchone()
 
     def ajouter_membre_au_groupe(self, group_id: int, member_id: int):
         """CORRIGÉ: paramètres dans le bon ordre"""
-        cur = self.db.cursor()
         try:
-            cur.execute("INSERT INTO group_members (group_id, member_id) VALUES (?, ?)", 
-                       (group_id, member_id))
-            self.db.commit()
+            with self.db.transaction():
+                self.db.cursor().execute("INSERT INTO group_members (group_id, member_id) VALUES (?, ?)", 
+                                         (group_id, member_id))
+                self.db.publier("group_members", INSERTION, [member_id], group_id)
         except sqlite3.IntegrityError:
-            pass  # déjà membre
+            return  # déjà membre
+
+    def _membres_deja_dans_groupe(self, cur: sqlite3.Cursor, group_id: int) -> set:
+        cur.execute("SELECT member_id FROM group_members WHERE group_id = ?", (group_id,))
+        return {r[0] for r in cur.fetchall()}
+
+    def ajouter_membres_au_groupe_bulk(self, group_id: int, member_ids: Iterable[int]) -> int:
+        """Ajoute plusieurs membres au groupe en une transaction (les doublons sont ignorés)"""
+        lignes = [(group_id, member_id) for member_id in member_ids]
+        if not lignes:
+            return 0
+        with self.db.transaction():
+            cur = self.db.cursor()
+            deja = self._membres_deja_dans_groupe(cur, group_id)
+            cur.executemany("INSERT OR IGNORE INTO group_members (group_id, member_id) VALUES (?, ?)", lignes)
+            self.db.publier("group_members", INSERTION,
+                            [m for _, m in lignes if m not in deja], group_id)
+            return cur.rowcount
+
+    def retirer_membres_du_groupe_bulk(self, group_id: int, member_ids: Iterable[int]) -> int:
+        lignes = [(group_id, member_id) for member_id in member_ids]
+        if not lignes:
+            return 0
+        with self.db.transaction():
+            cur = self.db.cursor()
+            deja = self._membres_deja_dans_groupe(cur, group_id)
+            cur.executemany("DELETE FROM group_members WHERE group_id = ? AND member_id = ?", lignes)
+            self.db.publier("group_members", SUPPRESSION,
+                            [m for _, m in lignes if m in deja], group_id)
+            return cur.rowcount
 
     def retirer_membre_du_groupe(self, group_id: int, member_id: int):
-        cur = self.db.cursor()
-        cur.execute("DELETE FROM group_members WHERE group_id = ? AND member_id = ?", 
-                   (group_id, member_id))
-        self.db.commit()
+        with self.db.transaction():
+            cur = self.db.cursor()
+            cur.execute("DELETE FROM group_members WHERE group_id = ? AND member_id = ?", 
+                       (group_id, member_id))
+            if cur.rowcount:
+                self.db.publier("group_members", SUPPRESSION, [member_id], group_id)
 
     def modifier_groupe(self, groupe_id: int, **fields):
         """CORRIGÉ: met à jour la table 'groups' pas 'members'"""
@@ -270,16 +1461,16 @@ class GroupesManager:
             return
         keys = ", ".join(f"{k}=?" for k in fields.keys())
         vals = list(fields.values()) + [groupe_id]
-        cur = self.db.cursor()
-        cur.execute(f"UPDATE groups SET {keys} WHERE id = ?", vals)
-        self.db.commit()
+        with self.db.transaction():
+            self.db.cursor().execute(f"UPDATE groups SET {keys} WHERE id = ?", vals)
+            self.db.publier("groups", MODIFICATION, [groupe_id])
     
     def supprimer_groupe(self, group_id: int) -> bool:
         """CORRIGÉ: méthode manquante"""
         try:
-            cur = self.db.cursor()
-            cur.execute("DELETE FROM groups WHERE id = ?", (group_id,))
-            self.db.commit()
+            with self.db.transaction():
+                self.db.cursor().execute("DELETE FROM groups WHERE id = ?", (group_id,))
+                self.db.publier("groups", SUPPRESSION, [group_id])
             return True
         except Exception as e:
             print(f"Erreur suppression groupe: {e}")
@@ -292,33 +1483,93 @@ class EvenementsManager:
 
     def ajouter_evenement(self, nom: str, date_str: str, heure: str = "", lieu: str = "",
                          description: str = "", groupe_id: Optional[int] = None) -> int:
-        cur = self.db.cursor()
-        cur.execute("""
-            INSERT INTO events (nom, date, heure, lieu, description, groupe_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (nom, date_str, heure, lieu, description, groupe_id))
-        self.db.commit()
+        with self.db.transaction():
+            cur = self.db.cursor()
+            cur.execute("""
+                INSERT INTO events (nom, date, heure, lieu, description, groupe_id, date_jour, heure_minutes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (nom, date_str, heure, lieu, description, groupe_id,
+                  jour_depuis_texte(date_str), minutes_depuis_heure(heure)))
+            self.db.publier("events", INSERTION, [cur.lastrowid])
         return cur.lastrowid
 
-    def obtenir_tous_evenements(self, futurs_seulement: bool = False) -> List[Dict[str, Any]]:
-        cur = self.db.cursor()
+    def modifier_evenement(self, event_id: int, **fields):
+        if not fields:
+            return
+        if 'date' in fields:
+            fields['date_jour'] = jour_depuis_texte(fields['date'])
+        if 'heure' in fields:
+            fields['heure_minutes'] = minutes_depuis_heure(fields['heure'])
+        keys = ", ".join(f"{k}=?" for k in fields.keys())
+        vals = list(fields.values()) + [event_id]
+        with self.db.transaction():
+            self.db.cursor().execute(f"UPDATE events SET {keys} WHERE id = ?", vals)
+            self.db.publier("events", MODIFICATION, [event_id])
+
+    def _executer_liste(self, cur: sqlite3.Cursor, futurs_seulement: bool, passes_seulement: bool):
+        aujourdhui = jour_depuis_date(date.today())
         if futurs_seulement:
-            today = date.today().isoformat()
-            cur.execute("SELECT * FROM events WHERE date >= ? ORDER BY date, heure", (today,))
+            cur.execute(f"""
+                SELECT {COLONNES_EVENEMENT} FROM events WHERE date_jour >= ?
+                ORDER BY date_jour, heure_minutes
+            """, (aujourdhui,))
+        elif passes_seulement:
+            cur.execute(f"""
+                SELECT {COLONNES_EVENEMENT} FROM events WHERE date_jour < ?
+                ORDER BY date_jour DESC, heure_minutes DESC
+            """, (aujourdhui,))
         else:
-            cur.execute("SELECT * FROM events ORDER BY date DESC, heure DESC")
-        return [dict(r) for r in cur.fetchall()]
+            cur.execute(f"SELECT {COLONNES_EVENEMENT} FROM events ORDER BY date_jour DESC, heure_minutes DESC")
 
-    def obtenir_evenement(self, event_id: int) -> Optional[Dict[str, Any]]:
-        cur = self.db.cursor()
-        cur.execute("SELECT * FROM events WHERE id = ?", (event_id,))
-        r = cur.fetchone()
-        return dict(r) if r else None
+    def obtenir_tous_evenements(self, futurs_seulement: bool = False,
+                                passes_seulement: bool = False) -> List[Event]:
+        cur = self.db.lecture(Event)
+        self._executer_liste(cur, futurs_seulement, passes_seulement)
+        return cur.fetchall()
+
+    def iter_evenements(self, futurs_seulement: bool = False, batch_size: int = TAILLE_LOT_LECTURE,
+                        tuples: bool = False, passes_seulement: bool = False) -> Iterator[Event]:
+        """Comme obtenir_tous_evenements, sans tout charger en mémoire.
+
+        tuples=True: tuples dans l'ordre de Event.COLONNES.
+        """
+        cur = self.db.lecture(Event, tuples)
+        self._executer_liste(cur, futurs_seulement, passes_seulement)
+        yield from _iter_lots(cur, batch_size)
+
+    def compter_evenements(self, futurs_seulement: bool = False) -> int:
+        cur = self.db.lecture()
+        if futurs_seulement:
+            cur.execute("SELECT COUNT(*) FROM events WHERE date_jour >= ?",
+                        (jour_depuis_date(date.today()),))
+        else:
+            cur.execute("SELECT COUNT(*) FROM events")
+        return cur.fetchone()[0]
+
+    def obtenir_evenement(self, event_id: int) -> Optional[Event]:
+        cur = self.db.lecture(Event)
+        cur.execute(f"SELECT {COLONNES_EVENEMENT} FROM events WHERE id = ?", (event_id,))
+        return cur.fetchone()
+
+    def obtenir_evenements_recents_avec_resume(self, limite: int = 10) -> List[Dict[str, Any]]:
+        """Derniers événements (par date croissante) avec leurs compteurs de présence"""
+        cur = self.db.lecture()
+        cur.execute("""
+            SELECT e.id, e.nom, e.date,
+                   COALESCE(s.present_count, 0) + COALESCE(a.present_count, 0) AS present_count,
+                   COALESCE(s.total_count, 0) + COALESCE(a.total_count, 0) AS total_count
+            FROM (SELECT id, nom, date, date_jour, heure_minutes FROM events
+                  ORDER BY date_jour DESC, heure_minutes DESC LIMIT ?) e
+            LEFT JOIN event_attendance_summary s ON s.event_id = e.id
+            LEFT JOIN event_attendance_archive a ON a.event_id = e.id
+            ORDER BY e.date_jour, e.heure_minutes
+        """, (limite,))
+        return [dict(r) for r in cur.fetchall()]
 
     def supprimer_evenement(self, event_id: int):
-        cur = self.db.cursor()
-        cur.execute("DELETE FROM events WHERE id = ?", (event_id,))
-        self.db.commit()
+        with self.db.transaction():
+            self.db.cursor().execute("DELETE FROM events WHERE id = ?", (event_id,))
+            self.db.publier("events", SUPPRESSION, [event_id])
 
 
 class PresencesManager:
@@ -328,29 +1579,86 @@ class PresencesManager:
     def enregistrer_presence(self, member_id: int, event_id: Optional[int], present: bool, 
                            date_str: Optional[str] = None) -> int:
         date_str = date_str or date.today().isoformat()
-        cur = self.db.cursor()
-        cur.execute("""
-            INSERT INTO presences (member_id, event_id, date, present)
-            VALUES (?, ?, ?, ?)
-        """, (member_id, event_id, date_str, 1 if present else 0))
-        self.db.commit()
+        with self.db.transaction():
+            cur = self.db.cursor()
+            cur.execute("""
+                INSERT INTO presences (member_id, event_id, date, present)
+                VALUES (?, ?, ?, ?)
+            """, (member_id, event_id, date_str, 1 if present else 0))
+            self.db.invalider_taux([member_id])
+            self.db.publier("presences", INSERTION, [member_id], event_id)
         return cur.lastrowid
 
-    def obtenir_presences_pour_membre(self, member_id: int) -> List[Dict[str, Any]]:
-        cur = self.db.cursor()
-        cur.execute("SELECT * FROM presences WHERE member_id = ? ORDER BY date DESC", (member_id,))
-        return [dict(r) for r in cur.fetchall()]
+    def enregistrer_presences_bulk(self, presences: Iterable[Tuple[int, bool]], event_id: Optional[int] = None,
+                                   date_str: Optional[str] = None) -> int:
+        """Enregistre un appel complet (member_id, present) en une transaction"""
+        date_str = date_str or date.today().isoformat()
+        lignes = [(member_id, event_id, date_str, 1 if present else 0) for member_id, present in presences]
+        if not lignes:
+            return 0
+        with self.db.transaction():
+            cur = self.db.cursor()
+            cur.executemany("""
+                INSERT INTO presences (member_id, event_id, date, present)
+                VALUES (?, ?, ?, ?)
+            """, lignes)
+            self.db.invalider_taux(l[0] for l in lignes)
+            self.db.publier("presences", INSERTION, [l[0] for l in lignes], event_id)
+        return len(lignes)
 
-    def obtenir_presences_par_date(self, date_str: str) -> List[Dict[str, Any]]:
-        cur = self.db.cursor()
-        cur.execute("SELECT * FROM presences WHERE date = ?", (date_str,))
-        return [dict(r) for r in cur.fetchall()]
+    def obtenir_presences_pour_membre(self, member_id: int) -> List[Presence]:
+        cur = self.db.lecture(Presence)
+        cur.execute(f"SELECT {COLONNES_PRESENCE} FROM presences WHERE member_id = ? ORDER BY date DESC",
+                    (member_id,))
+        return cur.fetchall()
+
+    def iter_presences(self, member_id: Optional[int] = None, event_id: Optional[int] = None,
+                       batch_size: int = TAILLE_LOT_LECTURE, tuples: bool = False) -> Iterator[Presence]:
+        """Présences d'un membre, d'un événement ou de toute la base, par lots.
+
+        tuples=True: tuples dans l'ordre de Presence.COLONNES.
+        """
+        cur = self.db.lecture(Presence, tuples)
+        if member_id is not None:
+            cur.execute(f"SELECT {COLONNES_PRESENCE} FROM presences WHERE member_id = ? ORDER BY date DESC",
+                        (member_id,))
+        elif event_id is not None:
+            cur.execute(f"SELECT {COLONNES_PRESENCE} FROM presences WHERE event_id = ? ORDER BY date DESC",
+                        (event_id,))
+        else:
+            cur.execute(f"SELECT {COLONNES_PRESENCE} FROM presences ORDER BY id")
+        yield from _iter_lots(cur, batch_size)
+
+    def obtenir_presences_par_date(self, date_str: str) -> List[Presence]:
+        cur = self.db.lecture(Presence)
+        cur.execute(f"SELECT {COLONNES_PRESENCE} FROM presences WHERE date = ?", (date_str,))
+        return cur.fetchall()
     
-    def obtenir_presences_evenement(self, event_id: int) -> List[Dict[str, Any]]:
+    def obtenir_resume_evenement(self, event_id: int) -> Dict[str, Any]:
+        """Compteurs de présence d'un événement (lecture par clé primaire), archives comprises"""
+        cur = self.db.lecture()
+        cur.execute("""
+            SELECT SUM(present_count) AS present_count, SUM(total_count) AS total_count,
+                   MAX(last_presence_date) AS last_presence_date
+            FROM (
+                SELECT present_count, total_count, last_presence_date
+                FROM event_attendance_summary WHERE event_id = ?
+                UNION ALL
+                SELECT present_count, total_count, last_presence_date
+                FROM event_attendance_archive WHERE event_id = ?
+            )
+        """, (event_id, event_id))
+        r = cur.fetchone()
+        if r['total_count'] is None:
+            return {'present_count': 0, 'total_count': 0, 'last_presence_date': None}
+        return dict(r)
+
+    def obtenir_presences_evenement(self, event_id: int) -> List[Presence]:
         """CORRIGÉ: méthode manquante"""
-        cur = self.db.cursor()
-        cur.execute("SELECT * FROM presences WHERE event_id = ? ORDER BY date DESC", (event_id,))
-        return [dict(r) for r in cur.fetchall()]
+        cur = self.db.lecture(Presence)
+        cur.execute(f"SELECT {COLONNES_PRESENCE} FROM presences WHERE event_id = ? ORDER BY date DESC",
+                    (event_id,))
+        return cur.fetchall()
 
 
 class MessagesManager:
@@ -358,16 +1666,17 @@ class MessagesManager:
         self.db = db
 
     def enregistrer_message(self, sender: str, recipient: str, content: str, groupe_id: Optional[int] = None):
-        cur = self.db.cursor()
-        cur.execute("""
-            INSERT INTO messages (sender, recipient, groupe_id, content)
-            VALUES (?, ?, ?, ?)
-        """, (sender, recipient, groupe_id, content))
-        self.db.commit()
+        with self.db.transaction():
+            cur = self.db.cursor()
+            cur.execute("""
+                INSERT INTO messages (sender, recipient, groupe_id, content)
+                VALUES (?, ?, ?, ?)
+            """, (sender, recipient, groupe_id, content))
+            self.db.publier("messages", INSERTION, [cur.lastrowid], groupe_id)
         return cur.lastrowid
 
     def obtenir_messages(self, groupe_id: Optional[int] = None, limit: int = 200) -> List[Dict[str, Any]]:
-        cur = self.db.cursor()
+        cur = self.db.lecture()
         if groupe_id:
             cur.execute("SELECT * FROM messages WHERE groupe_id = ? ORDER BY sent_at DESC LIMIT ?", 
                        (groupe_id, limit))
@@ -384,7 +1693,49 @@ def creer_gestionnaire_db() -> Tuple[DBManager, MembresManager, EvenementsManage
     presences_mgr = PresencesManager(db)
     messages_mgr = MessagesManager(db)
     
-    # Garder une référence pour clear_caches
+    # Garder une référence aux managers créés pour cette base
     db._managers = [membres_mgr, evenements_mgr, groupes_mgr, presences_mgr, messages_mgr]
     
-    return db, membres_mgr, evenements_mgr, groupes_mgr, presences_mgr, messages_mgr
\ No newline at end of file
+    return db, membres_mgr, evenements_mgr, groupes_mgr, presences_mgr, messages_mgr
+
+
+_verrou_registre = threading.Lock()
+_gestionnaires = None
+
+
+def obtenir_gestionnaire_db() -> Tuple[DBManager, MembresManager, EvenementsManager, GroupesManager, PresencesManager, MessagesManager]:
+    """Gestionnaires partagés par tout le processus, créés au premier appel.
+
+    Toutes les fenêtres utilisent ainsi la même base, le même schéma initialisé
+    une seule fois et les mêmes caches. La connexion est fermée à la sortie.
+    """
+    global _gestionnaires
+    with _verrou_registre:
+        if _gestionnaires is None:
+            _gestionnaires = creer_gestionnaire_db()
+            atexit.register(fermer_gestionnaire_db)
+        return _gestionnaires
+
+
+def fermer_gestionnaire_db():
+    """Ferme la base partagée (sans effet si elle n'a pas été ouverte)"""
+    global _gestionnaires
+    with _verrou_registre:
+        gestionnaires, _gestionnaires = _gestionnaires, None
+    if gestionnaires is not None:
+        atexit.unregister(fermer_gestionnaire_db)
+        gestionnaires[0].fermer()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintenance de la base PerspectiVo")
+    parser.add_argument("commande", choices=["reconstruire-resumes"])
+    parser.add_argument("--db", type=Path, default=None, help="Chemin de la base (défaut: dossier de l'app)")
+    args = parser.parse_args()
+
+    db = DBManager(args.db)
+    if args.commande == "reconstruire-resumes":
+        db.reconstruire_resumes_presence()
+        print("Résumés de présence reconstruits.")
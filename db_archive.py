@@ -0,0 +1,288 @@
+"""
+Archivage des présences et messages des années académiques passées
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from changements import SUPPRESSION
+from db import Presence, jour_depuis_date
+
+# L'année académique N va du 1er septembre N au 31 août N+1
+MOIS_RENTREE = 9
+
+# Jour d'une présence (voir jour_depuis_texte): presences.date est ISO ou 'dd/mm/yyyy'.
+# Une date illisible donne NULL: la présence n'est jamais archivée.
+_SQL_JOUR = "jour_depuis_texte(date)"
+
+# Année académique d'un jour (nombre de jours depuis le 1970-01-01)
+_SQL_ANNEE = (f"(CAST(strftime('%Y', {{0}} + 2440587.5) AS INTEGER)"
+              f" - (CAST(strftime('%m', {{0}} + 2440587.5) AS INTEGER) < {MOIS_RENTREE}))")
+
+_COLONNES_PRESENCE = "id, member_id, event_id, date, present, created_at"
+_COLONNES_MESSAGE = "id, sender, recipient, groupe_id, content, sent_at"
+
+_SCHEMA_ARCHIVE = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.presences (
+        id INTEGER PRIMARY KEY,
+        member_id INTEGER NOT NULL,
+        event_id INTEGER,
+        date TEXT NOT NULL,
+        present INTEGER DEFAULT 0,
+        created_at TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_presences_member ON presences(member_id, date)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_presences_event ON presences(event_id)",
+    """
+    CREATE TABLE IF NOT EXISTS archive.messages (
+        id INTEGER PRIMARY KEY,
+        sender TEXT,
+        recipient TEXT,
+        groupe_id INTEGER,
+        content TEXT,
+        sent_at TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_messages_groupe ON messages(groupe_id, sent_at)",
+]
+
+
+def annee_academique(d: date) -> int:
+    """Année de rentrée de l'année académique contenant d"""
+    return d.year if d.month >= MOIS_RENTREE else d.year - 1
+
+
+def debut_annee_academique(annee: int) -> date:
+    return date(annee, MOIS_RENTREE, 1)
+
+
+class ServiceArchive:
+    """Déplace l'historique ancien dans un fichier attaché (ATTACH).
+
+    La base courante ne garde que la saison en cours: les résumés
+    member/event_attendance_summary, les taux et les statistiques ne portent
+    plus que sur elle. Les compteurs des présences archivées restent dans la
+    base courante (member_attendance_archive par membre et par année,
+    event_attendance_archive par événement). L'historique complet n'est lu
+    que sur demande, via les vues UNION ALL de historique().
+    """
+
+    def __init__(self, db, chemin: Optional[Path] = None):
+        self.db = db
+        self.chemin = Path(chemin) if chemin else Path(db.db_path).with_name(
+            Path(db.db_path).stem + "-archive.db"
+        )
+
+    # --- Archivage ---
+
+    def archiver(self, avant_annee: int) -> Dict[str, int]:
+        """Archive les présences et messages antérieurs à l'année académique avant_annee.
+
+        Retourne le nombre de lignes déplacées par table. En WAL, une transaction
+        sur deux bases attachées n'est pas atomique: les lignes sont d'abord
+        copiées et validées dans l'archive, puis supprimées de la base courante
+        dans une seconde transaction, après vérification de la copie. Les lignes
+        gardent leur id: relancer après une interruption ne crée pas de doublon.
+        """
+        debut = debut_annee_academique(avant_annee)
+        jour, limite = jour_depuis_date(debut), debut.isoformat()
+        db = self.db
+        with db.pool.verrou_ecriture:
+            # ATTACH est interdit dans une transaction
+            db.commit()
+            cur = db.conn.cursor()
+            cur.execute("ATTACH DATABASE ? AS archive", (str(self.chemin),))
+            try:
+                for sql in _SCHEMA_ARCHIVE:
+                    cur.execute(sql)
+                with db.transaction():
+                    self._copier(cur, jour, limite)
+                with db.transaction():
+                    self._verifier_copie(cur, jour, limite)
+                    resultat = self._supprimer(cur, jour, limite)
+            finally:
+                cur.execute("DETACH DATABASE archive")
+        return resultat
+
+    def _copier(self, cur: sqlite3.Cursor, jour: int, limite: str):
+        """Première transaction: n'écrit que dans l'archive"""
+        cur.execute(f"""
+            INSERT OR IGNORE INTO archive.presences ({_COLONNES_PRESENCE})
+            SELECT {_COLONNES_PRESENCE} FROM main.presences WHERE {_SQL_JOUR} < ?
+        """, (jour,))
+        cur.execute(f"""
+            INSERT OR IGNORE INTO archive.messages ({_COLONNES_MESSAGE})
+            SELECT {_COLONNES_MESSAGE} FROM main.messages WHERE sent_at < ?
+        """, (limite,))
+
+    def _verifier_copie(self, cur: sqlite3.Cursor, jour: int, limite: str):
+        """Chaque ligne à supprimer doit être dans l'archive, à l'identique (id réutilisé...)"""
+        cur.execute(f"""
+            SELECT COUNT(*) FROM main.presences p WHERE {_SQL_JOUR} < ? AND NOT EXISTS (
+                SELECT 1 FROM archive.presences a
+                WHERE a.id = p.id AND a.member_id = p.member_id AND a.date = p.date
+                  AND a.present IS p.present AND a.event_id IS p.event_id
+            )
+        """, (jour,))
+        presences = cur.fetchone()[0]
+        cur.execute(f"""
+            SELECT COUNT(*) FROM main.messages m WHERE m.sent_at < ? AND NOT EXISTS (
+                SELECT 1 FROM archive.messages a
+                WHERE a.id = m.id AND a.sent_at IS m.sent_at AND a.content IS m.content
+            )
+        """, (limite,))
+        messages = cur.fetchone()[0]
+        if presences or messages:
+            raise sqlite3.IntegrityError(
+                f"Archivage interrompu: {presences} présences et {messages} messages absents de l'archive"
+            )
+
+    def _supprimer(self, cur: sqlite3.Cursor, jour: int, limite: str) -> Dict[str, int]:
+        """Seconde transaction: n'écrit que dans la base courante"""
+        # Déplacement, pas suppression: rien à journaliser pour la synchronisation
+        # (le trigger trg_presences_sync_ad ignore les suppressions marquées)
+        cur.execute("INSERT OR REPLACE INTO sync_meta (cle, valeur) VALUES ('archivage', '1')")
+        # Compteurs conservés dans la base courante
+        cur.execute(f"""
+            INSERT INTO member_attendance_archive
+                (member_id, annee, present_count, total_count, last_presence_date)
+            SELECT member_id, {_SQL_ANNEE.format(_SQL_JOUR)}, SUM(present = 1), COUNT(*),
+                   MAX(CASE WHEN present = 1 THEN date END)
+            FROM main.presences WHERE {_SQL_JOUR} < ?
+            GROUP BY 1, 2
+            ON CONFLICT (member_id, annee) DO UPDATE SET
+                present_count = present_count + excluded.present_count,
+                total_count = total_count + excluded.total_count,
+                last_presence_date = CASE
+                    WHEN last_presence_date IS NULL OR excluded.last_presence_date > last_presence_date
+                    THEN excluded.last_presence_date ELSE last_presence_date END
+        """, (jour,))
+        cur.execute(f"""
+            INSERT INTO event_attendance_archive (event_id, present_count, total_count, last_presence_date)
+            SELECT event_id, SUM(present = 1), COUNT(*), MAX(CASE WHEN present = 1 THEN date END)
+            FROM main.presences WHERE {_SQL_JOUR} < ? AND event_id IS NOT NULL
+            GROUP BY event_id
+            ON CONFLICT (event_id) DO UPDATE SET
+                present_count = present_count + excluded.present_count,
+                total_count = total_count + excluded.total_count,
+                last_presence_date = CASE
+                    WHEN last_presence_date IS NULL OR excluded.last_presence_date > last_presence_date
+                    THEN excluded.last_presence_date ELSE last_presence_date END
+        """, (jour,))
+
+        # Membres concernés, pour les taux et les vues
+        cur.execute(f"SELECT DISTINCT member_id FROM main.presences WHERE {_SQL_JOUR} < ?", (jour,))
+        membres = [r[0] for r in cur.fetchall()]
+
+        # Les triggers retirent ces lignes de member/event_attendance_summary
+        cur.execute(f"DELETE FROM main.presences WHERE {_SQL_JOUR} < ?", (jour,))
+        nb_presences = cur.rowcount
+
+        cur.execute("SELECT id FROM main.messages WHERE sent_at < ?", (limite,))
+        messages = [r[0] for r in cur.fetchall()]
+        cur.execute("DELETE FROM main.messages WHERE sent_at < ?", (limite,))
+        cur.execute("DELETE FROM sync_meta WHERE cle = 'archivage'")
+
+        self.db.invalider_taux(membres)
+        self.db.publier("presences", SUPPRESSION, membres)
+        self.db.publier("messages", SUPPRESSION, messages)
+        return {'presences': nb_presences, 'messages': len(messages)}
+
+    # --- Historique complet (sur demande) ---
+
+    @contextmanager
+    def historique(self) -> Iterator[sqlite3.Connection]:
+        """Connexion de lecture avec les vues temporaires presences_historique
+        et messages_historique (base courante UNION ALL archive)"""
+        conn = sqlite3.connect(str(self.db.db_path), timeout=self.db.pool.timeout, uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            sources_presences = [f"SELECT {_COLONNES_PRESENCE} FROM main.presences"]
+            sources_messages = [f"SELECT {_COLONNES_MESSAGE} FROM main.messages"]
+            if self.chemin.exists():
+                conn.execute("ATTACH DATABASE ? AS archive", (self.chemin.resolve().as_uri() + "?mode=ro",))
+                tables = {r[0] for r in conn.execute("SELECT name FROM archive.sqlite_master")}
+                if "presences" in tables:
+                    sources_presences.append(f"SELECT {_COLONNES_PRESENCE} FROM archive.presences")
+                if "messages" in tables:
+                    sources_messages.append(f"SELECT {_COLONNES_MESSAGE} FROM archive.messages")
+            conn.execute(f"CREATE TEMP VIEW presences_historique AS {' UNION ALL '.join(sources_presences)}")
+            conn.execute(f"CREATE TEMP VIEW messages_historique AS {' UNION ALL '.join(sources_messages)}")
+            yield conn
+        finally:
+            conn.close()
+
+    def obtenir_presences_membre(self, member_id: int) -> List[Presence]:
+        """Toutes les présences d'un membre, archives comprises"""
+        with self.historique() as conn:
+            cur = conn.cursor()
+            cur.row_factory = Presence.fabrique
+            cur.execute(f"""
+                SELECT {_COLONNES_PRESENCE} FROM presences_historique
+                WHERE member_id = ? ORDER BY date DESC
+            """, (member_id,))
+            return cur.fetchall()
+
+    def obtenir_messages(self, groupe_id: Optional[int] = None, limit: int = 200) -> List[Dict[str, Any]]:
+        """Comme MessagesManager.obtenir_messages, archives comprises"""
+        with self.historique() as conn:
+            if groupe_id:
+                cur = conn.execute("""
+                    SELECT * FROM messages_historique WHERE groupe_id = ?
+                    ORDER BY sent_at DESC LIMIT ?
+                """, (groupe_id, limit))
+            else:
+                cur = conn.execute("SELECT * FROM messages_historique ORDER BY sent_at DESC LIMIT ?", (limit,))
+            return [dict(r) for r in cur.fetchall()]
+
+    def resume_membre(self, member_id: int) -> List[Dict[str, Any]]:
+        """Compteurs par année académique (archives puis saison en cours), sans lire l'archive"""
+        cur = self.db.lecture()
+        cur.execute("""
+            SELECT annee, present_count, total_count, last_presence_date
+            FROM member_attendance_archive WHERE member_id = ?
+            ORDER BY annee
+        """, (member_id,))
+        resume = [dict(r) for r in cur.fetchall()]
+        cur.execute("""
+            SELECT present_count, total_count, last_presence_date
+            FROM member_attendance_summary WHERE member_id = ?
+        """, (member_id,))
+        r = cur.fetchone()
+        if r:
+            resume.append({'annee': None, **dict(r)})  # None: saison en cours
+        for ligne in resume:
+            total = ligne['total_count']
+            ligne['taux'] = round(100.0 * ligne['present_count'] / total, 2) if total else 0.0
+        return resume
+
+    def taux_presence_historique(self, member_id: int) -> float:
+        """Taux de présence sur toute l'histoire du membre (en %)"""
+        resume = self.resume_membre(member_id)
+        total = sum(l['total_count'] for l in resume)
+        present = sum(l['present_count'] for l in resume)
+        return round(100.0 * present / total, 2) if total else 0.0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db import DBManager
+
+    parser = argparse.ArgumentParser(description="Archivage de l'historique PerspectiVo")
+    parser.add_argument("--db", type=Path, default=None, help="Chemin de la base (défaut: dossier de l'app)")
+    parser.add_argument("--archive", type=Path, default=None, help="Fichier d'archive (défaut: à côté de la base)")
+    parser.add_argument("--annee", type=int, default=annee_academique(date.today()),
+                        help="Archiver ce qui précède cette année académique (défaut: l'année en cours)")
+    args = parser.parse_args()
+
+    db = DBManager(args.db)
+    service = ServiceArchive(db, args.archive)
+    nombres = service.archiver(args.annee)
+    print(f"{nombres['presences']} présences et {nombres['messages']} messages archivés dans {service.chemin}")
+    db.fermer()
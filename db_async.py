@@ -0,0 +1,45 @@
+"""
+Exécution des requêtes des managers hors du thread de l'interface
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+# Lecteurs simultanés: chaque thread du pool a sa propre connexion de lecture (WAL)
+NB_THREADS = 2
+
+
+class ExecuteurDB:
+    """Pool de threads pour les appels aux managers.
+
+    Les lectures passent par la connexion de lecture du thread du pool
+    (DBManager.lecture) et ne bloquent pas l'interface. Les écritures des
+    managers se font dans un bloc transaction(), qui tient le verrou
+    d'écriture de l'exécution au commit: elles sont sérialisées avec celles
+    du thread de l'interface, qui attend donc la fin d'une écriture longue
+    soumise ici.
+    """
+
+    def __init__(self, nb_threads: int = NB_THREADS):
+        self._pool = ThreadPoolExecutor(max_workers=nb_threads, thread_name_prefix="db")
+
+    def soumettre(self, fonction: Callable, *args, **kwargs) -> Future:
+        return self._pool.submit(fonction, *args, **kwargs)
+
+    def arreter(self):
+        """Abandonne les appels en attente; ceux en cours se terminent"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_verrou = threading.Lock()
+
+
+def obtenir_executeur(db) -> ExecuteurDB:
+    """Exécuteur unique par DBManager, arrêté par DBManager.fermer()"""
+    with _verrou:
+        executeur = getattr(db, '_executeur', None)
+        if executeur is None:
+            executeur = ExecuteurDB()
+            db._executeur = executeur
+        return executeur
@@ -0,0 +1,100 @@
+"""
+Requêtes asynchrones des pages Qt: résultats livrés dans le thread de l'interface
+"""
+
+from typing import Callable, Dict, Optional
+
+from PySide6.QtCore import QObject, Signal
+
+from db_async import obtenir_executeur
+
+
+class Requete:
+    """Appel soumis au pool; annuler() garantit que son rappel ne sera pas appelé"""
+    __slots__ = ('future', 'rappel', 'erreur', 'cle', 'annulee')
+
+    def __init__(self, rappel: Callable, erreur: Optional[Callable], cle: Optional[str]):
+        self.future = None
+        self.rappel = rappel
+        self.erreur = erreur
+        self.cle = cle
+        self.annulee = False
+
+    def annuler(self):
+        self.annulee = True
+        # Sans effet si l'appel a déjà commencé: son résultat sera simplement ignoré
+        self.future.cancel()
+
+
+class RequetesPage(QObject):
+    """Requêtes en cours d'une page ou d'un dialogue.
+
+    lancer() exécute fonction(*args) dans le pool de la base et appelle
+    rappel(resultat) dans le thread de l'interface. Une nouvelle requête de
+    même clé remplace la précédente (frappe, défilement); annuler_tout() est
+    à appeler quand la page est quittée.
+    """
+    _terminee = Signal(object)
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self._executeur = obtenir_executeur(db)
+        self._en_cours: Dict[int, Requete] = {}
+        self._par_cle: Dict[str, Requete] = {}
+        # Émis depuis un thread du pool: livré par la boucle d'événements de ce QObject
+        self._terminee.connect(self._livrer)
+
+    def lancer(self, fonction: Callable, *args, rappel: Callable, erreur: Optional[Callable] = None,
+               cle: Optional[str] = None) -> Requete:
+        if cle is not None and cle in self._par_cle:
+            self._retirer(self._par_cle[cle]).annuler()
+        requete = Requete(rappel, erreur, cle)
+        requete.future = self._executeur.soumettre(fonction, *args)
+        self._en_cours[id(requete)] = requete
+        if cle is not None:
+            self._par_cle[cle] = requete
+        requete.future.add_done_callback(lambda _f: self._signaler(requete))
+        return requete
+
+    def _signaler(self, requete: Requete):
+        try:
+            self._terminee.emit(requete)
+        except RuntimeError:
+            pass  # page détruite entre-temps
+
+    def en_cours(self, cle: Optional[str] = None) -> bool:
+        if cle is not None:
+            return cle in self._par_cle
+        return bool(self._en_cours)
+
+    def annuler(self, cle: str):
+        requete = self._par_cle.get(cle)
+        if requete is not None:
+            self._retirer(requete).annuler()
+
+    def annuler_tout(self) -> bool:
+        """Annule tout; retourne True si des requêtes étaient en cours"""
+        requetes = list(self._en_cours.values())
+        for requete in requetes:
+            self._retirer(requete).annuler()
+        return bool(requetes)
+
+    def _retirer(self, requete: Requete) -> Requete:
+        self._en_cours.pop(id(requete), None)
+        if requete.cle is not None and self._par_cle.get(requete.cle) is requete:
+            del self._par_cle[requete.cle]
+        return requete
+
+    def _livrer(self, requete: Requete):
+        if requete.annulee:
+            return
+        self._retirer(requete)
+        if requete.future.cancelled():
+            return  # pool arrêté à la fermeture de la base
+        exception = requete.future.exception()
+        if exception is None:
+            requete.rappel(requete.future.result())
+        elif requete.erreur is not None:
+            requete.erreur(exception)
+        else:
+            print(f"Erreur requête: {exception}")
@@ -0,0 +1,275 @@
+"""
+Sauvegardes à chaud de la base avec rotation, vérification et restauration
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from changements import Changement, INSERTION, MODIFICATION, SUPPRESSION
+
+# Pages copiées par étape: les écritures de l'application passent entre deux étapes
+PAGES_PAR_ETAPE = 256
+
+# Nombre de sauvegardes conservées par défaut
+SAUVEGARDES_CONSERVEES = 10
+
+# Format des noms de fichiers: perspectivo-20250131-184500.db
+_FORMAT_HORODATAGE = "%Y%m%d-%H%M%S"
+
+# Tables dont les vues sont prévenues après une restauration, dans l'ordre de
+# publication: membres et groupes avant leurs appartenances
+_TABLES_NOTIFIEES = ("members", "groups", "events")
+
+
+class ServiceSauvegarde:
+    """Copies cohérentes de la base via sqlite3.Connection.backup.
+
+    La copie se fait depuis une connexion de lecture dédiée qui garde un
+    instantané WAL: elle ne prend jamais le verrou d'écriture et l'application
+    continue d'écrire pendant la sauvegarde. Le fichier est écrit sous un nom
+    temporaire, vérifié (PRAGMA integrity_check) puis renommé.
+    """
+
+    def __init__(self, db, dossier: Optional[Path] = None, conserver: int = SAUVEGARDES_CONSERVEES,
+                 pages_par_etape: int = PAGES_PAR_ETAPE):
+        self.db = db
+        # Par défaut à côté de la base (dossier de l'app, voir get_app_db_path)
+        self.dossier = Path(dossier) if dossier else Path(db.db_path).parent / "sauvegardes"
+        self.conserver = conserver
+        self.pages_par_etape = pages_par_etape
+        self._prefixe = Path(db.db_path).stem + "-"
+        self._verrou = threading.Lock()  # une seule sauvegarde à la fois
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Sauvegarde ---
+
+    def sauvegarder(self, progression: Optional[Callable[[int, int], None]] = None) -> Optional[Path]:
+        """Crée une sauvegarde vérifiée; retourne son chemin (None en cas d'échec).
+
+        progression(restant, total) est appelé après chaque étape, en pages.
+        """
+        return self._sauvegarder(progression)
+
+    def _sauvegarder(self, progression: Optional[Callable[[int, int], None]] = None,
+                     proteger: Optional[Path] = None) -> Optional[Path]:
+        with self._verrou:
+            self.dossier.mkdir(parents=True, exist_ok=True)
+            chemin = self._nouveau_chemin()
+            temporaire = chemin.with_suffix(".tmp")
+            try:
+                self._copier(temporaire, progression)
+                if not self.verifier(temporaire):
+                    raise sqlite3.DatabaseError("contrôle d'intégrité échoué")
+                temporaire.replace(chemin)
+            except Exception as e:
+                print(f"Erreur sauvegarde: {e}")
+                temporaire.unlink(missing_ok=True)
+                return None
+            self._rotation(proteger)
+            return chemin
+
+    def lancer(self, fin: Optional[Callable[[Optional[Path]], None]] = None) -> threading.Thread:
+        """Sauvegarde dans un thread d'arrière-plan; fin(chemin) est appelé dans ce thread"""
+        def executer():
+            chemin = self.sauvegarder()
+            if fin is not None:
+                fin(chemin)
+
+        self._thread = threading.Thread(target=executer, name="sauvegarde-db", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def sauvegarder_si_necessaire(self, intervalle_heures: float = 24) -> Optional[threading.Thread]:
+        """Lance une sauvegarde si la dernière date de plus de intervalle_heures"""
+        if self._thread is not None and self._thread.is_alive():
+            return None
+        sauvegardes = self.lister()
+        if sauvegardes:
+            age = time.time() - sauvegardes[0].stat().st_mtime
+            if age < intervalle_heures * 3600:
+                return None
+        return self.lancer()
+
+    def _copier(self, destination: Path, progression: Optional[Callable[[int, int], None]]):
+        source = sqlite3.connect(str(self.db.db_path), timeout=self.db.pool.timeout)
+        cible = sqlite3.connect(str(destination))
+        try:
+            # Transaction de lecture ouverte pendant toute la copie: en WAL la
+            # copie voit un état figé et n'est pas relancée par les écritures
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+            def etape(_statut, restant, total):
+                if progression is not None:
+                    progression(restant, total)
+
+            source.backup(cible, pages=self.pages_par_etape, progress=etape)
+            source.rollback()
+        finally:
+            cible.close()
+            source.close()
+
+    def _nouveau_chemin(self) -> Path:
+        horodatage = datetime.now().strftime(_FORMAT_HORODATAGE)
+        # Même seconde: numéro suivant le plus grand existant, pour que l'ordre des
+        # noms reste celui des sauvegardes même après une rotation
+        numeros = [self._cle_tri(p)[1] for p in self.dossier.glob(f"{self._prefixe}{horodatage}*.db")]
+        if not numeros:
+            return self.dossier / f"{self._prefixe}{horodatage}.db"
+        return self.dossier / f"{self._prefixe}{horodatage}-{max(numeros) + 1}.db"
+
+    # --- Rotation et vérification ---
+
+    def lister(self) -> List[Path]:
+        """Sauvegardes présentes, de la plus récente à la plus ancienne"""
+        if not self.dossier.exists():
+            return []
+        return sorted(self.dossier.glob(f"{self._prefixe}*.db"), key=self._cle_tri, reverse=True)
+
+    def _cle_tri(self, chemin: Path) -> Tuple[str, int]:
+        """(horodatage, n): 'perspectivo-20250131-184500-2.db' après '...-184500.db'"""
+        parties = chemin.stem[len(self._prefixe):].split("-")
+        n = parties[2] if len(parties) > 2 else ""
+        return "-".join(parties[:2]), int(n) if n.isdigit() else 0
+
+    def _rotation(self, proteger: Optional[Path] = None):
+        for ancien in self.lister()[self.conserver:]:
+            if proteger is not None and ancien.resolve() == proteger.resolve():
+                continue
+            try:
+                ancien.unlink()
+            except OSError as e:
+                print(f"Erreur suppression sauvegarde {ancien.name}: {e}")
+        # Copies interrompues (application fermée pendant une sauvegarde)
+        for temporaire in self.dossier.glob(f"{self._prefixe}*.tmp"):
+            temporaire.unlink(missing_ok=True)
+
+    @staticmethod
+    def verifier(chemin: Path) -> bool:
+        """True si le fichier est une base SQLite intègre"""
+        try:
+            conn = sqlite3.connect(_uri_lecture_seule(chemin), uri=True)
+            try:
+                resultat = conn.execute("PRAGMA integrity_check").fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Erreur vérification {Path(chemin).name}: {e}")
+            return False
+        return resultat == [("ok",)]
+
+    # --- Restauration ---
+
+    def restaurer(self, chemin: Path, sauvegarder_avant: bool = True) -> bool:
+        """Remplace le contenu de la base par la sauvegarde chemin.
+
+        La copie se fait en une étape sous le verrou d'écriture, sur la
+        connexion ouverte: pas besoin de rouvrir la base. L'état courant est
+        d'abord sauvegardé pour pouvoir revenir en arrière.
+        """
+        chemin = Path(chemin)
+        if not self.verifier(chemin):
+            print(f"Restauration annulée: {chemin.name} est illisible ou corrompue")
+            return False
+        # La sauvegarde à restaurer ne doit pas partir à la rotation
+        if sauvegarder_avant and self._sauvegarder(proteger=chemin) is None:
+            print("Restauration annulée: impossible de sauvegarder l'état actuel")
+            return False
+
+        db = self.db
+        with db.pool.verrou_ecriture:
+            if db.conn.in_transaction:
+                print("Restauration annulée: une transaction est en cours")
+                return False
+            avant = _etat_par_table(db.conn)
+            source = sqlite3.connect(_uri_lecture_seule(chemin), uri=True)
+            try:
+                source.backup(db.conn)
+            except sqlite3.Error as e:
+                print(f"Erreur restauration: {e}")
+                return False
+            finally:
+                source.close()
+            # Sauvegarde d'une version antérieure du schéma: appliquer les migrations
+            db._init_schema()
+            apres = _etat_par_table(db.conn)
+
+        db.cache_taux.vider()
+        db.bus.publier(_changements_restauration(avant, apres))
+        return True
+
+
+def _uri_lecture_seule(chemin: Path) -> str:
+    return Path(chemin).resolve().as_uri() + "?mode=ro"
+
+
+def _etat_par_table(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Ids des tables notifiées, appartenances (groupe, membre) et compteurs de présences par membre"""
+    etat: Dict[str, Any] = {
+        table: {ligne[0] for ligne in conn.execute(f"SELECT id FROM {table}")}
+        for table in _TABLES_NOTIFIEES
+    }
+    etat['group_members'] = set(conn.execute("SELECT group_id, member_id FROM group_members"))
+    etat['presences'] = {
+        ligne[0]: (ligne[1], ligne[2])
+        for ligne in conn.execute("SELECT member_id, present_count, total_count FROM member_attendance_summary")
+    }
+    return etat
+
+
+def _changements_restauration(avant: Dict[str, Any], apres: Dict[str, Any]) -> List[Changement]:
+    """Toutes les lignes sont potentiellement modifiées: on le signale aux vues"""
+    changements = []
+    for table in _TABLES_NOTIFIEES:
+        for operation, ids in ((SUPPRESSION, avant[table] - apres[table]),
+                               (MODIFICATION, avant[table] & apres[table]),
+                               (INSERTION, apres[table] - avant[table])):
+            if ids:
+                changements.append(Changement(table, operation, tuple(sorted(ids))))
+    # Appartenances: ids des membres, par groupe (parent_id)
+    for operation, paires in ((SUPPRESSION, avant['group_members'] - apres['group_members']),
+                              (INSERTION, apres['group_members'] - avant['group_members'])):
+        par_groupe: Dict[int, List[int]] = {}
+        for group_id, member_id in sorted(paires):
+            par_groupe.setdefault(group_id, []).append(member_id)
+        for group_id, member_ids in par_groupe.items():
+            changements.append(Changement("group_members", operation, tuple(member_ids), group_id))
+    # Présences: membres dont les compteurs diffèrent (taux, statistiques)
+    presences = avant['presences'].keys() | apres['presences'].keys()
+    modifies = [m for m in presences if avant['presences'].get(m) != apres['presences'].get(m)]
+    if modifies:
+        changements.append(Changement("presences", MODIFICATION, tuple(sorted(modifies))))
+    return changements
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db import DBManager
+
+    parser = argparse.ArgumentParser(description="Sauvegardes de la base PerspectiVo")
+    parser.add_argument("commande", choices=["sauvegarder", "lister", "verifier", "restaurer"])
+    parser.add_argument("fichier", nargs="?", type=Path, help="Sauvegarde à vérifier ou restaurer")
+    parser.add_argument("--db", type=Path, default=None, help="Chemin de la base (défaut: dossier de l'app)")
+    parser.add_argument("--conserver", type=int, default=SAUVEGARDES_CONSERVEES)
+    args = parser.parse_args()
+
+    db = DBManager(args.db)
+    service = ServiceSauvegarde(db, conserver=args.conserver)
+    if args.commande == "sauvegarder":
+        chemin = service.sauvegarder()
+        print(f"Sauvegarde créée: {chemin}" if chemin else "Échec de la sauvegarde.")
+    elif args.commande == "lister":
+        for chemin in service.lister():
+            print(chemin)
+    elif args.fichier is None:
+        parser.error(f"{args.commande} attend un fichier de sauvegarde")
+    elif args.commande == "verifier":
+        print("Sauvegarde intègre." if service.verifier(args.fichier) else "Sauvegarde corrompue.")
+    else:
+        print("Base restaurée." if service.restaurer(args.fichier) else "Échec de la restauration.")
+    db.fermer()
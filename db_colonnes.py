@@ -0,0 +1,141 @@
+"""
+Instantané colonnaire (NumPy) de la base pour les statistiques
+"""
+
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Jours depuis le 1970-01-01 (julianday de l'époque Unix = 2440587.5). Les dates
+# ISO valides sont converties par SQLite; les autres ('01/09/2024'...) par
+# db.jour_depuis_texte, enregistrée sur les connexions du pool: même résultat
+# que les colonnes *_jour calculées à l'écriture
+_SQL_JOUR = """CASE WHEN date(julianday(substr({0}, 1, 10))) = substr({0}, 1, 10)
+    THEN CAST(julianday(substr({0}, 1, 10)) - 2440587.5 AS INTEGER)
+    ELSE jour_depuis_texte({0}) END"""
+
+# Date absente ou illisible
+JOUR_INCONNU = np.iinfo(np.int64).min
+
+# Catégorie vide (école, filière ou résidence non renseignée)
+CODE_VIDE = -1
+
+
+def _encoder(valeurs: Sequence[Optional[str]]) -> Tuple[np.ndarray, List[str]]:
+    """Codes entiers par ordre de première apparition; '' et None -> CODE_VIDE"""
+    index: Dict[str, int] = {}
+    codes = np.empty(len(valeurs), dtype=np.int32)
+    for i, v in enumerate(valeurs):
+        codes[i] = index.setdefault(v, len(index)) if v else CODE_VIDE
+    return codes, list(index)
+
+
+def _entiers(cur, largeur: int) -> np.ndarray:
+    """Résultat entier de cur en tableau (n, largeur), sans liste intermédiaire"""
+    valeurs = np.fromiter(chain.from_iterable(cur), dtype=np.int64)
+    return valeurs.reshape(-1, largeur)
+
+
+class InstantaneColonnes:
+    """Membres, présences et appartenances aux groupes sous forme de tableaux.
+
+    Les membres sont dans l'ordre (nom, prenoms, id) de l'application et les
+    catégories sont numérotées par ordre de première apparition dans cet ordre.
+    Les présences et appartenances référencent les membres par leur position
+    (membre_idx), directement utilisable avec np.bincount(..., minlength=nb_membres).
+    """
+
+    def __init__(self, lignes_membres, presences: Optional[np.ndarray],
+                 appartenances: Optional[np.ndarray], groupe_ids: Optional[np.ndarray]):
+        n = len(lignes_membres)
+        self.nb_membres = n
+        self.ids = np.fromiter((r[0] for r in lignes_membres), dtype=np.int64, count=n)
+        self.ecole, self.ecoles = _encoder([r[1] for r in lignes_membres])
+        self.filiere, self.filieres = _encoder([r[2] for r in lignes_membres])
+        self.residence, self.residences = _encoder([r[3] for r in lignes_membres])
+        self.inscription = np.fromiter(
+            (JOUR_INCONNU if r[4] is None else r[4] for r in lignes_membres), dtype=np.int64, count=n
+        )
+        self._tri = np.argsort(self.ids, kind='stable')
+        self._ids_tries = self.ids[self._tri]
+
+        # Présences: une ligne par présence
+        self.presence_membre = self.presence_evenement = None
+        self.presence_jour = self.present = None
+        if presences is not None:
+            idx = self.indices(presences[:, 0])
+            garder = idx >= 0  # présences orphelines (membre supprimé hors application)
+            self.presence_membre = idx[garder]
+            self.presence_evenement = presences[garder, 1]  # -1 si sans événement
+            self.presence_jour = presences[garder, 2]
+            self.present = presences[garder, 3].astype(bool)
+
+        # Groupes: une ligne par (groupe, membre)
+        self.groupe_ids = groupe_ids
+        self.appartenance_groupe = self.appartenance_membre = None
+        if appartenances is not None:
+            idx = self.indices(appartenances[:, 1])
+            garder = idx >= 0
+            self.appartenance_groupe = np.searchsorted(groupe_ids, appartenances[garder, 0])
+            self.appartenance_membre = idx[garder]
+
+    def indices(self, member_ids) -> np.ndarray:
+        """Positions des member_ids dans les tableaux de membres (-1 si absent)"""
+        member_ids = np.asarray(member_ids, dtype=np.int64)
+        if not self.nb_membres:
+            return np.full(member_ids.shape, -1, dtype=np.int64)
+        pos = np.searchsorted(self._ids_tries, member_ids)
+        pos = np.minimum(pos, self.nb_membres - 1)
+        trouve = self._ids_tries[pos] == member_ids
+        return np.where(trouve, self._tri[pos], -1)
+
+    def compter(self, codes: np.ndarray, categories: List[str]) -> Dict[str, int]:
+        """Effectif par catégorie (hors CODE_VIDE), dans l'ordre de première apparition"""
+        codes = codes[codes != CODE_VIDE]
+        if not len(codes):
+            return {}
+        effectifs = np.bincount(codes, minlength=len(categories))
+        uniques, premiers = np.unique(codes, return_index=True)
+        ordre = uniques[np.argsort(premiers, kind='stable')]
+        return {categories[c]: int(effectifs[c]) for c in ordre}
+
+
+def charger_instantane(db, presences: bool = True, groupes: bool = True) -> InstantaneColonnes:
+    """Charge l'instantané dans une seule transaction de lecture (état cohérent)"""
+    cur = db.lecture(tuples=True)
+    conn = cur.connection
+    deja_en_transaction = conn.in_transaction
+    if not deja_en_transaction:
+        cur.execute("BEGIN")
+    try:
+        cur.execute("""
+            SELECT id, ecole, filiere, residence, inscription_jour
+            FROM members ORDER BY nom, prenoms, id
+        """)
+        lignes_membres = cur.fetchall()
+
+        tableau_presences = None
+        if presences:
+            cur.execute(f"""
+                SELECT member_id, COALESCE(event_id, -1),
+                       COALESCE({_SQL_JOUR.format('date')}, ?), COALESCE(present, 0)
+                FROM presences ORDER BY id
+            """, (int(JOUR_INCONNU),))
+            tableau_presences = _entiers(cur, 4)
+
+        appartenances = groupe_ids = None
+        if groupes:
+            cur.execute("SELECT id FROM groups ORDER BY id")
+            groupe_ids = _entiers(cur, 1)[:, 0]
+            cur.execute("""
+                SELECT gm.group_id, gm.member_id FROM group_members gm
+                JOIN groups g ON g.id = gm.group_id
+                ORDER BY gm.group_id, gm.member_id
+            """)
+            appartenances = _entiers(cur, 2)
+    finally:
+        if not deja_en_transaction:
+            conn.commit()
+
+    return InstantaneColonnes(lignes_membres, tableau_presences, appartenances, groupe_ids)
@@ -0,0 +1,269 @@
+"""
+Profilage des requêtes SQL émises via DBManager (activé à la demande)
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Au-delà, la requête est journalisée avec son plan (EXPLAIN QUERY PLAN)
+SEUIL_LENTE_MS = 50.0
+
+# Même requête exécutée plus de K fois dans une action: motif N+1
+SEUIL_N_PLUS_1 = 20
+
+# Sans action nommée, un silence de cette durée termine l'action en cours
+PAUSE_ENTRE_ACTIONS_S = 0.2
+
+# Durées conservées par requête pour le p95
+_ECHANTILLONS = 1000
+
+
+def normaliser(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+class _StatsRequete:
+    __slots__ = ('executions', 'total_ms', 'lignes', 'durees', 'plan')
+
+    def __init__(self):
+        self.executions = 0
+        self.total_ms = 0.0
+        self.lignes = 0
+        self.durees = deque(maxlen=_ECHANTILLONS)
+        self.plan: Optional[List[str]] = None
+
+    def p95(self) -> float:
+        if not self.durees:
+            return 0.0
+        durees = sorted(self.durees)
+        return durees[min(len(durees) - 1, int(0.95 * len(durees)))]
+
+
+class _Action:
+    __slots__ = ('nom', 'debut', 'dernier', 'compteur', 'signalees')
+
+    def __init__(self, nom: Optional[str], maintenant: float):
+        self.nom = nom
+        self.debut = self.dernier = maintenant
+        self.compteur: Counter = Counter()
+        self.signalees = set()
+
+
+class ProfileurRequetes:
+    """Compteurs par requête (exécutions, temps total, p95, lignes lues).
+
+    Une exécution est mesurée de execute() jusqu'à la fin de la lecture de son
+    résultat (ou jusqu'à l'exécution suivante sur le même curseur), puisque
+    SQLite calcule les lignes à la demande. Les requêtes lentes sont écrites
+    avec leur plan dans un journal tournant; les motifs N+1 aussi.
+    """
+
+    def __init__(self, journal: Path, seuil_lente_ms: float = SEUIL_LENTE_MS,
+                 seuil_n_plus_1: int = SEUIL_N_PLUS_1):
+        self.seuil_lente_ms = seuil_lente_ms
+        self.seuil_n_plus_1 = seuil_n_plus_1
+        self.n_plus_1: List[Dict[str, Any]] = []
+        self._stats: Dict[str, _StatsRequete] = {}
+        self._verrou = threading.Lock()
+        self._local = threading.local()
+
+        self.journal = logging.getLogger(f"perspectivo.requetes.{id(self)}")
+        self.journal.propagate = False
+        self.journal.setLevel(logging.INFO)
+        self._handler = RotatingFileHandler(journal, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self.journal.addHandler(self._handler)
+
+    def fabrique(self, conn):
+        """Fabrique de curseur pour sqlite3.Connection.cursor()"""
+        return CurseurProfile(conn, self)
+
+    # --- Actions ---
+
+    @contextmanager
+    def action(self, nom: str):
+        """Délimite une action de l'interface pour la détection N+1"""
+        precedente = getattr(self._local, 'action', None)
+        self._local.action = _Action(nom, time.perf_counter())
+        try:
+            yield
+        finally:
+            self._local.action = precedente
+
+    def _action_courante(self, maintenant: float) -> _Action:
+        action = getattr(self._local, 'action', None)
+        if action is None or (action.nom is None and maintenant - action.dernier > PAUSE_ENTRE_ACTIONS_S):
+            action = self._local.action = _Action(None, maintenant)
+        action.dernier = maintenant
+        return action
+
+    # --- Mesures ---
+
+    def enregistrer(self, cle: str, duree_ms: float, lignes: int, conn, sql: str, parametres):
+        with self._verrou:
+            stats = self._stats.get(cle)
+            if stats is None:
+                stats = self._stats[cle] = _StatsRequete()
+            stats.executions += 1
+            stats.total_ms += duree_ms
+            stats.lignes += lignes
+            stats.durees.append(duree_ms)
+            sans_plan = stats.plan is None
+
+        if duree_ms >= self.seuil_lente_ms:
+            if sans_plan:
+                plan = _expliquer(conn, sql, parametres)
+                with self._verrou:
+                    stats.plan = plan
+            self.journal.info("LENTE %.1f ms, %d lignes: %s | plan: %s",
+                              duree_ms, lignes, cle, " ; ".join(stats.plan or []))
+
+    def compter_execution(self, cle: str):
+        """Appelé à chaque execute(): détection N+1 dans l'action courante"""
+        action = self._action_courante(time.perf_counter())
+        action.compteur[cle] += 1
+        n = action.compteur[cle]
+        if n > self.seuil_n_plus_1 and cle not in action.signalees:
+            action.signalees.add(cle)
+            with self._verrou:
+                self.n_plus_1.append({'action': action.nom, 'requete': cle, 'executions': n})
+            self.journal.warning("N+1 (%s): plus de %d exécutions de %s",
+                                 action.nom or "sans nom", self.seuil_n_plus_1, cle)
+
+    # --- Rapport ---
+
+    def rapport(self) -> List[Dict[str, Any]]:
+        """Une entrée par requête, de la plus coûteuse (temps total) à la moins coûteuse"""
+        with self._verrou:
+            lignes = [
+                {
+                    'requete': cle,
+                    'executions': s.executions,
+                    'total_ms': round(s.total_ms, 3),
+                    'moyenne_ms': round(s.total_ms / s.executions, 3) if s.executions else 0.0,
+                    'p95_ms': round(s.p95(), 3),
+                    'lignes': s.lignes,
+                    'plan': s.plan,
+                }
+                for cle, s in self._stats.items()
+            ]
+        lignes.sort(key=lambda l: l['total_ms'], reverse=True)
+        return lignes
+
+    def ecrire_rapport(self, limite: int = 30):
+        """Écrit les requêtes les plus coûteuses dans le journal"""
+        for l in self.rapport()[:limite]:
+            self.journal.info("RAPPORT %d exécutions, total %.1f ms, p95 %.2f ms, %d lignes: %s",
+                              l['executions'], l['total_ms'], l['p95_ms'], l['lignes'], l['requete'])
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._stats.clear()
+            self.n_plus_1.clear()
+
+    def fermer(self):
+        self.journal.removeHandler(self._handler)
+        self._handler.close()
+
+
+def _expliquer(conn, sql: str, parametres) -> Optional[List[str]]:
+    """Plan de la requête; None si elle ne peut pas être expliquée (PRAGMA, BEGIN...)"""
+    try:
+        lignes = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametres).fetchall()
+    except Exception:
+        return None
+    return [str(l[3]) for l in lignes]  # colonne detail
+
+
+class CurseurProfile(sqlite3.Cursor):
+    """Curseur qui mesure chaque exécution et compte les lignes lues"""
+
+    def __init__(self, conn, profileur: ProfileurRequetes):
+        super().__init__(conn)
+        self._profileur = profileur
+        self._mesure = None  # [cle, sql, parametres, durée ms, lignes]
+
+    def _terminer(self):
+        mesure, self._mesure = self._mesure, None
+        if mesure is not None:
+            cle, sql, parametres, duree_ms, lignes = mesure
+            self._profileur.enregistrer(cle, duree_ms, lignes, self.connection, sql, parametres)
+
+    def _mesurer(self, methode, sql, parametres, suivant=None):
+        self._terminer()
+        cle = normaliser(sql)
+        self._profileur.compter_execution(cle)
+        debut = time.perf_counter()
+        try:
+            methode(sql, parametres)
+        finally:
+            duree = (time.perf_counter() - debut) * 1000
+            self._mesure = [cle, sql, suivant if suivant is not None else parametres, duree, 0]
+        if self.description is None:
+            # Pas de résultat à lire (INSERT, UPDATE...): mesure complète
+            self._terminer()
+        return self
+
+    def execute(self, sql, parametres=()):
+        return self._mesurer(super().execute, sql, parametres)
+
+    def executemany(self, sql, sequence):
+        sequence = list(sequence)
+        return self._mesurer(super().executemany, sql, sequence,
+                             suivant=sequence[0] if sequence else ())
+
+    def _lu(self, debut: float, lignes: int, fini: bool):
+        if self._mesure is not None:
+            self._mesure[3] += (time.perf_counter() - debut) * 1000
+            self._mesure[4] += lignes
+            if fini:
+                self._terminer()
+
+    def fetchone(self):
+        debut = time.perf_counter()
+        ligne = super().fetchone()
+        self._lu(debut, ligne is not None, ligne is None)
+        return ligne
+
+    def fetchmany(self, size=None):
+        debut = time.perf_counter()
+        taille = self.arraysize if size is None else size
+        lignes = super().fetchmany(taille)
+        self._lu(debut, len(lignes), len(lignes) < taille)
+        return lignes
+
+    def fetchall(self):
+        debut = time.perf_counter()
+        lignes = super().fetchall()
+        self._lu(debut, len(lignes), True)
+        return lignes
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        debut = time.perf_counter()
+        try:
+            ligne = super().__next__()
+        except StopIteration:
+            self._lu(debut, 0, True)
+            raise
+        self._lu(debut, 1, False)
+        return ligne
+
+    def close(self):
+        self._terminer()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._terminer()
+        except Exception:
+            pass
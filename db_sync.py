@@ -0,0 +1,417 @@
+"""
+Synchronisation entre postes: échange des changements (change_log) par lots
+"""
+
+import hmac
+import json
+import re
+import sqlite3
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from changements import INSERTION, MODIFICATION, SUPPRESSION
+from db import TABLES_SYNC, TAILLE_LOT_IN
+
+# Colonnes échangées (hors id local et uuid)
+_COLONNES = {
+    "groups": ("nom", "description", "couleur", "created_at"),
+    "members": ("nom", "prenoms", "contact", "email", "residence", "ecole", "filiere",
+                "date_inscription", "created_at", "inscription_jour"),
+    "events": ("nom", "date", "heure", "lieu", "description", "created_at", "date_jour", "heure_minutes"),
+    "presences": ("date", "present", "created_at"),
+}
+
+# Références vers d'autres tables: échangées sous forme d'uuid
+_REFERENCES = {
+    "events": {"groupe_id": "groups"},
+    "presences": {"member_id": "members", "event_id": "events"},
+}
+
+# Sans ces références, la ligne n'a pas de sens (présence d'un membre inconnu)
+_REFERENCES_OBLIGATOIRES = {"presences": ("member_id",)}
+
+# Ordre d'application: parents avant enfants, suppressions en sens inverse
+_ORDRE = TABLES_SYNC + ("group_members",)
+
+_NOM_LOT = re.compile(r"^(?P<appareil>[0-9a-f-]+)-(?P<fin>\d{12})\.json$")
+
+
+# En-tête portant le secret partagé entre les postes et le serveur
+ENTETE_SECRET = "X-PerspectiVo-Secret"
+
+
+def _nom_lot(appareil: str, fin: int) -> str:
+    return f"{appareil}-{fin:012d}.json"
+
+
+# --- Transports ---------------------------------------------------------------
+
+class TransportDossier:
+    """Lots déposés dans un dossier partagé (réseau, clé USB, dossier synchronisé)"""
+
+    def __init__(self, dossier: Path):
+        self.dossier = Path(dossier)
+        self.dossier.mkdir(parents=True, exist_ok=True)
+
+    def publier(self, nom: str, contenu: bytes):
+        temporaire = self.dossier / (nom + ".tmp")
+        temporaire.write_bytes(contenu)
+        temporaire.replace(self.dossier / nom)  # jamais de lot à moitié écrit
+
+    def lister(self) -> List[str]:
+        return [p.name for p in self.dossier.glob("*.json") if _NOM_LOT.match(p.name)]
+
+    def lire(self, nom: str) -> bytes:
+        return (self.dossier / nom).read_bytes()
+
+
+class TransportHTTP:
+    """Lots échangés avec un ServeurSync du réseau local"""
+
+    def __init__(self, url: str, secret: str, timeout: float = 10.0):
+        self.url = url.rstrip("/")
+        self.secret = secret
+        self.timeout = timeout
+
+    def _requete(self, chemin: str, contenu: Optional[bytes] = None, methode: str = "GET"):
+        requete = urllib.request.Request(f"{self.url}{chemin}", data=contenu, method=methode,
+                                         headers={ENTETE_SECRET: self.secret})
+        return urllib.request.urlopen(requete, timeout=self.timeout)
+
+    def publier(self, nom: str, contenu: bytes):
+        self._requete(f"/lots/{nom}", contenu, "PUT").close()
+
+    def lister(self) -> List[str]:
+        with self._requete("/lots") as reponse:
+            return json.loads(reponse.read())
+
+    def lire(self, nom: str) -> bytes:
+        with self._requete(f"/lots/{nom}") as reponse:
+            return reponse.read()
+
+
+class ServeurSync(ThreadingHTTPServer):
+    """Serveur de lots minimal: GET /lots, GET et PUT /lots/<nom>, stockés dans un dossier.
+
+    Chaque requête doit porter le secret partagé (en-tête ENTETE_SECRET).
+    N'écoute que sur la machine locale par défaut: passer l'adresse de
+    l'interface du réseau local dans hote pour servir les autres postes.
+    """
+
+    def __init__(self, dossier: Path, secret: str, hote: str = "127.0.0.1", port: int = 8765):
+        if not secret:
+            raise ValueError("Un secret partagé est requis pour le serveur de synchronisation")
+        self.stockage = TransportDossier(dossier)
+        self.secret = secret.encode("utf-8")
+        super().__init__((hote, port), _GestionnaireSync)
+
+
+class _GestionnaireSync(BaseHTTPRequestHandler):
+    def _autorise(self) -> bool:
+        secret = self.headers.get(ENTETE_SECRET, "").encode("utf-8")
+        if hmac.compare_digest(secret, self.server.secret):
+            return True
+        self._repondre(401)
+        return False
+
+    def _nom(self) -> Optional[str]:
+        nom = self.path[len("/lots/"):] if self.path.startswith("/lots/") else ""
+        return nom if _NOM_LOT.match(nom) else None
+
+    def _repondre(self, code: int, contenu: bytes = b"", type_contenu: str = "application/json"):
+        self.send_response(code)
+        self.send_header("Content-Type", type_contenu)
+        self.send_header("Content-Length", str(len(contenu)))
+        self.end_headers()
+        self.wfile.write(contenu)
+
+    def do_GET(self):
+        if not self._autorise():
+            return
+        if self.path == "/lots":
+            self._repondre(200, json.dumps(self.server.stockage.lister()).encode())
+            return
+        nom = self._nom()
+        if nom is None or not (self.server.stockage.dossier / nom).exists():
+            self._repondre(404)
+            return
+        self._repondre(200, self.server.stockage.lire(nom))
+
+    def do_PUT(self):
+        if not self._autorise():
+            return
+        nom = self._nom()
+        if nom is None:
+            self._repondre(400)
+            return
+        longueur = int(self.headers.get("Content-Length", 0))
+        self.server.stockage.publier(nom, self.rfile.read(longueur))
+        self._repondre(204)
+
+
+# --- Moteur -------------------------------------------------------------------
+
+class MoteurSync:
+    """Échange les changements locaux contre ceux des autres postes.
+
+    Chaque poste publie ses propres lignes modifiées depuis le dernier envoi
+    (change_log.seq > envoye) et applique les lots des autres postes qu'il n'a
+    pas encore reçus: le coût dépend du nombre de changements, pas de la
+    taille de la base. Conflits: la version la plus récente gagne
+    (modifie_le, puis l'identifiant du poste pour départager), ce qui donne le
+    même résultat sur tous les postes quel que soit l'ordre de réception.
+    """
+
+    def __init__(self, db, transport):
+        self.db = db
+        self.transport = transport
+        self.appareil = self._meta("appareil")
+
+    def synchroniser(self) -> Dict[str, int]:
+        recus = self.importer()
+        envoyes = self.exporter()
+        return {'recus': recus, 'envoyes': envoyes}
+
+    # --- sync_meta ---
+
+    def _meta(self, cle: str, defaut: Optional[str] = None) -> Optional[str]:
+        cur = self.db.lecture()
+        cur.execute("SELECT valeur FROM sync_meta WHERE cle = ?", (cle,))
+        r = cur.fetchone()
+        return r[0] if r else defaut
+
+    def _ecrire_meta(self, cur: sqlite3.Cursor, cle: str, valeur):
+        cur.execute("INSERT OR REPLACE INTO sync_meta (cle, valeur) VALUES (?, ?)", (cle, str(valeur)))
+
+    # --- Envoi ---
+
+    def exporter(self) -> int:
+        """Publie les changements locaux non encore envoyés; retourne leur nombre"""
+        envoye = int(self._meta("envoye", "0"))
+        with self.db.instantane_lecture():
+            cur = self.db.lecture()
+            cur.execute("""
+                SELECT seq, table_name, uuid, operation, modifie_le FROM change_log
+                WHERE appareil = ? AND seq > ? ORDER BY seq
+            """, (self.appareil, envoye))
+            journal = cur.fetchall()
+            if not journal:
+                return 0
+            lignes = self._lire_lignes(cur, [(r[1], r[2]) for r in journal if r[3] == "upsert"])
+
+        changements = []
+        for seq, table, uuid, operation, modifie_le in journal:
+            changement = {'table': table, 'uuid': uuid, 'operation': operation, 'modifie_le': modifie_le}
+            if operation == "upsert":
+                ligne = lignes.get((table, uuid))
+                if ligne is None and table != "group_members":
+                    continue  # ligne supprimée depuis: sa suppression suit dans le journal
+                changement['ligne'] = ligne
+            changements.append(changement)
+
+        fin = journal[-1][0]
+        lot = {'appareil': self.appareil, 'debut': envoye + 1, 'fin': fin, 'changements': changements}
+        self.transport.publier(_nom_lot(self.appareil, fin), json.dumps(lot, ensure_ascii=False).encode("utf-8"))
+        with self.db.transaction():
+            self._ecrire_meta(self.db.cursor(), "envoye", fin)
+        return len(changements)
+
+    def _lire_lignes(self, cur: sqlite3.Cursor, cles: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Contenu actuel des lignes, références traduites en uuid"""
+        par_table: Dict[str, List[str]] = {}
+        for table, uuid in cles:
+            par_table.setdefault(table, []).append(uuid)
+
+        lignes = {}
+        for table, uuids in par_table.items():
+            if table not in _COLONNES:
+                continue
+            references = _REFERENCES.get(table, {})
+            colonnes = [f"t.{c}" for c in _COLONNES[table]]
+            jointures = []
+            for i, (colonne, cible) in enumerate(references.items()):
+                colonnes.append(f"r{i}.uuid AS {colonne}")
+                jointures.append(f"LEFT JOIN {cible} r{i} ON r{i}.id = t.{colonne}")
+            noms = list(_COLONNES[table]) + list(references)
+            for i in range(0, len(uuids), TAILLE_LOT_IN):
+                lot = uuids[i:i + TAILLE_LOT_IN]
+                cur.execute(f"""
+                    SELECT t.uuid, {", ".join(colonnes)} FROM {table} t {" ".join(jointures)}
+                    WHERE t.uuid IN ({", ".join("?" * len(lot))})
+                """, lot)
+                for r in cur.fetchall():
+                    lignes[(table, r[0])] = dict(zip(noms, r[1:]))
+        return lignes
+
+    # --- Réception ---
+
+    def importer(self) -> int:
+        """Applique les lots des autres postes pas encore reçus; retourne le nombre de changements appliqués"""
+        a_lire: Dict[str, List[Tuple[int, str]]] = {}
+        for nom in self.transport.lister():
+            m = _NOM_LOT.match(nom)
+            if m and m.group("appareil") != self.appareil:
+                a_lire.setdefault(m.group("appareil"), []).append((int(m.group("fin")), nom))
+
+        appliques = 0
+        for appareil, lots in a_lire.items():
+            recu = int(self._meta(f"recu:{appareil}", "0"))
+            for fin, nom in sorted(lots):
+                if fin <= recu:
+                    continue
+                lot = json.loads(self.transport.lire(nom))
+                appliques += self._appliquer_lot(lot)
+                recu = fin
+        return appliques
+
+    def _appliquer_lot(self, lot: Dict[str, Any]) -> int:
+        rang = {t: i for i, t in enumerate(_ORDRE)}
+        changements = sorted(
+            lot['changements'],
+            key=lambda c: (c['operation'] == "delete",
+                           -rang[c['table']] if c['operation'] == "delete" else rang[c['table']])
+        )
+        appliques = 0
+        with self.db.transaction():
+            cur = self.db.cursor()
+            # Les triggers de change_log ne journalisent pas ces écritures: la version
+            # distante est inscrite telle quelle ci-dessous
+            cur.execute("INSERT OR REPLACE INTO sync_meta (cle, valeur) VALUES ('application_distante', '1')")
+            for c in changements:
+                if not self._plus_recent(cur, c, lot['appareil']):
+                    continue
+                if self._appliquer(cur, c):
+                    appliques += 1
+                cur.execute("""
+                    INSERT OR REPLACE INTO change_log (table_name, uuid, operation, modifie_le, appareil)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (c['table'], c['uuid'], c['operation'], c['modifie_le'], lot['appareil']))
+            cur.execute("DELETE FROM sync_meta WHERE cle = 'application_distante'")
+            self._ecrire_meta(cur, f"recu:{lot['appareil']}", lot['fin'])
+        return appliques
+
+    @staticmethod
+    def _plus_recent(cur: sqlite3.Cursor, c: Dict[str, Any], appareil: str) -> bool:
+        """Dernière écriture gagnante, départagée par l'identifiant du poste"""
+        cur.execute("SELECT modifie_le, appareil FROM change_log WHERE table_name = ? AND uuid = ?",
+                    (c['table'], c['uuid']))
+        local = cur.fetchone()
+        return local is None or (c['modifie_le'], appareil) > (local[0], local[1])
+
+    def _id_local(self, cur: sqlite3.Cursor, table: str, uuid: Optional[str]) -> Optional[int]:
+        if uuid is None:
+            return None
+        cur.execute(f"SELECT id FROM {table} WHERE uuid = ?", (uuid,))
+        r = cur.fetchone()
+        return r[0] if r else None
+
+    def _appliquer(self, cur: sqlite3.Cursor, c: Dict[str, Any]) -> bool:
+        table, uuid = c['table'], c['uuid']
+        if table == "group_members":
+            return self._appliquer_appartenance(cur, uuid, c['operation'])
+
+        local_id = self._id_local(cur, table, uuid)
+        if c['operation'] == "delete":
+            if local_id is None:
+                return False
+            # Avant la suppression: une présence doit encore être lue (membre, événement)
+            self._publier(table, SUPPRESSION, local_id, cur)
+            cur.execute(f"DELETE FROM {table} WHERE id = ?", (local_id,))
+            return True
+
+        valeurs = dict(c['ligne'])
+        for colonne, cible in _REFERENCES.get(table, {}).items():
+            valeurs[colonne] = self._id_local(cur, cible, valeurs.get(colonne))
+            if valeurs[colonne] is None and colonne in _REFERENCES_OBLIGATOIRES.get(table, ()):
+                return False
+        colonnes = list(valeurs)
+        if local_id is not None:
+            if table == "groups":
+                self._liberer_nom_groupe(cur, uuid, valeurs)
+            cur.execute(f"UPDATE {table} SET {', '.join(f'{k} = ?' for k in colonnes)} WHERE id = ?",
+                        [valeurs[k] for k in colonnes] + [local_id])
+            self._publier(table, MODIFICATION, local_id, cur)
+            return True
+
+        if table == "groups":
+            self._liberer_nom_groupe(cur, uuid, valeurs)
+        cur.execute(f"""
+            INSERT INTO {table} (uuid, {", ".join(colonnes)})
+            VALUES (?, {", ".join("?" * len(colonnes))})
+        """, [uuid] + [valeurs[k] for k in colonnes])
+        self._publier(table, INSERTION, cur.lastrowid, cur)
+        return True
+
+    def _liberer_nom_groupe(self, cur: sqlite3.Cursor, uuid: str, valeurs: Dict[str, Any]):
+        """Même nom de groupe créé sur deux postes: les deux sont gardés et celui
+        de plus grand uuid prend un suffixe, pour que tous les postes convergent"""
+        cur.execute("SELECT id, uuid FROM groups WHERE nom = ? AND uuid <> ?", (valeurs['nom'], uuid))
+        autre = cur.fetchone()
+        if autre is None:
+            return
+        if uuid > autre[1]:
+            valeurs['nom'] = f"{valeurs['nom']} ({uuid[:8]})"
+        else:
+            cur.execute("UPDATE groups SET nom = ? WHERE id = ?", (f"{valeurs['nom']} ({autre[1][:8]})", autre[0]))
+            self.db.publier("groups", MODIFICATION, [autre[0]])
+
+    def _appliquer_appartenance(self, cur: sqlite3.Cursor, cle: str, operation: str) -> bool:
+        groupe_uuid, _, membre_uuid = cle.partition(":")
+        group_id = self._id_local(cur, "groups", groupe_uuid)
+        member_id = self._id_local(cur, "members", membre_uuid)
+        if group_id is None or member_id is None:
+            return False
+        if operation == "delete":
+            cur.execute("DELETE FROM group_members WHERE group_id = ? AND member_id = ?", (group_id, member_id))
+            operation_bus = SUPPRESSION
+        else:
+            cur.execute("INSERT OR IGNORE INTO group_members (group_id, member_id) VALUES (?, ?)",
+                        (group_id, member_id))
+            operation_bus = INSERTION
+        if cur.rowcount:
+            self.db.publier("group_members", operation_bus, [member_id], group_id)
+        return True
+
+    def _publier(self, table: str, operation: str, local_id: int, cur: sqlite3.Cursor):
+        """Même forme que les managers: présences publiées par membre et événement"""
+        if table != "presences":
+            self.db.publier(table, operation, [local_id])
+            return
+        cur.execute("SELECT member_id, event_id FROM presences WHERE id = ?", (local_id,))
+        member_id, event_id = cur.fetchone()
+        self.db.invalider_taux([member_id])
+        self.db.publier("presences", operation, [member_id], event_id)
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from db import DBManager
+
+    parser = argparse.ArgumentParser(description="Synchronisation des postes PerspectiVo")
+    parser.add_argument("mode", choices=["dossier", "http", "serveur"])
+    parser.add_argument("cible", help="Dossier partagé (dossier, serveur) ou URL du serveur (http)")
+    parser.add_argument("--db", type=Path, default=None, help="Chemin de la base (défaut: dossier de l'app)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--hote", default="127.0.0.1",
+                        help="Interface d'écoute du serveur (défaut: machine locale seulement)")
+    parser.add_argument("--secret", default=os.environ.get("PERSPECTIVO_SYNC_SECRET"),
+                        help="Secret partagé des postes (défaut: $PERSPECTIVO_SYNC_SECRET)")
+    args = parser.parse_args()
+    if args.mode != "dossier" and not args.secret:
+        parser.error("--secret ou PERSPECTIVO_SYNC_SECRET est requis en mode http et serveur")
+
+    if args.mode == "serveur":
+        serveur = ServeurSync(Path(args.cible), args.secret, hote=args.hote, port=args.port)
+        print(f"Serveur de synchronisation sur {args.hote}:{args.port} ({args.cible})")
+        serveur.serve_forever()
+    else:
+        db = DBManager(args.db)
+        transport = TransportDossier(Path(args.cible)) if args.mode == "dossier" \
+            else TransportHTTP(args.cible, args.secret)
+        resultat = MoteurSync(db, transport).synchroniser()
+        print(f"{resultat['recus']} changements reçus, {resultat['envoyes']} envoyés.")
+        db.fermer()
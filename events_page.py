@@ -1,7 +1,10 @@
 from PySide6.QtWidgets import *
-from PySide6.QtCore import Qt, QDate, Signal
+from PySide6.QtCore import Qt, QDate, QTimer
 from PySide6.QtGui import QIcon, QPixmap, QColor, QPainter
 from datetime import datetime, date
+from changements_qt import obtenir_pont
+from db_async_qt import RequetesPage
+from db import jour_depuis_date
 
 
 class ModernButton(QPushButton):
@@ -239,14 +242,15 @@ class EventEditorDialog(QDialog):
                 )
                 QMessageBox.information(self, "Succès", f"Événement '{nom}' créé!")
             else:
-                cur = self.evenements_mgr.db.cursor()
-                cur.execute("""
-                    UPDATE events SET nom=?, date=?, heure=?, lieu=?, description=?, groupe_id=?
-                    WHERE id=?
-                """, (nom, date_str, heure_str, self.lieu_input.text().strip(),
-                      self.description_input.toPlainText().strip(),
-                      self.groupe_combo.currentData(), self.event_id))
-                self.evenements_mgr.db.commit()
+                self.evenements_mgr.modifier_evenement(
+                    self.event_id,
+                    nom=nom,
+                    date=date_str,
+                    heure=heure_str,
+                    lieu=self.lieu_input.text().strip(),
+                    description=self.description_input.toPlainText().strip(),
+                    groupe_id=self.groupe_combo.currentData()
+                )
                 QMessageBox.information(self, "Succès", "Événement modifié!")
             
             self.accept()
@@ -255,15 +259,28 @@ class EventEditorDialog(QDialog):
 
 
 class EventsPage(QWidget):
-    events_changed = Signal()
-    
     def __init__(self, evenements_mgr, groupes_mgr, presences_mgr):
         super().__init__()
         self.evenements_mgr = evenements_mgr
         self.groupes_mgr = groupes_mgr
         self.presences_mgr = presences_mgr
+        self.groupes = {}  # id -> groupe agrégé, rechargé par refresh_events
+        self.evenements = []  # événements affichés, dans l'ordre des cartes
+        self.cartes = {}  # id -> carte
+        
+        # Changements reçus, appliqués ensemble au prochain tour de boucle
+        self._evenements_modifies = set()
+        self._groupes_modifies = False
+        self.maj_timer = QTimer(self)
+        self.maj_timer.setSingleShot(True)
+        self.maj_timer.setInterval(0)
+        self.maj_timer.timeout.connect(self.appliquer_changements)
+        # Chargements exécutés hors du thread de l'interface
+        self.requetes = RequetesPage(self.evenements_mgr.db, self)
+        self._a_recharger = False
         
         self.init_ui()
+        obtenir_pont(self.evenements_mgr.db).changement.connect(self.on_changement)
     
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -310,33 +327,121 @@ class EventsPage(QWidget):
         self.refresh_events()
     
     def refresh_events(self):
-        """Recharge la liste des événements"""
-        # Vider le layout
-        for i in reversed(range(self.scroll_layout.count())):
-            widget = self.scroll_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
-        
-        filter_index = self.filter_combo.currentIndex()
+        """Recharge la liste des événements (requêtes dans le pool de la base)"""
+        self.requetes.lancer(self._charger_evenements, self.filter_combo.currentIndex(),
+                             cle="liste", rappel=self.afficher_evenements)
+    
+    def _charger_evenements(self, filter_index):
+        """Exécuté hors du thread de l'interface: pas d'accès aux widgets"""
+        # Groupes chargés une fois pour toutes les cartes
+        groupes = {g['id']: g for g in self.groupes_mgr.obtenir_groupes_agreges()}
         if filter_index == 1:
             evenements = self.evenements_mgr.obtenir_tous_evenements(futurs_seulement=True)
         elif filter_index == 2:
-            all_events = self.evenements_mgr.obtenir_tous_evenements()
-            today = date.today().isoformat()
-            evenements = [e for e in all_events if e['date'] < today]
+            evenements = self.evenements_mgr.obtenir_tous_evenements(passes_seulement=True)
         else:
             evenements = self.evenements_mgr.obtenir_tous_evenements()
+        return groupes, evenements
+    
+    def afficher_evenements(self, resultat):
+        for carte in self.cartes.values():
+            carte.hide()
+            carte.deleteLater()
+        self.cartes = {}
+        
+        self.groupes, self.evenements = resultat
+        for event in self.evenements:
+            self.cartes[event['id']] = self.create_event_card(event)
+        self.placer_cartes()
+        if self._evenements_modifies or self._groupes_modifies:
+            self.maj_timer.start()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._a_recharger:
+            self._a_recharger = False
+            self.refresh_events()
+    
+    def hideEvent(self, event):
+        # Page quittée: abandonner le chargement en cours, il sera relancé au retour
+        if self.requetes.annuler_tout():
+            self._a_recharger = True
+        super().hideEvent(event)
+    
+    def dans_filtre(self, event):
+        filter_index = self.filter_combo.currentIndex()
+        if filter_index == 0:
+            return True
+        # Comme en SQL: un événement sans date lisible n'est ni futur ni passé
+        if event['date_jour'] is None:
+            return False
+        today = jour_depuis_date(date.today())
+        if filter_index == 1:
+            return event['date_jour'] >= today
+        return event['date_jour'] < today
+    
+    def on_changement(self, changement):
+        if changement.table == "events":
+            self._evenements_modifies.update(changement.ids)
+            self.maj_timer.start()
+        elif changement.table == "groups":
+            # Nom ou couleur du groupe affichés sur les cartes
+            self._groupes_modifies = True
+            self.maj_timer.start()
+    
+    def appliquer_changements(self):
+        """Met à jour uniquement les cartes des événements concernés"""
+        if self.requetes.en_cours("liste"):
+            return  # appliqué à l'arrivée de la liste (afficher_evenements)
+        modifies, self._evenements_modifies = self._evenements_modifies, set()
+        if self._groupes_modifies:
+            self._groupes_modifies = False
+            anciens = self.groupes
+            self.groupes = {g['id']: g for g in self.groupes_mgr.obtenir_groupes_agreges()}
+            changes = {
+                gid for gid, g in anciens.items()
+                if gid not in self.groupes or
+                (g['nom'], g['couleur']) != (self.groupes[gid]['nom'], self.groupes[gid]['couleur'])
+            }
+            modifies.update(e['id'] for e in self.evenements if e['groupe_id'] in changes)
+        if not modifies:
+            return
         
-        if not evenements:
+        self.evenements = [e for e in self.evenements if e['id'] not in modifies]
+        for event_id in modifies:
+            carte = self.cartes.pop(event_id, None)
+            if carte is not None:
+                carte.hide()
+                carte.deleteLater()
+            event = self.evenements_mgr.obtenir_evenement(event_id)
+            if event is not None and self.dans_filtre(event):
+                self.evenements.append(event)
+                self.cartes[event_id] = self.create_event_card(event)
+        
+        # Même ordre que obtenir_tous_evenements (NULL en premier, comme SQLite)
+        self.evenements.sort(key=lambda e: (e['date_jour'] is not None, e['date_jour'] or 0,
+                                            e['heure_minutes'] is not None, e['heure_minutes'] or 0),
+                             reverse=self.filter_combo.currentIndex() != 1)
+        self.placer_cartes()
+    
+    def placer_cartes(self):
+        """Replace les cartes existantes dans la grille, dans l'ordre de self.evenements"""
+        while self.scroll_layout.count():
+            widget = self.scroll_layout.takeAt(0).widget()
+            if widget is not None and not isinstance(widget, ModernCard):
+                widget.deleteLater()
+        for ligne in range(self.scroll_layout.rowCount()):
+            self.scroll_layout.setRowStretch(ligne, 0)
+        
+        if not self.evenements:
             empty_label = QLabel("Aucun événement. Cliquez sur '➕ Créer un événement' pour commencer.")
             empty_label.setStyleSheet("color: #9CA3AF; font-size: 13px; padding: 20px;")
             empty_label.setAlignment(Qt.AlignCenter)
             self.scroll_layout.addWidget(empty_label, 0, 0)
             return
         
-        for i, event in enumerate(evenements):
-            event_card = self.create_event_card(event)
-            self.scroll_layout.addWidget(event_card, i // 3, i % 3)
+        for i, event in enumerate(self.evenements):
+            self.scroll_layout.addWidget(self.cartes[event['id']], i // 3, i % 3)
         
         self.scroll_layout.setRowStretch(self.scroll_layout.rowCount(), 1)
         self.scroll_layout.setColumnStretch(3, 1)
@@ -401,7 +506,7 @@ class EventsPage(QWidget):
         # Groupe
         groupe_id = event.get('groupe_id')
         if groupe_id:
-            groupe = self.groupes_mgr.obtenir_groupe(groupe_id)
+            groupe = self.groupes.get(groupe_id)
             if groupe:
                 groupe_label = QLabel(f"👥 {groupe['nom']}")
                 groupe_label.setStyleSheet(f"color: {groupe['couleur']}; font-size: 11px; font-weight: bold;")
@@ -462,16 +567,12 @@ class EventsPage(QWidget):
     def add_event(self):
         """Crée un nouvel événement"""
         dialog = EventEditorDialog(self.evenements_mgr, self.groupes_mgr, parent=self)
-        if dialog.exec():
-            self.refresh_events()
-            self.events_changed.emit()
+        dialog.exec()  # La carte est ajoutée par on_changement
     
     def edit_event(self, event_id):
         """Modifie un événement"""
         dialog = EventEditorDialog(self.evenements_mgr, self.groupes_mgr, event_id=event_id, parent=self)
-        if dialog.exec():
-            self.refresh_events()
-            self.events_changed.emit()
+        dialog.exec()  # La carte est mise à jour par on_changement
     
     def view_event(self, event_id):
         """Affiche les détails d'un événement"""
@@ -561,7 +662,5 @@ class EventsPage(QWidget):
             try:
                 self.evenements_mgr.supprimer_evenement(event_id)
                 QMessageBox.information(self, "Succès", f"'{nom}' a été supprimé.")
-                self.refresh_events()
-                self.events_changed.emit()
             except Exception as e:
                 QMessageBox.warning(self, "Erreur", str(e))
\ No newline at end of file
@@ -1,7 +1,11 @@
+import sqlite3
+
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QTextEdit,QHBoxLayout, QComboBox, QListWidget, \
     QListWidgetItem, QMessageBox, QPushButton
 
+from db_async_qt import RequetesPage
+
 
 class ModernButton(QPushButton):
     def __init__(self, text, primary=False, parent=None):
@@ -48,6 +52,8 @@ class GroupEditorDialog(QDialog):
         self.membres_mgr = membres_mgr
         self.groupe_id = groupe_id
         self.selected_members = []
+        # Membres et recherches lus hors du thread de l'interface
+        self.requetes = RequetesPage(groupes_mgr.db, self)
 
         self.setWindowTitle("Nouveau groupe" if groupe_id is None else "Modifier le groupe")
         self.setFixedSize(600, 700)
@@ -208,36 +214,68 @@ class GroupEditorDialog(QDialog):
         cancel_btn.clicked.connect(self.reject)
 
         save_text = "Créer le groupe" if self.groupe_id is None else "Enregistrer les modifications"
-        save_btn = ModernButton(save_text, primary=True)
-        save_btn.clicked.connect(self.validate_and_save)
+        self.save_btn = ModernButton(save_text, primary=True)
+        self.save_btn.clicked.connect(self.validate_and_save)
+        # Pas d'enregistrement avant que la liste (et la sélection) soit chargée
+        self.save_btn.setEnabled(False)
 
         buttons_layout.addWidget(cancel_btn)
-        buttons_layout.addWidget(save_btn)
+        buttons_layout.addWidget(self.save_btn)
         layout.addLayout(buttons_layout)
 
     def load_membres(self):
         """Charge tous les membres dans la liste avec des checkboxes"""
         self.membres_list.clear()
-        tous_membres = self.membres_mgr.obtenir_tous_membres()
+        self.requetes.lancer(self._charger_membres, cle="membres", rappel=self.afficher_membres)
 
-        for membre in tous_membres:
-            item = QListWidgetItem(f"{membre['nom']} {membre['prenoms']}")
-            item.setData(Qt.UserRole, membre['id'])
+    def _charger_membres(self):
+        """Exécuté hors du thread de l'interface: membres et membres actuels du groupe"""
+        membres = [(m['id'], m['nom'], m['prenoms']) for m in self.membres_mgr.iter_membres()]
+        membres_groupe = set()
+        if self.groupe_id:
+            membres_groupe = {m['id'] for m in self.membres_mgr.obtenir_membres_du_groupe(self.groupe_id)}
+        return membres, membres_groupe
+
+    def afficher_membres(self, resultat):
+        membres, membres_groupe = resultat
+        for membre_id, nom, prenoms in membres:
+            item = QListWidgetItem(f"{nom} {prenoms}")
+            item.setData(Qt.UserRole, membre_id)
             item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-            item.setCheckState(Qt.Unchecked)
+            # Cocher les membres du groupe
+            item.setCheckState(Qt.Checked if membre_id in membres_groupe else Qt.Unchecked)
             self.membres_list.addItem(item)
 
         # Connecter le signal de changement
         self.membres_list.itemChanged.connect(self.update_count)
+        self.update_count()
+        self.save_btn.setEnabled(True)
+        if self.search_membres_input.text().strip():
+            self.filter_membres()
 
     def filter_membres(self):
         """Filtre la liste des membres selon la recherche"""
-        search_text = self.search_membres_input.text().lower()
-
+        search_text = self.search_membres_input.text().strip()
+        if not search_text:
+            self.requetes.annuler("filtre")
+            self.appliquer_filtre(None)
+            return
+        # Une frappe remplace la recherche précédente encore en cours
+        self.requetes.lancer(
+            lambda texte: {m['id'] for m in self.membres_mgr.rechercher_membres(texte, limit=None)},
+            search_text, cle="filtre", rappel=self.appliquer_filtre
+        )
+
+    def appliquer_filtre(self, trouves):
+        """trouves: ids à afficher (None: tous)"""
         for i in range(self.membres_list.count()):
             item = self.membres_list.item(i)
-            item_text = item.text().lower()
-            item.setHidden(search_text not in item_text)
+            item.setHidden(trouves is not None and item.data(Qt.UserRole) not in trouves)
+
+    def done(self, resultat):
+        # Dialogue fermé: les résultats en attente ne servent plus
+        self.requetes.annuler_tout()
+        super().done(resultat)
 
     def update_count(self):
         """Met à jour le compteur de membres sélectionnés"""
@@ -261,16 +299,7 @@ class GroupEditorDialog(QDialog):
             index = self.color_combo.findData(couleur)
             if index >= 0:
                 self.color_combo.setCurrentIndex(index)
-
-            # Cocher les membres du groupe
-            membres_groupe = self.groupes_mgr.obtenir_membres_groupe(self.groupe_id)
-            membres_ids = [m['id'] for m in membres_groupe]
-
-            for i in range(self.membres_list.count()):
-                item = self.membres_list.item(i)
-                membre_id = item.data(Qt.UserRole)
-                if membre_id in membres_ids:
-                    item.setCheckState(Qt.Checked)
+            # Les membres du groupe sont cochés par afficher_membres
 
     def validate_and_save(self):
         """Valide et sauvegarde le groupe"""
@@ -291,42 +320,39 @@ class GroupEditorDialog(QDialog):
             if item.checkState() == Qt.Checked:
                 selected_members.append(item.data(Qt.UserRole))
         try:
-            if self.groupe_id is None:
-                # Créer un nouveau groupe
-                groupe_id = self.groupes_mgr.ajouter_groupe(nom, description, couleur)
-                # Ajouter les membres au groupe
-                for membre_id in selected_members:
-                    self.groupes_mgr.ajouter_membre_groupe(membre_id, groupe_id)
+            # Une seule transaction (un seul commit) pour le groupe et tous ses membres
+            with self.groupes_mgr.db.transaction():
+                if self.groupe_id is None:
+                    # Créer un nouveau groupe
+                    groupe_id = self.groupes_mgr.ajouter_groupe(nom, description, couleur)
+                    # Ajouter les membres au groupe
+                    self.groupes_mgr.ajouter_membres_au_groupe_bulk(groupe_id, selected_members)
+                else:
+                    # Modifier le groupe existant
+                    # Mettre à jour les informations du groupe
+                    self.groupes_mgr.modifier_groupe(
+                        self.groupe_id,
+                        nom=nom,
+                        description=description,
+                        couleur=couleur
+                    )
+
+                    # Récupérer les membres actuels
+                    membres_actuels = self.membres_mgr.obtenir_membres_du_groupe(self.groupe_id)
+                    membres_actuels_ids = {m['id'] for m in membres_actuels}
+                    selection = set(selected_members)
+
+                    # Retirer les membres qui ne sont plus sélectionnés, ajouter les nouveaux
+                    self.groupes_mgr.retirer_membres_du_groupe_bulk(self.groupe_id, membres_actuels_ids - selection)
+                    self.groupes_mgr.ajouter_membres_au_groupe_bulk(self.groupe_id, selection - membres_actuels_ids)
 
+            if self.groupe_id is None:
                 QMessageBox.information(self, "Succès", f"Groupe '{nom}' créé avec {len(selected_members)} membre(s)!")
             else:
-                # Modifier le groupe existant
-                # Mettre à jour les informations du groupe
-                self.groupes_mgr.modifier_groupe(
-                    self.groupe_id,
-                    nom=nom,
-                    description=description,
-                    couleur=couleur
-                )
-
-                # Récupérer les membres actuels
-                membres_actuels = self.groupes_mgr.obtenir_membres_du_groupe(self.groupe_id)
-                membres_actuels_ids = [m['id'] for m in membres_actuels]
-
-                # Retirer les membres qui ne sont plus sélectionnés
-                for membre_id in membres_actuels_ids:
-                    if membre_id not in selected_members:
-                        self.groupes_mgr.retirer_membre_du_groupe(membre_id, self.groupe_id)
-
-                # Ajouter les nouveaux membres
-                for membre_id in selected_members:
-                    if membre_id not in membres_actuels_ids:
-                        self.groupes_mgr.ajouter_membre_au_groupe(membre_id, self.groupe_id)
-
                 QMessageBox.information(self, "Succès",
                                         f"Groupe '{nom}' modifié avec {len(selected_members)} membre(s)!")
 
             self.accept()
 
-        except ValueError as e:
+        except (ValueError, sqlite3.IntegrityError) as e:
             QMessageBox.warning(self, "Erreur", str(e))
@@ -2,6 +2,9 @@ from PySide6.QtWidgets import *
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from group_editor import GroupEditorDialog
+from changements import SUPPRESSION
+from changements_qt import obtenir_pont
+from db_async_qt import RequetesPage
 
 
 class ModernCard(QFrame):
@@ -62,14 +65,20 @@ class ModernButton(QPushButton):
 
 
 class GroupsPage(QWidget):
-    # Signal pour notifier les autres pages d'un changement
-    groups_changed = Signal()
-    
     def __init__(self, groupes_mgr, membres_mgr):
         super().__init__()
         self.groupes_mgr = groupes_mgr
         self.membres_mgr = membres_mgr
-        self.refresh_timer = QTimer()
+        self.groupes = []  # groupes affichés, dans l'ordre des cartes
+        self.cartes = {}  # id -> (carte, clé d'affichage)
+        # Regroupe les changements d'une même transaction en une seule mise à jour
+        self.maj_timer = QTimer(self)
+        self.maj_timer.setSingleShot(True)
+        self.maj_timer.setInterval(0)
+        self.maj_timer.timeout.connect(self.refresh_groups)
+        # Chargements exécutés hors du thread de l'interface
+        self.requetes = RequetesPage(self.groupes_mgr.db, self)
+        self._a_recharger = False
         self.init_ui()
         self.setup_signals()
 
@@ -107,31 +116,76 @@ class GroupsPage(QWidget):
         self.refresh_groups()
 
     def setup_signals(self):
-        """Configure les signaux et timers"""
-        # Timer pour rafraîchir tous les 30 secondes (optionnel)
-        self.refresh_timer.timeout.connect(self.refresh_groups)
-        self.refresh_timer.start(30000)  # Décommenter si rafraîchissement auto souhaité
+        """Abonnement aux changements publiés par les managers"""
+        obtenir_pont(self.groupes_mgr.db).changement.connect(self.on_changement)
 
-    def refresh_groups(self):
-        """Recharge et affiche tous les groupes"""
-        # Vider le layout
-        for i in reversed(range(self.scroll_layout.count())):
-            widget = self.scroll_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
+    def on_changement(self, changement):
+        # Seuls ces changements modifient une carte (nom, couleur, nombre de membres)
+        if changement.table in ("groups", "group_members") or \
+                (changement.table == "members" and changement.operation == SUPPRESSION):
+            self.maj_timer.start()
 
-        # Charger les groupes
-        groupes = self.groupes_mgr.obtenir_tous_groupes()
+    @staticmethod
+    def cle_affichage(groupe):
+        """Ce qu'affiche la carte: elle n'est reconstruite que si cela change"""
+        return groupe['nom'], groupe['couleur'], groupe['description'], groupe['nombre_membres']
+
+    def refresh_groups(self):
+        """Recharge les groupes (une requête, dans le pool de la base)"""
+        self.requetes.lancer(self.groupes_mgr.obtenir_groupes_agreges, cle="liste", rappel=self.afficher_groupes)
+
+    def afficher_groupes(self, groupes):
+        """Ne reconstruit que les cartes modifiées"""
+        ids = {g['id'] for g in groupes}
+
+        for groupe_id in [i for i in self.cartes if i not in ids]:
+            carte, _ = self.cartes.pop(groupe_id)
+            carte.hide()
+            carte.deleteLater()
+
+        for groupe in groupes:
+            cle = self.cle_affichage(groupe)
+            ancienne = self.cartes.get(groupe['id'])
+            if ancienne is not None and ancienne[1] == cle:
+                continue
+            if ancienne is not None:
+                ancienne[0].hide()
+                ancienne[0].deleteLater()
+            self.cartes[groupe['id']] = (self.create_group_card(groupe), cle)
+
+        self.groupes = groupes
+        self.placer_cartes()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._a_recharger:
+            self._a_recharger = False
+            self.refresh_groups()
 
-        if not groupes:
+    def hideEvent(self, event):
+        # Page quittée: abandonner le chargement en cours, il sera relancé au retour
+        if self.requetes.annuler_tout():
+            self._a_recharger = True
+        super().hideEvent(event)
+
+    def placer_cartes(self):
+        """Replace les cartes existantes dans la grille, dans l'ordre de self.groupes"""
+        while self.scroll_layout.count():
+            widget = self.scroll_layout.takeAt(0).widget()
+            if widget is not None and not isinstance(widget, ModernCard):
+                widget.deleteLater()
+        for ligne in range(self.scroll_layout.rowCount()):
+            self.scroll_layout.setRowStretch(ligne, 0)
+
+        if not self.groupes:
             empty_label = QLabel("Aucun groupe créé. Cliquez sur '➕ Créer un groupe' pour commencer.")
             empty_label.setStyleSheet("color: #9CA3AF; font-size: 13px; padding: 20px;")
             empty_label.setAlignment(Qt.AlignCenter)
             self.scroll_layout.addWidget(empty_label, 0, 0)
             return
 
-        for i, groupe in enumerate(groupes):
-            group_card = self.create_group_card(groupe)
+        for i, groupe in enumerate(self.groupes):
+            group_card = self.cartes[groupe['id']][0]
             self.scroll_layout.addWidget(group_card, i // 3, i % 3)
 
         # Ajouter du stretch
@@ -200,16 +254,12 @@ class GroupsPage(QWidget):
     def create_group(self):
         """Ouvre le dialog de création de groupe"""
         dialog = GroupEditorDialog(self.groupes_mgr, self.membres_mgr, parent=self)
-        if dialog.exec() == QDialog.Accepted:
-            self.refresh_groups()
-            self.groups_changed.emit()  # Notifier les autres pages
+        dialog.exec()  # Les cartes sont mises à jour par on_changement
 
     def edit_group(self, groupe_id):
         """Ouvre le dialog de modification de groupe"""
         dialog = GroupEditorDialog(self.groupes_mgr, self.membres_mgr, groupe_id=groupe_id, parent=self)
-        if dialog.exec() == QDialog.Accepted:
-            self.refresh_groups()
-            self.groups_changed.emit()  # Notifier les autres pages
+        dialog.exec()  # Les cartes sont mises à jour par on_changement
 
     def view_group(self, groupe_id):
         """Affiche les détails d'un groupe dans un dialog"""
@@ -324,12 +374,5 @@ class GroupsPage(QWidget):
         if reply == QMessageBox.Yes:
             if self.groupes_mgr.supprimer_groupe(groupe_id):
                 QMessageBox.information(self, "Succès", f"Le groupe '{nom_groupe}' a été supprimé.")
-                self.refresh_groups()
-                self.groups_changed.emit()  # Notifier les autres pages
             else:
                 QMessageBox.warning(self, "Erreur", "Impossible de supprimer le groupe.")
-
-    def closeEvent(self, event):
-        """Nettoie les ressources avant fermeture"""
-        self.refresh_timer.stop()
-        super().closeEvent(event)
\ No newline at end of file
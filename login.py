@@ -3,7 +3,7 @@ import os
 from PySide6.QtWidgets import *
 from PySide6.QtCore import *
 from PySide6.QtGui import *
-from db import creer_gestionnaire_db
+from db import obtenir_gestionnaire_db
 
 
 class ModernCard(QFrame):
@@ -104,7 +104,7 @@ class LoginPage(QWidget):
     def __init__(self):
         super().__init__()
         self.init_ui()
-        self.db_manager, *_ = creer_gestionnaire_db()
+        self.db_manager, *_ = obtenir_gestionnaire_db()
 
     def init_ui(self):
         main_layout = QVBoxLayout(self)
@@ -179,8 +179,7 @@ class LoginPage(QWidget):
             return
 
         try:
-            conn = self.db_manager
-            cursor = conn.cursor()
+            cursor = self.db_manager.lecture()
             cursor.execute("SELECT * FROM users WHERE email = ? OR nom = ?", (email, email))
             user = cursor.fetchone()
         except Exception as e:
@@ -221,7 +220,7 @@ class SignupPage(QWidget):
     def __init__(self):
         super().__init__()
         self.init_ui()
-        self.db_manager, *_ = creer_gestionnaire_db()
+        self.db_manager, *_ = obtenir_gestionnaire_db()
 
     def init_ui(self):
         main_layout = QVBoxLayout(self)
@@ -335,14 +334,13 @@ class SignupPage(QWidget):
         hashed = hash_password(self.password.text())
 
         try:
-            conn = self.db_manager
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO users (nom, prenoms, email, password_hash)
-                VALUES (?, ?, ?, ?)
-            """, (self.last_name.text().strip(), self.first_name.text().strip(),
-                  self.username.text().strip(), hashed.decode()))
-            conn.commit()
+            with self.db_manager.transaction():
+                cursor = self.db_manager.cursor()
+                cursor.execute("""
+                    INSERT INTO users (nom, prenoms, email, password_hash)
+                    VALUES (?, ?, ?, ?)
+                """, (self.last_name.text().strip(), self.first_name.text().strip(),
+                      self.username.text().strip(), hashed.decode()))
         except Exception as e:
             QMessageBox.warning(self, "Erreur", f"Impossible de créer le compte: {e}")
             return
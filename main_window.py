@@ -10,7 +10,8 @@ from messages_page import MessagesPage
 from events_page import EventsPage
 from stats_page import StatisticsPage
 
-from db import creer_gestionnaire_db
+from db import obtenir_gestionnaire_db, fermer_gestionnaire_db
+from db_backup import ServiceSauvegarde
 from login import AuthWindow
 
 
@@ -102,9 +103,13 @@ class MainWindow(QMainWindow):
         
         # Créer les managers DB
         self.db, self.membres_mgr, self.evenements_mgr, self.groupes_mgr, \
-            self.presences_mgr, self.messages_mgr = creer_gestionnaire_db()
+            self.presences_mgr, self.messages_mgr = obtenir_gestionnaire_db()
         
         self.init_ui()
+        
+        # Sauvegarde quotidienne en arrière-plan (dossier "sauvegardes" de l'app)
+        self.sauvegardes = ServiceSauvegarde(self.db)
+        self.sauvegardes.sauvegarder_si_necessaire()
 
     def init_ui(self):
         # Widget central
@@ -190,15 +195,12 @@ class MainWindow(QMainWindow):
 
         # Créer les pages
         self.members_page = MembersPage(self.membres_mgr)
-        self.events_page = EventsPage(self.evenements_mgr, self.groupes_mgr, self.membres_mgr)
+        self.events_page = EventsPage(self.evenements_mgr, self.groupes_mgr, self.presences_mgr)
         self.groups_page = GroupsPage(self.groupes_mgr, self.membres_mgr)
         self.messages_page = MessagesPage(self.groupes_mgr, self.membres_mgr)
         self.stat_page = StatisticsPage(self.membres_mgr, self.evenements_mgr, self.groupes_mgr, self.presences_mgr)
 
-        # Connecter les signaux de synchronisation
-        self.groups_page.groups_changed.connect(self.stat_page.refresh_stats)
-        self.members_page.members_changed.connect(self.stat_page.refresh_stats)
-        self.events_page.events_changed.connect(self.stat_page.refresh_stats)
+        # Les pages se synchronisent via le bus de changements de la base (db.bus)
 
         # Ajouter les pages au stack
         self.content_area.addWidget(self.members_page)
@@ -242,6 +244,8 @@ class MainWindow(QMainWindow):
 def main():
     """Point d'entrée principal de l'application"""
     app = QApplication(sys.argv)
+    # Une seule base pour toutes les fenêtres, fermée proprement à la sortie
+    app.aboutToQuit.connect(fermer_gestionnaire_db)
     
     # Configuration de la police système
     font = QFont("Segoe UI", 10)
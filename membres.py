@@ -6,8 +6,17 @@ from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from openpyxl import Workbook
+from bisect import bisect_left
+from changements import INSERTION, MODIFICATION, SUPPRESSION
+from changements_qt import obtenir_pont
+from db_async_qt import RequetesPage
 
 
+# Nombre de membres chargés à la fois dans le tableau et par lot d'export
+TAILLE_PAGE = 200
+TAILLE_LOT_EXPORT = 1000
+# Nombre maximal de résultats affichés pour une recherche
+TAILLE_RECHERCHE = 500
 
 
 class ModernCard(QFrame):
@@ -89,13 +98,29 @@ class SidebarButton(QPushButton):
 
 
 class MembersPage(QWidget):
-    members_changed = Signal()
     def __init__(self, membres_mgr):
         super().__init__()
         
         self.membres_mgr = membres_mgr
+        self._cle_derniere_page = None
+        self._tout_charge = False
+        # Une entrée par ligne du tableau: id du membre et clé de tri (nom, prenoms, id)
+        self._ids = []
+        self._cles = []
+        self._lignes = {}  # member_id -> ligne du tableau
+        # Changements reçus, appliqués ensemble au prochain tour de boucle
+        self._membres_modifies = {INSERTION: set(), MODIFICATION: set(), SUPPRESSION: set()}
+        self._taux_modifies = set()
+        self.maj_timer = QTimer(self)
+        self.maj_timer.setSingleShot(True)
+        self.maj_timer.setInterval(0)
+        self.maj_timer.timeout.connect(self.appliquer_changements)
+        # Pages et recherches lues hors du thread de l'interface (clé "liste")
+        self.requetes = RequetesPage(self.membres_mgr.db, self)
+        self._a_recharger = False
         self.init_ui()
         self.load_sample_data()
+        obtenir_pont(self.membres_mgr.db).changement.connect(self.on_changement)
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -144,7 +169,12 @@ class MembersPage(QWidget):
                 outline: none;
             }
         """)
-        self.search_input.textChanged.connect(self.search_members)
+        # Attendre une courte pause de frappe avant d'interroger la base
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.search_members)
+        self.search_input.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.search_input)
         layout.addLayout(search_layout)
 
@@ -191,45 +221,202 @@ class MembersPage(QWidget):
         self.members_table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.members_table.setShowGrid(True)
         self.members_table.verticalHeader().setVisible(False)
+        # Charger la page suivante quand on arrive en bas du tableau
+        self.members_table.verticalScrollBar().valueChanged.connect(self.on_scroll)
 
         layout.addWidget(self.members_table)
 
     def search_members(self):
-        search_text = self.search_input.text().lower()
-        for row in range(self.members_table.rowCount()):
-            show_row = False
-            for col in range(self.members_table.columnCount()):
-                item = self.members_table.item(row, col)
-                if item and search_text in item.text().lower():
-                    show_row = True
-                    break
-            self.members_table.setRowHidden(row, not show_row)
+        search_text = self.search_input.text().strip()
+        if not search_text:
+            self.load_sample_data()
+            return
+        # Index plein texte: pas de parcours du tableau, pas de pagination pendant la recherche.
+        # Une frappe remplace la recherche précédente encore en cours.
+        self.requetes.lancer(self._charger_recherche, search_text, cle="liste", rappel=self.afficher_recherche)
+
+    def afficher_recherche(self, resultat):
+        membres, taux = resultat
+        self.vider_tableau()
+        self._tout_charge = True
+        self.add_rows(membres, taux)
+        self._relancer_changements()
 
     def load_sample_data(self):
-        membres = self.membres_mgr.obtenir_tous_membres()
-        self.members_table.setRowCount(len(membres))
-        for row, membre in enumerate(membres):
-            data = [
-                membre['nom'], membre['prenoms'], membre['contact'],
-                membre['email'], membre['ecole'], membre['filiere'],
-                f"{self.membres_mgr.calculer_taux_presence(membre['id'])}%"
-            ]
-            for col, value in enumerate(data):
-                item = QTableWidgetItem(str(value))
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                if col == 6:
-                    percentage = float(value.replace('%', ''))
-                    if percentage >= 90:
-                        item.setBackground(QColor(220, 252, 231))
-                        item.setForeground(QColor(22, 101, 52))
-                    elif percentage >= 80:
-                        item.setBackground(QColor(254, 249, 195))
-                        item.setForeground(QColor(120, 113, 108))
-                    else:
-                        item.setBackground(QColor(254, 226, 226))
-                        item.setForeground(QColor(153, 27, 27))
-
-                self.members_table.setItem(row, col, item)
+        """(Re)charge le tableau à partir de la première page"""
+        if self.search_input.text().strip():
+            self.search_members()
+            return
+        self.requetes.annuler("liste")
+        self.vider_tableau()
+        self._cle_derniere_page = None
+        self._tout_charge = False
+        self.load_next_page()
+
+    def vider_tableau(self):
+        self.members_table.setRowCount(0)
+        self._ids = []
+        self._cles = []
+        self._lignes = {}
+
+    def on_scroll(self, value):
+        if value >= self.members_table.verticalScrollBar().maximum() - 5:
+            self.load_next_page()
+
+    def load_next_page(self):
+        if self._tout_charge or self.requetes.en_cours("liste"):
+            return
+        self.requetes.lancer(self._charger_page, self._cle_derniere_page, cle="liste", rappel=self.afficher_page)
+
+    def afficher_page(self, resultat):
+        membres, taux = resultat
+        if len(membres) < TAILLE_PAGE:
+            self._tout_charge = True
+        if membres:
+            self._cle_derniere_page = self.membres_mgr.cle_page(membres[-1])
+            self.add_rows(membres, taux)
+        self._relancer_changements()
+
+    # Exécutés dans le pool de la base: pas d'accès aux widgets
+    def _charger_page(self, after):
+        return self._avec_taux(self.membres_mgr.obtenir_membres_page(after=after, limit=TAILLE_PAGE))
+
+    def _charger_recherche(self, texte):
+        return self._avec_taux(self.membres_mgr.rechercher_membres(texte, limit=TAILLE_RECHERCHE))
+
+    def _avec_taux(self, membres):
+        return membres, self.membres_mgr.calculer_taux_presence_bulk([m['id'] for m in membres])
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._a_recharger:
+            self._a_recharger = False
+            self.load_sample_data()
+
+    def hideEvent(self, event):
+        # Page quittée: abandonner le chargement en cours, il sera relancé au retour
+        if self.requetes.annuler_tout():
+            self._a_recharger = True
+        super().hideEvent(event)
+
+    def add_rows(self, membres, taux):
+        """Ajoute les membres à la fin du tableau avec leur taux de présence"""
+        debut = self.members_table.rowCount()
+        self.members_table.setRowCount(debut + len(membres))
+        for row, membre in enumerate(membres, start=debut):
+            self.fill_row(row, membre, taux.get(membre['id'], 0.0))
+            self._lignes[membre['id']] = len(self._ids)
+            self._ids.append(membre['id'])
+            self._cles.append(self.membres_mgr.cle_page(membre))
+
+    def fill_row(self, row, membre, taux):
+        data = [
+            membre['nom'], membre['prenoms'], membre['contact'],
+            membre['email'], membre['ecole'], membre['filiere']
+        ]
+        for col, value in enumerate(data):
+            item = QTableWidgetItem(str(value))
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            self.members_table.setItem(row, col, item)
+        self.set_rate_item(row, taux)
+
+    def set_rate_item(self, row, percentage):
+        item = QTableWidgetItem(f"{percentage}%")
+        item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+        if percentage >= 90:
+            item.setBackground(QColor(220, 252, 231))
+            item.setForeground(QColor(22, 101, 52))
+        elif percentage >= 80:
+            item.setBackground(QColor(254, 249, 195))
+            item.setForeground(QColor(120, 113, 108))
+        else:
+            item.setBackground(QColor(254, 226, 226))
+            item.setForeground(QColor(153, 27, 27))
+        self.members_table.setItem(row, 6, item)
+
+    def on_changement(self, changement):
+        if changement.table == "members":
+            self._membres_modifies[changement.operation].update(changement.ids)
+            self.maj_timer.start()
+        elif changement.table == "presences":
+            self._taux_modifies.update(changement.ids)
+            self.maj_timer.start()
+
+    def _relancer_changements(self):
+        """Changements arrivés pendant un chargement: les appliquer maintenant"""
+        if self._taux_modifies or any(self._membres_modifies.values()):
+            self.maj_timer.start()
+
+    def appliquer_changements(self):
+        """Met à jour uniquement les lignes des membres concernés"""
+        if self.requetes.en_cours("liste"):
+            return  # appliqué à l'arrivée du résultat (_relancer_changements)
+        modifies = self._membres_modifies
+        self._membres_modifies = {INSERTION: set(), MODIFICATION: set(), SUPPRESSION: set()}
+        taux_modifies, self._taux_modifies = self._taux_modifies, set()
+        nb_modifies = sum(len(ids) for ids in modifies.values())
+
+        if nb_modifies and self.search_input.text().strip():
+            # Résultats classés par pertinence: relancer la recherche (bornée)
+            self.search_members()
+            return
+        if nb_modifies > TAILLE_PAGE:
+            # Import en masse: plus simple de recharger la première page
+            self.load_sample_data()
+            return
+
+        # Un membre inséré peut déjà figurer dans une page lue après l'insertion
+        for member_id in modifies[SUPPRESSION] | modifies[MODIFICATION] | modifies[INSERTION]:
+            self.remove_row(member_id)
+        for member_id in modifies[MODIFICATION] | modifies[INSERTION]:
+            membre = self.membres_mgr.obtenir_membre(member_id)
+            if membre is not None:
+                self.insert_row(membre)
+                taux_modifies.discard(member_id)
+
+        visibles = [i for i in taux_modifies if i in self._lignes]
+        if visibles:
+            taux = self.membres_mgr.calculer_taux_presence_bulk(visibles)
+            for member_id in visibles:
+                self.set_rate_item(self._lignes[member_id], taux[member_id])
+
+    def _renumeroter(self, debut):
+        """Met à jour _lignes pour les lignes décalées à partir de debut"""
+        for row in range(debut, len(self._ids)):
+            self._lignes[self._ids[row]] = row
+
+    def remove_row(self, member_id):
+        row = self._lignes.pop(member_id, None)
+        if row is not None:
+            self.members_table.removeRow(row)
+            del self._ids[row]
+            del self._cles[row]
+            self._renumeroter(row)
+
+    def insert_row(self, membre):
+        """Insère le membre à sa place s'il fait partie des pages déjà chargées"""
+        cle = self.membres_mgr.cle_page(membre)
+        if not self._tout_charge and (self._cle_derniere_page is None or cle > self._cle_derniere_page):
+            return  # Sera chargé avec les pages suivantes
+        row = bisect_left(self._cles, cle)
+        self.members_table.insertRow(row)
+        self._ids.insert(row, membre['id'])
+        self._cles.insert(row, cle)
+        self._renumeroter(row)
+        taux = self.membres_mgr.calculer_taux_presence_bulk([membre['id']])
+        self.fill_row(row, membre, taux[membre['id']])
+
+    def iter_membres_avec_taux(self):
+        """Parcourt tous les membres (page par page) avec leur taux de présence"""
+        after = None
+        while True:
+            membres = self.membres_mgr.obtenir_membres_page(after=after, limit=TAILLE_LOT_EXPORT)
+            if not membres:
+                return
+            taux = self.membres_mgr.calculer_taux_presence_bulk([m['id'] for m in membres])
+            for membre in membres:
+                yield membre, taux[membre['id']]
+            after = self.membres_mgr.cle_page(membres[-1])
 
     def add_member(self):
         dialog = AddMemberDialog(self)
@@ -244,7 +431,7 @@ class MembersPage(QWidget):
                     ecole=dialog.inputs['ecole_input'].text(),
                     filiere=dialog.inputs['filiere_input'].text()
                 )
-                self.load_sample_data()  # Recharger la table
+                # La ligne est ajoutée par on_changement
                 QMessageBox.information(self, "Succès", "Membre ajouté avec succès!")
             except ValueError as e:
                 QMessageBox.warning(self, "Erreur", str(e))
@@ -256,21 +443,6 @@ class MembersPage(QWidget):
         if not filename:
             return
     
-        membres = self.membres_mgr.obtenir_tous_membres()
-        data = [
-            ["Nom", "Prénoms", "Contact", "Email", "École", "Filière", "Taux de présence"]
-        ]
-        for membre in membres:
-            data.append([
-                membre['nom'],
-                membre['prenoms'],
-                membre['contact'],
-                membre['email'],
-                membre['ecole'],
-                membre['filiere'],
-                f"{self.membres_mgr.calculer_taux_presence(membre['id'])}%"
-            ])
-    
         doc = SimpleDocTemplate(filename, pagesize=A4)
         styles = getSampleStyleSheet()
         elements = []
@@ -279,8 +451,26 @@ class MembersPage(QWidget):
         elements.append(title)
         elements.append(Spacer(1, 12))
     
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
+        # Un lot de membres à la fois dans la liste: le suivant n'est lu que
+        # lorsque le précédent a été mis en page (mémoire constante)
+        tables = self.iter_tables_pdf()
+        elements.append(next(tables))  # au moins l'en-tête
+    
+        def lot_suivant(_flowable):
+            if not elements:
+                table = next(tables, None)
+                if table is not None:
+                    elements.append(table)
+    
+        doc.afterFlowable = lot_suivant
+        doc.build(elements)
+    
+        QMessageBox.information(self, "Export PDF", "Exportation réussie !")
+
+    def iter_tables_pdf(self):
+        """Tableaux de TAILLE_LOT_EXPORT membres au plus, en-tête répété à chaque page"""
+        entete = ["Nom", "Prénoms", "Contact", "Email", "École", "Filière", "Taux de présence"]
+        style = TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#4F46E5")),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
@@ -290,12 +480,23 @@ class MembersPage(QWidget):
             ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor("#F3F4F6")),
             ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#E5E7EB")),
             ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ]))
-        elements.append(table)
-    
-        doc.build(elements)
-    
-        QMessageBox.information(self, "Export PDF", "Exportation réussie !")
+        ])
+        lot, premier = [], True
+        for membre, taux in self.iter_membres_avec_taux():
+            lot.append([
+                membre['nom'],
+                membre['prenoms'],
+                membre['contact'],
+                membre['email'],
+                membre['ecole'],
+                membre['filiere'],
+                f"{taux}%"
+            ])
+            if len(lot) == TAILLE_LOT_EXPORT:
+                yield Table([entete] + lot, repeatRows=1, style=style)
+                lot, premier = [], False
+        if lot or premier:
+            yield Table([entete] + lot, repeatRows=1, style=style)
 
     def export_to_excel(self):
         from PySide6.QtWidgets import QFileDialog, QMessageBox
@@ -304,17 +505,16 @@ class MembersPage(QWidget):
         if not filename:
             return
 
-        membres = self.membres_mgr.obtenir_tous_membres()
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Membres"
+        # Mode write_only: les lignes sont écrites au fil de l'eau, pas gardées en mémoire
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Membres")
 
         # En-tête
         headers = ["Nom", "Prénoms", "Contact", "Email", "École", "Filière", "Taux de présence"]
         ws.append(headers)
 
         # Données
-        for membre in membres:
+        for membre, taux in self.iter_membres_avec_taux():
             ws.append([
                 membre['nom'],
                 membre['prenoms'],
@@ -322,7 +522,7 @@ class MembersPage(QWidget):
                 membre['email'],
                 membre['ecole'],
                 membre['filiere'],
-                f"{self.membres_mgr.calculer_taux_presence(membre['id'])}%"
+                f"{taux}%"
             ])
 
         try:
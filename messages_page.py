@@ -2,6 +2,7 @@ from PySide6.QtWidgets import *
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import QComboBox, QMessageBox
+from changements_qt import obtenir_pont
 
 
 class ModernCard(QFrame):
@@ -89,6 +90,7 @@ class MessagesPage(QWidget):
         self.groupes_mgr = groupes_mgr
         self.membres_mgr = membres_mgr
         self.init_ui()
+        obtenir_pont(self.groupes_mgr.db).changement.connect(self.on_changement)
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -131,9 +133,7 @@ class MessagesPage(QWidget):
             }
         """)
         # Remplir la liste des groupes depuis la base
-        groupes = self.groupes_mgr.obtenir_tous_groupes()
-        for groupe in groupes:
-            self.group_combo.addItem(groupe['nom'], groupe['id'])
+        self.load_groups()
         recipients_layout.addWidget(self.group_combo)
         content_layout.addWidget(recipients_card)
 
@@ -187,6 +187,20 @@ class MessagesPage(QWidget):
         content_layout.addWidget(compose_card)
         layout.addLayout(content_layout)
 
+    def load_groups(self):
+        """(Re)remplit la liste des groupes en gardant la sélection"""
+        selection = self.group_combo.currentData()
+        self.group_combo.clear()
+        for groupe in self.groupes_mgr.obtenir_tous_groupes():
+            self.group_combo.addItem(groupe['nom'], groupe['id'])
+        index = self.group_combo.findData(selection)
+        if index >= 0:
+            self.group_combo.setCurrentIndex(index)
+
+    def on_changement(self, changement):
+        if changement.table == "groups":
+            self.load_groups()
+
     def send_whatsapp_group_message(self, subject, message):
         group_id = self.group_combo.currentData()
         if not group_id or not message.strip():
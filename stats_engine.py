@@ -0,0 +1,344 @@
+"""
+Calcul des statistiques du tableau de bord par agrégats SQL
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from db import date_depuis_jour, jour_depuis_date
+
+try:
+    import stats_numpy
+except ImportError:  # NumPy absent: moteur SQL seulement
+    stats_numpy = None
+
+# Jours couverts par les filtres de période de StatisticsPage
+JOURS_PERIODE = {"month": 30, "quarter": 90, "year": 365}
+
+# Membres à risque: assiduité strictement entre 0 et ce seuil (en %)
+SEUIL_RISQUE = 70
+
+NB_TOP_MEMBRES = 10
+NB_MEMBRES_RISQUE = 15
+
+# Répartition de l'assiduité: tranches de 10 % (la dernière inclut 100 %)
+NB_TRANCHES = 10
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Périodes de la courbe d'évolution (semaines du lundi au dimanche)
+GRANULARITES = ("day", "week", "month")
+_FORMAT_LABEL = {"day": "%d/%m/%y", "week": "%d/%m/%y", "month": "%b %y"}
+
+# Résultats complets gardés par CacheResultats (combinaisons de filtres)
+TAILLE_CACHE_RESULTATS = 16
+
+# Taux d'un membre comme calculer_taux_presence (0 sans présence)
+_SQL_TAUX = """CASE WHEN s.total_count > 0
+                    THEN ROUND(CAST(s.present_count AS REAL) / s.total_count * 100, 2)
+                    ELSE 0.0 END"""
+
+# Membres retenus par les filtres, avec leur rang dans l'ordre de l'application
+# (nom, prenoms): les catégories sortent dans leur ordre de première apparition
+_SQL_FILTRES = f"""
+    WITH filtres AS (
+        SELECT m.id, m.nom || ' ' || m.prenoms AS nom_complet, m.ecole, m.filiere, m.residence,
+               ROW_NUMBER() OVER (ORDER BY m.nom, m.prenoms, m.id) AS rang,
+               {_SQL_TAUX} AS taux
+        FROM members m
+        LEFT JOIN member_attendance_summary s ON s.member_id = m.id
+        {{where}}
+    )
+"""
+
+# Tous les agrégats en une requête: SQLite ne calcule filtres qu'une fois.
+# Colonnes: (partie, clé, valeur, rang)
+_TAUX, _ECOLE, _FILIERE, _RESIDENCE, _ECOLE_MOYENNE, _TOP, _RISQUE = range(7)
+
+_SQL_AGREGATS = _SQL_FILTRES + f"""
+    SELECT {_TAUX}, id, taux, rang FROM filtres
+    UNION ALL
+    SELECT {_ECOLE}, ecole, COUNT(*), MIN(rang) FROM filtres WHERE ecole <> '' GROUP BY ecole
+    UNION ALL
+    SELECT {_FILIERE}, filiere, COUNT(*), MIN(rang) FROM filtres WHERE filiere <> '' GROUP BY filiere
+    UNION ALL
+    SELECT {_RESIDENCE}, residence, COUNT(*), MIN(rang) FROM filtres WHERE residence <> '' GROUP BY residence
+    UNION ALL
+    SELECT {_ECOLE_MOYENNE}, ecole, AVG(taux), MIN(rang) FROM filtres WHERE ecole <> '' GROUP BY ecole
+    UNION ALL
+    SELECT * FROM (SELECT {_TOP}, nom_complet, taux, rang FROM filtres
+                   WHERE taux > 0 ORDER BY taux DESC, rang LIMIT {{nb_top}})
+    UNION ALL
+    SELECT * FROM (SELECT {_RISQUE}, nom_complet, taux, rang FROM filtres
+                   WHERE taux > 0 AND taux < {{seuil_risque}} ORDER BY taux, rang LIMIT {{nb_risque}})
+"""
+
+
+def debut_periode(d: date, granularite: str) -> date:
+    if granularite == "week":
+        return d - timedelta(days=d.weekday())
+    if granularite == "month":
+        return d.replace(day=1)
+    return d
+
+
+def periode_suivante(debut: date, granularite: str) -> date:
+    if granularite == "week":
+        return debut + timedelta(days=7)
+    if granularite == "month":
+        if debut.month == 12:
+            return debut.replace(year=debut.year + 1, month=1)
+        return debut.replace(month=debut.month + 1)
+    return debut + timedelta(days=1)
+
+
+def distribution(taux: List[float]) -> Dict[str, Any]:
+    """Histogramme par tranches de 10 % et percentiles (rang le plus proche, valeurs exactes)"""
+    histogramme = [0] * NB_TRANCHES
+    for t in taux:
+        histogramme[min(int(t // 10), NB_TRANCHES - 1)] += 1
+    tries = sorted(taux)
+    percentiles = {p: (tries[_rang_percentile(p, len(tries))] if tries else 0.0) for p in PERCENTILES}
+    return {'histogramme': histogramme, 'percentiles': percentiles}
+
+
+def _rang_percentile(p: int, n: int) -> int:
+    """Indice (0..n-1) du p-ième percentile au rang le plus proche"""
+    return max(0, -(-p * n // 100) - 1)
+
+
+def serie_evolution(mouvements: Dict[int, List[int]], granularite: str = "month") -> Dict[str, list]:
+    """Série d'évolution depuis {jour: [inscriptions, départs]}, voir StatsEngine.evolution"""
+    serie = {'labels': [], 'values': [], 'inscriptions': [], 'departs': [], 'granularite': granularite}
+    if not mouvements:
+        return serie
+
+    jours = sorted(mouvements)
+    format_label = _FORMAT_LABEL[granularite]
+    aujourd_hui = date.today()
+    courant = debut_periode(date_depuis_jour(jours[0]), granularite)
+    i, effectif = 0, 0
+    while courant <= aujourd_hui:
+        suivante = periode_suivante(courant, granularite)
+        fin = jour_depuis_date(suivante)
+        inscriptions = departs = 0
+        while i < len(jours) and jours[i] < fin:
+            inscriptions += mouvements[jours[i]][0]
+            departs += mouvements[jours[i]][1]
+            i += 1
+        effectif += inscriptions - departs
+        serie['labels'].append(courant.strftime(format_label))
+        serie['values'].append(effectif)
+        serie['inscriptions'].append(inscriptions)
+        serie['departs'].append(departs)
+        courant = suivante
+    return serie
+
+
+class StatsEngine:
+    """Chiffres du tableau de bord, dans la forme attendue par StatisticsPage.
+
+    Deux moteurs d'agrégats aux résultats identiques:
+    - "sql": effectifs par catégorie, moyennes par école et classements
+      calculés par SQLite, seules les lignes agrégées remontent en Python;
+    - "numpy": mêmes calculs vectorisés sur l'instantané colonnaire
+      (db_colonnes), utilisé par défaut quand NumPy est installé.
+    Toutes les lectures se font dans un même instantané (instantane_lecture).
+    """
+
+    def __init__(self, membres_mgr, evenements_mgr, groupes_mgr, moteur: Optional[str] = None):
+        self.membres_mgr = membres_mgr
+        self.evenements_mgr = evenements_mgr
+        self.groupes_mgr = groupes_mgr
+        self.db = membres_mgr.db
+        if moteur is None:
+            moteur = "sql" if stats_numpy is None else "numpy"
+        if moteur == "numpy" and stats_numpy is None:
+            raise ImportError("NumPy est requis pour le moteur de statistiques 'numpy'")
+        self.moteur = moteur
+
+    def calculer(self, filtre_periode: str = "all", filtre_groupe: Optional[int] = None,
+                 granularite: str = "month", progression: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        signaler = progression or (lambda message: None)
+        with self.db.instantane_lecture():
+            signaler("Calcul des statistiques...")
+            if self.moteur == "numpy":
+                results = stats_numpy.calculer_agregats(
+                    self.db, self._inscrits_apres(filtre_periode), filtre_groupe,
+                    nb_top=NB_TOP_MEMBRES, seuil_risque=SEUIL_RISQUE, nb_risque=NB_MEMBRES_RISQUE,
+                    nb_tranches=NB_TRANCHES, percentiles=PERCENTILES)
+            else:
+                results = self._agregats(filtre_periode, filtre_groupe)
+
+            # Taux de chaque membre retenu, dans l'ordre de l'application
+            taux_moyens = list(results['taux_par_membre'].values())
+            results['total_membres'] = len(taux_moyens)
+            results['presence_moyenne'] = sum(taux_moyens) / len(taux_moyens) if taux_moyens else 0
+            results['presence_distribution'] = taux_moyens
+            if 'presence_resume' not in results:
+                results['presence_resume'] = distribution(taux_moyens)
+
+            groupes = self.groupes_mgr.obtenir_groupes_agreges()
+            results['total_groupes'] = len(groupes)
+            results['total_evenements'] = self.evenements_mgr.compter_evenements()
+            results['evenements_futurs'] = self.evenements_mgr.compter_evenements(futurs_seulement=True)
+
+            signaler("Préparation des graphiques...")
+            results['evolution_data'] = self.evolution(granularite)
+            results['tendance_data'] = self._tendance()
+            results['groupes_data'] = self._groupes(groupes)
+        return results
+
+    @staticmethod
+    def _inscrits_apres(filtre_periode: str) -> Optional[int]:
+        """Jour après lequel les membres doivent être inscrits (None: toutes périodes)"""
+        jours = JOURS_PERIODE.get(filtre_periode)
+        if jours is None:
+            return None
+        return jour_depuis_date(date.today() - timedelta(days=jours))
+
+    def _filtre(self, filtre_periode: str, filtre_groupe: Optional[int]) -> Tuple[str, list]:
+        """Clause WHERE sur members (alias m), comme obtenir_membres_filtres"""
+        conditions, params = [], []
+        inscrits_apres = self._inscrits_apres(filtre_periode)
+        if inscrits_apres is not None:
+            conditions.append("m.inscription_jour > ?")
+            params.append(inscrits_apres)
+        if filtre_groupe is not None:
+            conditions.append("m.id IN (SELECT member_id FROM group_members WHERE group_id = ?)")
+            params.append(filtre_groupe)
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+    def _agregats(self, filtre_periode: str, filtre_groupe: Optional[int]) -> Dict[str, Any]:
+        """Moteur SQL: taux par membre, catégories et classements des membres filtrés"""
+        where, params = self._filtre(filtre_periode, filtre_groupe)
+        cur = self.db.lecture(tuples=True)
+        cur.execute(_SQL_AGREGATS.format(where=where, nb_top=NB_TOP_MEMBRES, seuil_risque=SEUIL_RISQUE,
+                                         nb_risque=NB_MEMBRES_RISQUE), params)
+        parties = {partie: [] for partie in range(_RISQUE + 1)}
+        for partie, cle, valeur, rang in cur:
+            parties[partie].append((cle, valeur, rang))
+        # L'ordre des lignes d'une UNION ALL n'est pas garanti: trier sur le rang
+        for partie in (_TAUX, _ECOLE, _FILIERE, _RESIDENCE):
+            parties[partie].sort(key=lambda l: l[2])
+        # Décroissant, ex aequo dans l'ordre de première apparition
+        for partie in (_ECOLE_MOYENNE, _TOP):
+            parties[partie].sort(key=lambda l: (-l[1], l[2]))
+        parties[_RISQUE].sort(key=lambda l: (l[1], l[2]))
+
+        return {
+            'taux_par_membre': {cle: valeur for cle, valeur, _rang in parties[_TAUX]},
+            'ecoles_data': {cle: valeur for cle, valeur, _rang in parties[_ECOLE]},
+            'filieres_data': {cle: valeur for cle, valeur, _rang in parties[_FILIERE]},
+            'residences_data': {cle: valeur for cle, valeur, _rang in parties[_RESIDENCE]},
+            'ecole_stats_data': [(cle, float(valeur)) for cle, valeur, _rang in parties[_ECOLE_MOYENNE]],
+            'top_membres_data': [{'nom': nom[:25], 'taux': taux} for nom, taux, _rang in parties[_TOP]],
+            'risque_data': [{'nom': nom[:25], 'taux': taux} for nom, taux, _rang in parties[_RISQUE]],
+        }
+
+    def evolution(self, granularite: str = "month") -> Dict[str, list]:
+        """Effectif net (inscriptions - départs) à la fin de chaque période, jusqu'à aujourd'hui.
+
+        Un seul passage sur les comptes par jour: le coût dépend du nombre de
+        jours distincts et de périodes, pas du nombre de membres.
+        """
+        mouvements: Dict[int, List[int]] = {}
+        for jour, nombre in self.membres_mgr.compter_inscriptions_par_jour():
+            mouvements.setdefault(jour, [0, 0])[0] += nombre
+        for jour, inscriptions, departs in self.membres_mgr.compter_departs_par_jour():
+            compte = mouvements.setdefault(jour, [0, 0])
+            compte[0] += inscriptions
+            compte[1] += departs
+        return serie_evolution(mouvements, granularite)
+
+    def _tendance(self) -> Dict[str, list]:
+        """Taux de présence des 10 derniers événements ayant des présences"""
+        labels, valeurs = [], []
+        for event in self.evenements_mgr.obtenir_evenements_recents_avec_resume(10):
+            total = event['total_count']
+            if total:
+                valeurs.append(event['present_count'] / total * 100)
+                labels.append(event['nom'][:15])
+        return {'labels': labels, 'values': valeurs}
+
+    @staticmethod
+    def _groupes(groupes) -> List[Dict[str, Any]]:
+        return [
+            {'nom': g['nom'][:20], 'assiduite': g['assiduite'], 'couleur': g['couleur'],
+             'taille': g['nombre_membres']}
+            for g in groupes if g['nombre_membres']
+        ]
+
+
+class CacheResultats:
+    """Cache LRU borné des résultats de StatsEngine.calculer, par combinaison de filtres.
+
+    Comme CacheTaux, chaque entrée porte la version des données au moment du
+    calcul: data_version (écritures d'un autre processus) et le jour courant
+    (les périodes sont relatives à aujourd'hui). Les écritures de l'application,
+    reçues par le bus, vident le cache, sauf celles des messages.
+    """
+
+    def __init__(self, db, taille_max: int = TAILLE_CACHE_RESULTATS):
+        self.db = db
+        self.taille_max = taille_max
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0  # incrémenté à chaque invalidation
+        self._entrees: "OrderedDict[Hashable, Tuple[Dict[str, Any], Tuple[int, int]]]" = OrderedDict()
+        self._verrou = threading.Lock()
+        self._desabonner = db.bus.abonner(self._on_changement)
+
+    def fermer(self):
+        self._desabonner()
+
+    def version(self) -> Tuple[int, int]:
+        return self.db.data_version(), date.today().toordinal()
+
+    def contient(self, cle: Hashable, version: Tuple[int, int]) -> bool:
+        """Comme lire, sans compter de hit ni de miss (précalcul)"""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            return entree is not None and entree[1] == version
+
+    def lire(self, cle: Hashable, version: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None or entree[1] != version:
+                self.misses += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return entree[0]
+
+    def ecrire(self, cle: Hashable, resultat: Dict[str, Any], version: Tuple[int, int], generation: int):
+        with self._verrou:
+            # Une invalidation a eu lieu pendant le calcul: le résultat est peut-être déjà périmé
+            if generation != self.generation:
+                return
+            self._entrees[cle] = (resultat, version)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def vider(self):
+        with self._verrou:
+            self.generation += 1
+            self._entrees.clear()
+
+    def _on_changement(self, changement):
+        # Les messages n'entrent dans aucune statistique
+        if changement.table != "messages":
+            self.vider()
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'taille': len(self._entrees),
+                'taille_max': self.taille_max,
+                'hits': self.hits,
+                'misses': self.misses,
+                'taux_succes': (self.hits / total) if total else 0.0,
+            }
@@ -0,0 +1,341 @@
+"""
+Statistiques du tableau de bord tenues à jour par les changements du bus
+"""
+
+import threading
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from changements import INSERTION, SUPPRESSION, Changement
+from db import TAILLE_LOT_IN, date_depuis_jour, jour_depuis_date
+from stats_engine import serie_evolution
+
+# Au-delà de ce nombre d'ids dans un changement (import, restauration,
+# archivage...), les agrégats sont recalculés à la prochaine lecture
+SEUIL_RECALCUL = 2000
+
+_CATEGORIES = ("ecole", "filiere", "residence")
+
+_SQL_ETAT_MEMBRES = """
+    SELECT m.id, m.ecole, m.filiere, m.residence, m.inscription_jour,
+           COALESCE(s.present_count, 0), COALESCE(s.total_count, 0)
+    FROM members m
+    LEFT JOIN member_attendance_summary s ON s.member_id = m.id
+"""
+
+
+class _EtatMembre:
+    """Contribution d'un membre aux agrégats (pour la retirer lors d'un changement)"""
+    __slots__ = ('ecole', 'filiere', 'residence', 'mois', 'present', 'total', 'taux_centiemes')
+
+    def __init__(self, ecole, filiere, residence, inscription_jour, present, total):
+        self.ecole = ecole or ""
+        self.filiere = filiere or ""
+        self.residence = residence or ""
+        self.mois = _mois(inscription_jour)
+        self.present = present
+        self.total = total
+        # Taux arrondi comme calculer_taux_presence, en centièmes entiers: sommes exactes
+        self.taux_centiemes = round(round(present / total * 100, 2) * 100) if total else 0
+
+
+def _mois(jour: Optional[int]) -> Optional[int]:
+    """Premier jour du mois contenant jour (None: date d'inscription illisible)"""
+    if jour is None:
+        return None
+    return jour_depuis_date(date_depuis_jour(jour).replace(day=1))
+
+
+class _Agregats:
+    """Agrégats de l'ensemble des membres, sans accès à la base"""
+
+    def __init__(self):
+        self.membres: Dict[int, _EtatMembre] = {}
+        self.groupes: Dict[int, Set[int]] = {}
+        self.groupes_du_membre: Dict[int, Set[int]] = {}
+        self.categories: Dict[str, Counter] = {c: Counter() for c in _CATEGORIES}
+        self.present = 0
+        self.total = 0
+        self.somme_taux = 0  # en centièmes de %
+        # Par groupe: [membres, présences, total, somme des taux en centièmes]
+        self.par_groupe: Dict[int, List[int]] = {}
+        # Par mois (premier jour): [inscriptions, départs], membres supprimés compris
+        # comme dans StatsEngine.evolution
+        self.par_mois: Dict[int, List[int]] = {}
+
+    def ajouter_groupe(self, group_id: int):
+        self.groupes.setdefault(group_id, set())
+        self.par_groupe.setdefault(group_id, [0, 0, 0, 0])
+
+    def supprimer_groupe(self, group_id: int):
+        for member_id in list(self.groupes.get(group_id, ())):
+            self.delier(group_id, member_id)
+        self.groupes.pop(group_id, None)
+        self.par_groupe.pop(group_id, None)
+
+    def remplacer_membre(self, member_id: int, etat: Optional[_EtatMembre], jour_depart: int):
+        """Retire la contribution actuelle du membre, puis ajoute etat (None: supprimé le jour_depart)"""
+        groupes = self.groupes_du_membre.get(member_id, set())
+        ancien = self.membres.pop(member_id, None)
+        if ancien is not None:
+            self._compter(ancien, groupes, -1)
+        if etat is not None:
+            self.ajouter_membre(member_id, etat)
+            return
+        if ancien is not None:
+            self.ajouter_depart(ancien.mois, jour_depart)
+        # Supprimé: ses appartenances ne comptent plus
+        for group_id in list(groupes):
+            self.groupes.get(group_id, set()).discard(member_id)
+            if ancien is not None and group_id in self.par_groupe:
+                self.par_groupe[group_id][0] -= 1
+        self.groupes_du_membre.pop(member_id, None)
+
+    def ajouter_membre(self, member_id: int, etat: _EtatMembre):
+        self.membres[member_id] = etat
+        self._compter(etat, self.groupes_du_membre.get(member_id, ()), 1)
+
+    def ajouter_depart(self, mois: Optional[int], jour_depart: int):
+        """Membre supprimé: son inscription reste comptée, son départ s'y ajoute"""
+        if mois is not None:
+            self._compter_mois(mois, 0, 1)
+            self._compter_mois(_mois(jour_depart), 1, 1)
+
+    def _compter_mois(self, mois: int, indice: int, signe: int):
+        compte = self.par_mois.setdefault(mois, [0, 0])
+        compte[indice] += signe
+        if not any(compte):
+            del self.par_mois[mois]
+
+    def _compter(self, etat: _EtatMembre, groupes: Iterable[int], signe: int):
+        for categorie in _CATEGORIES:
+            valeur = getattr(etat, categorie)
+            if valeur:
+                self.categories[categorie][valeur] += signe
+                if not self.categories[categorie][valeur]:
+                    del self.categories[categorie][valeur]
+        self.present += signe * etat.present
+        self.total += signe * etat.total
+        self.somme_taux += signe * etat.taux_centiemes
+        if etat.mois is not None:
+            self._compter_mois(etat.mois, 0, signe)
+        for group_id in groupes:
+            self._compter_groupe(group_id, etat, signe, membre=False)
+
+    def _compter_groupe(self, group_id: int, etat: _EtatMembre, signe: int, membre: bool):
+        agregat = self.par_groupe.setdefault(group_id, [0, 0, 0, 0])
+        if membre:
+            agregat[0] += signe
+        agregat[1] += signe * etat.present
+        agregat[2] += signe * etat.total
+        agregat[3] += signe * etat.taux_centiemes
+
+    def lier(self, group_id: Optional[int], member_id: int):
+        if group_id is None or member_id in self.groupes.setdefault(group_id, set()):
+            return
+        self.groupes[group_id].add(member_id)
+        self.groupes_du_membre.setdefault(member_id, set()).add(group_id)
+        etat = self.membres.get(member_id)
+        if etat is not None:  # appartenance d'un membre supprimé: ignorée, comme en SQL
+            self._compter_groupe(group_id, etat, 1, membre=True)
+
+    def delier(self, group_id: Optional[int], member_id: int):
+        if group_id is None or member_id not in self.groupes.get(group_id, ()):
+            return
+        self.groupes[group_id].discard(member_id)
+        self.groupes_du_membre.get(member_id, set()).discard(group_id)
+        etat = self.membres.get(member_id)
+        if etat is not None:
+            self._compter_groupe(group_id, etat, -1, membre=True)
+
+
+class StatsIncrementales:
+    """Agrégats de l'ensemble des membres, mis à jour par deltas.
+
+    Effectifs par catégorie, présences et taux par membre et par groupe,
+    inscriptions et départs par mois (courbe d'évolution mensuelle).
+
+    Abonné au bus de changements: un membre ajouté, modifié ou supprimé, une
+    présence saisie ou une appartenance à un groupe modifiée ne relisent que
+    les membres concernés. Les changements massifs (au-delà de seuil_recalcul
+    ids) marquent les agrégats périmés: ils sont recalculés à la lecture
+    suivante, comme après recalculer().
+
+    Le recalcul complet se fait sans tenir le verrou: les changements reçus
+    pendant ce temps sont mis en file puis rejoués sur les nouveaux agrégats.
+    Le rappel du bus (thread qui a écrit, souvent l'interface) n'attend donc
+    jamais la fin d'un recalcul.
+    """
+
+    def __init__(self, db, seuil_recalcul: int = SEUIL_RECALCUL):
+        self.db = db
+        self.seuil_recalcul = seuil_recalcul
+        self.recalculs = 0
+        self.deltas = 0
+        self._verrou = threading.RLock()
+        self._verrou_recalcul = threading.Lock()  # un seul recalcul complet à la fois
+        self._perime = True
+        self._en_attente: Optional[List[Changement]] = None  # file pendant un recalcul
+        self._invalide_pendant_recalcul = False
+        self._agregats = _Agregats()
+        self._desabonner = db.bus.abonner(self.appliquer)
+
+    def fermer(self):
+        self._desabonner()
+
+    # --- Recalcul complet ---
+
+    def recalculer(self):
+        """Relit tous les agrégats depuis la base (sur demande ou après un import)"""
+        with self._verrou_recalcul:
+            with self._verrou:
+                # Ouverte avant l'instantané: tout changement validé après y figure
+                self._en_attente = []
+                self._invalide_pendant_recalcul = False
+            try:
+                agregats = self._charger()
+            except BaseException:
+                with self._verrou:
+                    self._en_attente = None
+                raise
+            with self._verrou:
+                en_attente, self._en_attente = self._en_attente, None
+                self._agregats = agregats
+                self._perime = self._invalide_pendant_recalcul
+                self.recalculs += 1
+                # Déjà pris en compte par l'instantané ou non: rejouer est sans effet double
+                for changement in en_attente:
+                    self._appliquer(changement)
+
+    def _charger(self) -> _Agregats:
+        agregats = _Agregats()
+        with self.db.instantane_lecture():
+            cur = self.db.lecture(tuples=True)
+            cur.execute(_SQL_ETAT_MEMBRES)
+            for ligne in cur:
+                agregats.ajouter_membre(ligne[0], _EtatMembre(*ligne[1:]))
+            cur.execute("""
+                SELECT inscription_jour, depart_jour FROM member_departures
+                WHERE inscription_jour IS NOT NULL
+            """)
+            for inscription_jour, depart_jour in cur:
+                agregats.ajouter_depart(_mois(inscription_jour), depart_jour)
+            cur.execute("SELECT id FROM groups")
+            for (group_id,) in cur.fetchall():
+                agregats.ajouter_groupe(group_id)
+            # Les appartenances d'un groupe supprimé peuvent subsister en base
+            cur.execute("""
+                SELECT gm.group_id, gm.member_id FROM group_members gm
+                JOIN groups g ON g.id = gm.group_id
+            """)
+            for group_id, member_id in cur.fetchall():
+                agregats.lier(group_id, member_id)
+        return agregats
+
+    # --- Deltas ---
+
+    def appliquer(self, changement: Changement):
+        """Rappel du bus: applique le changement (appelé dans le thread qui a écrit)"""
+        with self._verrou:
+            if self._en_attente is not None:
+                self._en_attente.append(changement)
+                return
+            if self._perime:
+                return  # tout sera relu à la prochaine lecture
+            self._appliquer(changement)
+
+    def _appliquer(self, changement: Changement):
+        if len(changement.ids) > self.seuil_recalcul:
+            self._perime = True
+            return
+        agregats = self._agregats
+        if changement.table in ("members", "presences"):
+            self._rafraichir_membres(changement.ids)
+        elif changement.table == "group_members":
+            for member_id in changement.ids:
+                if changement.operation == INSERTION:
+                    agregats.lier(changement.parent_id, member_id)
+                else:
+                    agregats.delier(changement.parent_id, member_id)
+        elif changement.table == "groups":
+            for group_id in changement.ids:
+                if changement.operation == SUPPRESSION:
+                    agregats.supprimer_groupe(group_id)
+                else:
+                    agregats.ajouter_groupe(group_id)
+        else:
+            return
+        self.deltas += 1
+
+    def _rafraichir_membres(self, member_ids: Iterable[int]):
+        """Remplace la contribution des membres par leur état actuel en base"""
+        ids = list(member_ids)
+        etats: Dict[int, Tuple] = {}
+        cur = self.db.lecture(tuples=True)
+        for i in range(0, len(ids), TAILLE_LOT_IN):
+            lot = ids[i:i + TAILLE_LOT_IN]
+            cur.execute(_SQL_ETAT_MEMBRES + f" WHERE m.id IN ({', '.join('?' * len(lot))})", lot)
+            for ligne in cur.fetchall():
+                etats[ligne[0]] = ligne[1:]
+        # Jour local, comme trg_members_ad_depart pour member_departures
+        aujourd_hui = jour_depuis_date(date.today())
+        for member_id in ids:
+            etat = etats.get(member_id)
+            self._agregats.remplacer_membre(member_id, None if etat is None else _EtatMembre(*etat),
+                                            aujourd_hui)
+
+    # --- Lecture ---
+
+    def resume(self) -> Dict[str, Any]:
+        """Agrégats courants (recalculés d'abord s'ils sont périmés)"""
+        if self._perime:
+            self.recalculer()
+        with self._verrou:
+            a = self._agregats
+            nb = len(a.membres)
+            return {
+                'total_membres': nb,
+                'total_groupes': len(a.groupes),
+                'presence_moyenne': a.somme_taux / nb / 100 if nb else 0,
+                'presences': a.present,
+                'presences_total': a.total,
+                # Catégories par effectif décroissant
+                'ecoles_data': dict(a.categories['ecole'].most_common()),
+                'filieres_data': dict(a.categories['filiere'].most_common()),
+                'residences_data': dict(a.categories['residence'].most_common()),
+                'inscriptions_par_mois': {
+                    date_depuis_jour(mois).strftime("%Y-%m"): a.par_mois[mois][0] for mois in sorted(a.par_mois)
+                },
+                'departs_par_mois': {
+                    date_depuis_jour(mois).strftime("%Y-%m"): a.par_mois[mois][1] for mois in sorted(a.par_mois)
+                },
+                'groupes': {
+                    group_id: {
+                        'taille': g[0],
+                        'present': g[1],
+                        'total': g[2],
+                        'assiduite': g[3] / g[0] / 100 if g[0] else 0.0,
+                    }
+                    for group_id, g in a.par_groupe.items()
+                },
+            }
+
+    def evolution(self) -> Dict[str, list]:
+        """Série mensuelle de StatsEngine.evolution("month"), depuis les compteurs par mois"""
+        if self._perime:
+            self.recalculer()
+        with self._verrou:
+            mouvements = {mois: list(compte) for mois, compte in self._agregats.par_mois.items()}
+        return serie_evolution(mouvements, "month")
+
+    @property
+    def perime(self) -> bool:
+        return self._perime
+
+    def invalider(self):
+        """Force un recalcul complet à la prochaine lecture (écriture par un autre processus...)"""
+        with self._verrou:
+            self._perime = True
+            if self._en_attente is not None:
+                self._invalide_pendant_recalcul = True
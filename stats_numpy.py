@@ -0,0 +1,128 @@
+"""
+Moteur NumPy des statistiques du tableau de bord (voir stats_engine)
+"""
+
+from itertools import chain
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from db_colonnes import CODE_VIDE, InstantaneColonnes
+
+
+def _taux_membres(db, instantane: InstantaneColonnes) -> np.ndarray:
+    """Taux de présence (en %) par position de membre, arrondis par SQLite comme calculer_taux_presence"""
+    cur = db.lecture(tuples=True)
+    cur.execute("""
+        SELECT member_id, ROUND(CAST(present_count AS REAL) / total_count * 100, 2)
+        FROM member_attendance_summary WHERE total_count > 0
+    """)
+    lignes = np.fromiter(chain.from_iterable(cur), dtype=np.float64).reshape(-1, 2)
+    taux = np.zeros(instantane.nb_membres, dtype=np.float64)
+    idx = instantane.indices(lignes[:, 0].astype(np.int64))
+    connus = idx >= 0
+    taux[idx[connus]] = lignes[connus, 1]
+    return taux
+
+
+def _masque(instantane: InstantaneColonnes, inscrits_apres: Optional[int],
+            group_id: Optional[int]) -> np.ndarray:
+    masque = np.ones(instantane.nb_membres, dtype=bool)
+    if inscrits_apres is not None:
+        # JOUR_INCONNU (date illisible) est toujours exclu
+        masque &= instantane.inscription > inscrits_apres
+    if group_id is not None:
+        dans_groupe = np.zeros(instantane.nb_membres, dtype=bool)
+        pos = np.searchsorted(instantane.groupe_ids, group_id)
+        if pos < len(instantane.groupe_ids) and instantane.groupe_ids[pos] == group_id:
+            dans_groupe[instantane.appartenance_membre[instantane.appartenance_groupe == pos]] = True
+        masque &= dans_groupe
+    return masque
+
+
+def _moyennes_par_categorie(codes: np.ndarray, taux: np.ndarray, categories: Sequence[str]):
+    """[(catégorie, taux moyen)] décroissant, ex aequo dans l'ordre de première apparition"""
+    avec = codes != CODE_VIDE
+    codes, taux = codes[avec], taux[avec]
+    if not len(codes):
+        return []
+    effectifs = np.bincount(codes, minlength=len(categories))
+    sommes = np.bincount(codes, weights=taux, minlength=len(categories))
+    uniques, premiers = np.unique(codes, return_index=True)
+    moyennes = sommes[uniques] / effectifs[uniques]
+    ordre = np.lexsort((premiers, -moyennes))
+    return [(categories[uniques[i]], float(moyennes[i])) for i in ordre]
+
+
+def _premiers(taux: np.ndarray, candidats: np.ndarray, k: int, croissant: bool) -> np.ndarray:
+    """Positions des k meilleurs candidats, ex aequo par position (ordre de l'application).
+
+    argpartition donne la k-ième valeur en O(n); seuls les candidats au moins
+    aussi bons qu'elle sont ensuite triés.
+    """
+    positions = np.flatnonzero(candidats)
+    if not len(positions) or k <= 0:
+        return positions[:0]
+    cles = taux[positions] if croissant else -taux[positions]
+    if len(positions) > k:
+        seuil = cles[np.argpartition(cles, k - 1)[k - 1]]
+        garder = cles <= seuil
+        positions, cles = positions[garder], cles[garder]
+    return positions[np.lexsort((positions, cles))[:k]]
+
+
+def _noms(db, ids: np.ndarray) -> Dict[int, str]:
+    if not len(ids):
+        return {}
+    cur = db.lecture(tuples=True)
+    cur.execute(f"""
+        SELECT id, nom || ' ' || prenoms FROM members
+        WHERE id IN ({", ".join("?" * len(ids))})
+    """, ids.tolist())
+    return dict(cur.fetchall())
+
+
+def distribution(taux: np.ndarray, nb_tranches: int, percentiles: Sequence[int]) -> Dict[str, Any]:
+    """Comme stats_engine.distribution: histogramme par tranches de 10 % et percentiles au rang le plus proche"""
+    tranches = np.minimum((taux // 10).astype(np.int64), nb_tranches - 1)
+    histogramme = np.bincount(tranches, minlength=nb_tranches)
+    n = len(taux)
+    valeurs = {}
+    if n:
+        rangs = np.maximum(0, -(-np.asarray(percentiles) * n // 100) - 1)
+        valeurs = dict(zip(percentiles, np.partition(taux, rangs)[rangs].tolist()))
+    return {
+        'histogramme': histogramme.tolist(),
+        'percentiles': {p: valeurs.get(p, 0.0) for p in percentiles},
+    }
+
+
+def calculer_agregats(db, inscrits_apres: Optional[int], group_id: Optional[int], *,
+                      nb_top: int, seuil_risque: float, nb_risque: int,
+                      nb_tranches: int, percentiles: Sequence[int]) -> Dict[str, Any]:
+    """Mêmes clés et valeurs que StatsEngine._agregats (moteur SQL), plus presence_resume"""
+    instantane = db.instantane_colonnes(presences=False, groupes=group_id is not None)
+    taux_tous = _taux_membres(db, instantane)
+    masque = _masque(instantane, inscrits_apres, group_id)
+
+    # Les tableaux de l'instantané sont dans l'ordre de l'application (nom, prenoms, id)
+    assidus = masque & (taux_tous > 0)
+    top = _premiers(taux_tous, assidus, nb_top, croissant=False)
+    risque = _premiers(taux_tous, assidus & (taux_tous < seuil_risque), nb_risque, croissant=True)
+    noms = _noms(db, instantane.ids[np.concatenate([top, risque])])
+
+    taux_filtres = taux_tous[masque]
+    return {
+        'taux_par_membre': dict(zip(instantane.ids[masque].tolist(), taux_filtres.tolist())),
+        'ecoles_data': instantane.compter(instantane.ecole[masque], instantane.ecoles),
+        'filieres_data': instantane.compter(instantane.filiere[masque], instantane.filieres),
+        'residences_data': instantane.compter(instantane.residence[masque], instantane.residences),
+        'ecole_stats_data': _moyennes_par_categorie(instantane.ecole[masque], taux_filtres, instantane.ecoles),
+        'top_membres_data': [
+            {'nom': noms[int(instantane.ids[p])][:25], 'taux': float(taux_tous[p])} for p in top
+        ],
+        'risque_data': [
+            {'nom': noms[int(instantane.ids[p])][:25], 'taux': float(taux_tous[p])} for p in risque
+        ],
+        'presence_resume': distribution(taux_filtres, nb_tranches, percentiles),
+    }
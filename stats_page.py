@@ -1,14 +1,16 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
                                QFrame, QComboBox, QScrollArea, QTabWidget, QFileDialog, QMessageBox, QProgressBar)
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
-from collections import Counter
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import tempfile
 from pdf_export import PDFExporter
+from stats_engine import CacheResultats, StatsEngine
+from stats_incremental import StatsIncrementales
+from changements_qt import obtenir_pont
 
 
 class MplCanvas(FigureCanvas):
@@ -32,7 +34,7 @@ class StatisticsWorker(QThread):
     finished = Signal(dict)
     
     def __init__(self, membres_mgr, evenements_mgr, groupes_mgr, presences_mgr, 
-                 filtre_periode, filtre_groupe):
+                 filtre_periode, filtre_groupe, granularite="month", stats_incr=None, cache=None):
         super().__init__()
         self.membres_mgr = membres_mgr
         self.evenements_mgr = evenements_mgr
@@ -40,47 +42,31 @@ class StatisticsWorker(QThread):
         self.presences_mgr = presences_mgr
         self.filtre_periode = filtre_periode
         self.filtre_groupe = filtre_groupe
+        self.granularite = granularite
+        self.stats_incr = stats_incr
+        self.cache = cache
+        self.generation = 0  # voir StatisticsPage.refresh_stats
     
     def run(self):
         try:
-            self.progress.emit("Chargement des données...")
-            results = {}
-            
-            # 1. Membres filtrés
-            membres = self._get_filtered_membres()
-            results['membres'] = membres
+            # Agrégats incrémentaux périmés (premier affichage, import): relus ici, hors interface
+            if self.stats_incr is not None and self.stats_incr.perime:
+                self.stats_incr.recalculer()
             
-            # 2. Stats de base
-            self.progress.emit("Calcul des statistiques...")
-            results['total_membres'] = len(membres)
-            results['total_groupes'] = len(self.groupes_mgr.obtenir_tous_groupes())
-            results['total_evenements'] = len(self.evenements_mgr.obtenir_tous_evenements())
-            results['evenements_futurs'] = len(self.evenements_mgr.obtenir_tous_evenements(futurs_seulement=True))
+            # Version et génération relevées avant le calcul: une écriture pendant
+            # le calcul empêche de mettre en cache un résultat déjà périmé
+            if self.cache is not None:
+                version, generation = self.cache.version(), self.cache.generation
             
-            # 3. Taux de présence
-            self.progress.emit("Calcul des taux de présence...")
-            taux_moyens = []
-            taux_dict = {}
-            for m in membres:
-                taux = self.membres_mgr.calculer_taux_presence(m['id'])
-                taux_moyens.append(taux)
-                taux_dict[m['id']] = taux
-            
-            results['presence_moyenne'] = sum(taux_moyens) / len(taux_moyens) if taux_moyens else 0
-            results['taux_par_membre'] = taux_dict
+            # Agrégats calculés par StatsEngine, dans un même instantané de lecture
+            moteur = StatsEngine(self.membres_mgr, self.evenements_mgr, self.groupes_mgr)
+            self.progress.emit("Chargement des données...")
+            results = moteur.calculer(self.filtre_periode, self.filtre_groupe, self.granularite,
+                                      progression=self.progress.emit)
             
-            # 4. Données pour graphiques
-            self.progress.emit("Préparation des graphiques...")
-            results['ecoles_data'] = self._prepare_ecoles_data(membres)
-            results['filieres_data'] = self._prepare_filieres_data(membres)
-            results['residences_data'] = self._prepare_residences_data(membres)
-            results['evolution_data'] = self._prepare_evolution_data()
-            results['top_membres_data'] = self._prepare_top_membres(membres, taux_dict)
-            results['ecole_stats_data'] = self._prepare_ecole_stats(membres, taux_dict)
-            results['presence_distribution'] = taux_moyens
-            results['tendance_data'] = self._prepare_tendance_data()
-            results['risque_data'] = self._prepare_risque_data(membres, taux_dict)
-            results['groupes_data'] = self._prepare_groupes_data(taux_dict)
+            if self.cache is not None:
+                cle = (self.filtre_periode, self.filtre_groupe, self.granularite)
+                self.cache.ecrire(cle, results, version, generation)
             
             self.progress.emit("Terminé!")
             self.finished.emit(results)
@@ -89,164 +75,31 @@ class StatisticsWorker(QThread):
             print(f"Erreur: {e}")
             import traceback
             traceback.print_exc()
+
+
+class PrecalculWorker(QThread):
+    """Remplit le cache des résultats pour les combinaisons de filtres courantes"""
     
-    def _get_filtered_membres(self):
-        membres = self.membres_mgr.obtenir_tous_membres()
-        
-        if self.filtre_groupe:
-            membres_groupe = self.groupes_mgr.obtenir_membres_du_groupe(self.filtre_groupe)
-            membres_ids = [m['id'] for m in membres_groupe]
-            membres = [m for m in membres if m['id'] in membres_ids]
-        
-        if self.filtre_periode != "all":
-            now = datetime.now()
-            if self.filtre_periode == "month":
-                date_limite = now - timedelta(days=30)
-            elif self.filtre_periode == "quarter":
-                date_limite = now - timedelta(days=90)
-            elif self.filtre_periode == "year":
-                date_limite = now - timedelta(days=365)
-            else:
-                return membres
-            
-            membres_filtres = []
-            for m in membres:
-                date_str = m.get('date_inscription', '')
-                if date_str:
-                    try:
-                        date = datetime.fromisoformat(date_str.split()[0])
-                        if date >= date_limite:
-                            membres_filtres.append(m)
-                    except:
-                        pass
-            membres = membres_filtres
-        
-        return membres
-    
-    def _prepare_ecoles_data(self, membres):
-        ecoles = [m['ecole'] for m in membres if m['ecole']]
-        return dict(Counter(ecoles))
-    
-    def _prepare_filieres_data(self, membres):
-        filieres = [m['filiere'] for m in membres if m['filiere']]
-        return dict(Counter(filieres))
-    
-    def _prepare_residences_data(self, membres):
-        residences = [m['residence'] for m in membres if m['residence']]
-        return dict(Counter(residences))
-    
-    def _prepare_evolution_data(self):
-        membres = self.membres_mgr.obtenir_tous_membres()
-        dates_inscription = []
-        for m in membres:
-            date_str = m.get('date_inscription', '')
-            if date_str:
-                try:
-                    date = datetime.fromisoformat(date_str.split()[0])
-                    dates_inscription.append(date)
-                except:
-                    pass
-        
-        if not dates_inscription:
-            return {'labels': [], 'values': []}
-        
-        dates_inscription.sort()
-        date_min = dates_inscription[0]
-        date_max = datetime.now()
-        
-        mois_labels = []
-        counts = []
-        current_date = date_min.replace(day=1)
-        
-        while current_date <= date_max:
-            count_month = sum(1 for d in dates_inscription if d <= current_date)
-            mois_labels.append(current_date.strftime('%b %y'))
-            counts.append(count_month)
-            
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1)
-        
-        return {'labels': mois_labels, 'values': counts}
-    
-    def _prepare_top_membres(self, membres, taux_dict):
-        membres_avec_taux = []
-        for m in membres:
-            taux = taux_dict.get(m['id'], 0)
-            if taux > 0:
-                membres_avec_taux.append({
-                    'nom': f"{m['nom']} {m['prenoms']}"[:25],
-                    'taux': taux
-                })
-        
-        membres_avec_taux.sort(key=lambda x: x['taux'], reverse=True)
-        return membres_avec_taux[:10]
-    
-    def _prepare_ecole_stats(self, membres, taux_dict):
-        ecoles = [m['ecole'] for m in membres if m['ecole']]
-        ecole_counts = Counter(ecoles)
-        
-        ecole_assiduite = {}
-        for ecole in ecole_counts.keys():
-            membres_ecole = [m for m in membres if m['ecole'] == ecole]
-            taux = [taux_dict.get(m['id'], 0) for m in membres_ecole]
-            ecole_assiduite[ecole] = sum(taux) / len(taux) if taux else 0
-        
-        return sorted(ecole_assiduite.items(), key=lambda x: x[1], reverse=True)
-    
-    def _prepare_tendance_data(self):
-        evenements = self.evenements_mgr.obtenir_tous_evenements()
-        if not evenements:
-            return {'labels': [], 'values': []}
-        
-        evenements_sorted = sorted(evenements, key=lambda e: e['date'])
-        recent_events = evenements_sorted[-10:]
-        
-        labels = []
-        taux_presence = []
-        
-        for event in recent_events:
-            presences = self.presences_mgr.obtenir_presences_evenement(event['id'])
-            if presences:
-                presents = sum(1 for p in presences if p.get('present') == 1)
-                total = len(presences)
-                taux = (presents / total * 100) if total > 0 else 0
-                taux_presence.append(taux)
-                labels.append(event['nom'][:15])
-        
-        return {'labels': labels, 'values': taux_presence}
-    
-    def _prepare_risque_data(self, membres, taux_dict):
-        membres_risque = []
-        for m in membres:
-            taux = taux_dict.get(m['id'], 0)
-            if 0 < taux < 70:
-                membres_risque.append({
-                    'nom': f"{m['nom']} {m['prenoms']}"[:25],
-                    'taux': taux
-                })
-        
-        membres_risque.sort(key=lambda x: x['taux'])
-        return membres_risque[:15]
+    def __init__(self, membres_mgr, evenements_mgr, groupes_mgr, cache, combinaisons):
+        super().__init__()
+        self.membres_mgr = membres_mgr
+        self.evenements_mgr = evenements_mgr
+        self.groupes_mgr = groupes_mgr
+        self.cache = cache
+        self.combinaisons = combinaisons
     
-    def _prepare_groupes_data(self, taux_dict):
-        groupes = self.groupes_mgr.obtenir_tous_groupes()
-        groupe_data = []
-        
-        for g in groupes:
-            membres = self.groupes_mgr.obtenir_membres_du_groupe(g['id'])
-            if membres:
-                taux = [taux_dict.get(m['id'], 0) for m in membres]
-                moyenne = sum(taux) / len(taux) if taux else 0
-                groupe_data.append({
-                    'nom': g['nom'][:20],
-                    'assiduite': moyenne,
-                    'couleur': g['couleur'],
-                    'taille': len(membres)
-                })
-        
-        return groupe_data
+    def run(self):
+        try:
+            moteur = StatsEngine(self.membres_mgr, self.evenements_mgr, self.groupes_mgr)
+            for cle in self.combinaisons:
+                if self.isInterruptionRequested():
+                    return
+                version, generation = self.cache.version(), self.cache.generation
+                if self.cache.contient(cle, version):
+                    continue
+                self.cache.ecrire(cle, moteur.calculer(*cle), version, generation)
+        except Exception as e:
+            print(f"Erreur précalcul statistiques: {e}")
 
 
 class ModernButton(QPushButton):
@@ -304,10 +157,29 @@ class StatisticsPage(QWidget):
         
         self.filtre_periode = "all"
         self.filtre_groupe = None
+        self.granularite = "month"
         self.worker = None
+        self._workers_anciens = []  # remplacés mais encore en cours: gardés en vie jusqu'à leur fin
+        self._generation = 0  # incrémenté à chaque demande: les résultats plus anciens sont ignorés
+        self.precalcul = None
         self.stats_data = {}
+        self._groupes_info = {}
+        
+        # Totaux, catégories et groupes tenus à jour par deltas (voir stats_incremental)
+        self.stats_incr = StatsIncrementales(self.membres_mgr.db)
+        # Résultats déjà calculés par combinaison de filtres, vidés à chaque écriture
+        self.cache_resultats = CacheResultats(self.membres_mgr.db)
+        
+        # Les changements en rafale (saisie d'un appel...) ne relancent le calcul qu'une fois
+        self._perime = False
+        self._groupes_perimes = False
+        self.maj_timer = QTimer(self)
+        self.maj_timer.setSingleShot(True)
+        self.maj_timer.setInterval(500)
+        self.maj_timer.timeout.connect(self.appliquer_changements)
         
         self.init_ui()
+        obtenir_pont(self.membres_mgr.db).changement.connect(self.on_changement)
     
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -330,7 +202,7 @@ class StatisticsPage(QWidget):
         header_layout.addWidget(export_pdf_btn)
         
         refresh_btn = ModernButton("🔄 Actualiser", primary=True)
-        refresh_btn.clicked.connect(self.refresh_stats)
+        refresh_btn.clicked.connect(self.actualiser)
         header_layout.addWidget(refresh_btn)
         
         layout.addLayout(header_layout)
@@ -358,6 +230,13 @@ class StatisticsPage(QWidget):
         filters_layout.addWidget(groupe_label)
         filters_layout.addWidget(self.groupe_combo)
         
+        evolution_label = QLabel("Évolution par:")
+        self.granularite_combo = QComboBox()
+        self.granularite_combo.addItems(["Mois", "Semaine", "Jour"])
+        self.granularite_combo.currentIndexChanged.connect(self.on_filtre_changed)
+        filters_layout.addWidget(evolution_label)
+        filters_layout.addWidget(self.granularite_combo)
+        
         filters_layout.addStretch()
         
         self.update_label = QLabel("")
@@ -391,42 +270,155 @@ class StatisticsPage(QWidget):
         self.refresh_stats()
     
     def load_groupes_filter(self):
+        selection = self.groupe_combo.currentData()
+        # Pas de on_filtre_changed pendant le remplissage
+        self.groupe_combo.blockSignals(True)
         self.groupe_combo.clear()
         self.groupe_combo.addItem("Tous les groupes", None)
         groupes = self.groupes_mgr.obtenir_tous_groupes()
+        self._groupes_info = {g['id']: (g['nom'], g['couleur']) for g in groupes}
         for g in groupes:
             self.groupe_combo.addItem(g['nom'], g['id'])
+        index = self.groupe_combo.findData(selection)
+        self.groupe_combo.setCurrentIndex(max(index, 0))
+        self.groupe_combo.blockSignals(False)
+        self.filtre_groupe = self.groupe_combo.currentData()
+    
+    def on_changement(self, changement):
+        if changement.table == "messages":
+            return
+        if changement.table == "groups":
+            self._groupes_perimes = True
+        self._perime = True
+        self.maj_timer.start()
+    
+    def appliquer_changements(self):
+        # Page cachée: le calcul attend le prochain affichage
+        if not self._perime or not self.isVisible():
+            return
+        self._perime = False
+        if self._groupes_perimes:
+            self._groupes_perimes = False
+            self.load_groupes_filter()
+            self.refresh_stats()
+        elif self.filtre_periode == "all" and self.filtre_groupe is None and self.granularite == "month" \
+                and self.stats_data and not self.stats_incr.perime:
+            # Vue non filtrée et mensuelle: les agrégats incrémentaux suffisent, pas de recalcul complet
+            self.appliquer_resume_incremental()
+        else:
+            self.refresh_stats()
+    
+    def appliquer_resume_incremental(self):
+        """Met à jour cartes, catégories, groupes et évolution mensuelle depuis stats_incr.
+        
+        Classements, tendance et distribution restent ceux du dernier calcul
+        complet (bouton Actualiser, changement de filtre).
+        """
+        # Plus récent que le résultat d'un worker encore en cours
+        self._generation += 1
+        resume = self.stats_incr.resume()
+        data = dict(self.stats_data)
+        for cle in ('total_membres', 'total_groupes', 'presence_moyenne'):
+            data[cle] = resume[cle]
+        for cle in ('ecoles_data', 'filieres_data', 'residences_data'):
+            # Garder l'ordre des catégories déjà affichées, nouvelles catégories à la fin
+            ancien, nouveau = data.get(cle, {}), resume[cle]
+            data[cle] = {**{k: nouveau[k] for k in ancien if k in nouveau}, **nouveau}
+        data['evolution_data'] = self.stats_incr.evolution()
+        data['total_evenements'] = self.evenements_mgr.compter_evenements()
+        data['evenements_futurs'] = self.evenements_mgr.compter_evenements(futurs_seulement=True)
+        groupes_data = []
+        for group_id, (nom, couleur) in self._groupes_info.items():
+            g = resume['groupes'].get(group_id)
+            if g and g['taille']:
+                groupes_data.append({'nom': nom[:20], 'assiduite': g['assiduite'],
+                                     'couleur': couleur, 'taille': g['taille']})
+        data['groupes_data'] = groupes_data
+        self.stats_data = data
+        self.progress_bar.setVisible(False)
+        self.update_label.setText(f"Mise à jour: {datetime.now().strftime('%H:%M:%S')}")
+        self.update_stat_cards()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._perime:
+            self.maj_timer.start()
     
     def on_filtre_changed(self):
         periode_index = self.periode_combo.currentIndex()
         self.filtre_periode = ["all", "month", "quarter", "year"][periode_index]
         self.filtre_groupe = self.groupe_combo.currentData()
+        self.granularite = ["month", "week", "day"][self.granularite_combo.currentIndex()]
+        self.refresh_stats()
+    
+    def actualiser(self):
+        """Bouton Actualiser: recalcul complet, sans le cache"""
+        self.cache_resultats.vider()
         self.refresh_stats()
     
     def refresh_stats(self):
-        # Arrêter le worker précédent
-        if self.worker and self.worker.isRunning():
-            self.worker.wait()
+        # Un worker encore en cours ne doit plus écraser l'affichage
+        self._generation += 1
+        cle = (self.filtre_periode, self.filtre_groupe, self.granularite)
+        results = self.cache_resultats.lire(cle, self.cache_resultats.version())
+        if results is not None:
+            self.on_stats_ready(results)
+            return
+        
+        # Sans attendre le worker précédent: son résultat sera ignoré à l'arrivée
+        if self.worker is not None and self.worker.isRunning():
+            self._workers_anciens.append(self.worker)
+        self._workers_anciens = [w for w in self._workers_anciens if w.isRunning()]
         
         # Lancer le worker
         self.progress_bar.setVisible(True)
         self.worker = StatisticsWorker(
             self.membres_mgr, self.evenements_mgr, 
             self.groupes_mgr, self.presences_mgr,
-            self.filtre_periode, self.filtre_groupe
+            self.filtre_periode, self.filtre_groupe, self.granularite, self.stats_incr,
+            self.cache_resultats
         )
+        self.worker.generation = self._generation
         self.worker.progress.connect(self.on_progress)
-        self.worker.finished.connect(self.on_stats_ready)
+        self.worker.finished.connect(self.on_worker_termine)
         self.worker.start()
     
     def on_progress(self, message):
-        self.update_label.setText(message)
+        if self.sender().generation == self._generation:
+            self.update_label.setText(message)
+    
+    def on_worker_termine(self, results):
+        worker = self.sender()
+        # Demande plus récente entre-temps (filtre changé, données modifiées): le résultat reste en cache
+        if worker.generation != self._generation:
+            return
+        self.on_stats_ready(results)
     
     def on_stats_ready(self, results):
         self.stats_data = results
         self.progress_bar.setVisible(False)
         self.update_label.setText(f"Mise à jour: {datetime.now().strftime('%H:%M:%S')}")
+        cache = self.cache_resultats.statistiques()
+        self.update_label.setToolTip(
+            f"Cache des résultats: {cache['hits']} sur {cache['hits'] + cache['misses']} "
+            f"({cache['taux_succes']:.0%}), {cache['taille']}/{cache['taille_max']} entrées"
+        )
         self.update_stat_cards()
+        if self.precalcul is None:
+            self.lancer_precalcul()
+    
+    def lancer_precalcul(self):
+        """Après le premier chargement: toutes les périodes, sans filtre et pour le groupe affiché"""
+        groupes = [None] if self.filtre_groupe is None else [None, self.filtre_groupe]
+        combinaisons = [
+            (periode, groupe, self.granularite)
+            for groupe in groupes for periode in ("all", "month", "quarter", "year")
+        ]
+        self.precalcul = PrecalculWorker(
+            self.membres_mgr, self.evenements_mgr, self.groupes_mgr,
+            self.cache_resultats, combinaisons
+        )
+        self.precalcul.start()
     
     def update_stat_cards(self):
         for card in self.stat_cards:
@@ -0,0 +1,64 @@
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+# Modules à la racine du dépôt (pas de paquet installable)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def ouvrir_base(tmp_path):
+    """Fabrique de DBManager dans tmp_path, fermés en fin de test"""
+    ouvertes = []
+
+    def ouvrir(nom: str = "perspectivo.db") -> db.DBManager:
+        chemin = tmp_path / nom
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        base = db.DBManager(chemin)
+        ouvertes.append(base)
+        return base
+
+    yield ouvrir
+    for base in ouvertes:
+        base.fermer()
+
+
+def remplir(base: db.DBManager, nb_membres: int = 300, graine: int = 1):
+    """Jeu de données reproductible: membres, groupes, événements et appels"""
+    alea = random.Random(graine)
+    membres = db.MembresManager(base)
+    groupes = db.GroupesManager(base)
+    evenements = db.EvenementsManager(base)
+    presences = db.PresencesManager(base)
+    debut = date.today() - timedelta(days=3 * 365)
+    lignes = []
+    for i in range(nb_membres):
+        jour = debut + timedelta(days=alea.randint(0, 3 * 365))
+        lignes.append({
+            'nom': alea.choice(["Kouassi", "Yao", "Koné", "Traoré", "Bamba"]),
+            'prenoms': alea.choice(["Ama", "Koffi", "Awa", ""]),
+            'ecole': alea.choice(["ENS", "INP", "UFHB", ""]),
+            'filiere': alea.choice(["Math", "Info", "Droit", ""]),
+            'residence': alea.choice(["Cocody", "Yopougon", ""]),
+            # Quelques dates au format français ou illisibles
+            'date_inscription': jour.strftime("%d/%m/%Y") if i % 13 == 0 else
+                                ("n/a" if i % 31 == 0 else jour.isoformat()),
+        })
+    membres.ajouter_membres_bulk(lignes)
+    ids = list(range(1, nb_membres + 1))
+    ids_groupes = [groupes.ajouter_groupe(f"Groupe {k}") for k in range(4)]
+    for g in ids_groupes:
+        groupes.ajouter_membres_au_groupe_bulk(g, alea.sample(ids, nb_membres // 4))
+    for k in range(12):
+        jour = date.today() - timedelta(days=alea.randint(0, 2 * 365))
+        e = evenements.ajouter_evenement(f"Réunion {k}", jour.isoformat(), "18:00",
+                                         groupe_id=alea.choice(ids_groupes + [None]))
+        presences.enregistrer_presences_bulk(
+            [(m, alea.random() < 0.6) for m in alea.sample(ids, nb_membres // 2)], e, jour.isoformat()
+        )
+    return base
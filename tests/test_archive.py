@@ -0,0 +1,100 @@
+import sqlite3
+
+import pytest
+
+import db
+from db_archive import ServiceArchive, annee_academique
+
+
+@pytest.fixture
+def base(ouvrir_base):
+    base = ouvrir_base()
+    m = db.MembresManager(base).ajouter_membre("Kouassi", "Ama")
+    presences = db.PresencesManager(base)
+    for jour, present in (("2022-10-01", True), ("2023-03-01", False), ("2023-10-01", True), ("2024-10-01", True)):
+        presences.enregistrer_presence(m, None, present, jour)
+    db.MessagesManager(base).enregistrer_message("admin", "tous", "Rentrée")
+    with base.transaction():
+        base.cursor().execute("UPDATE messages SET sent_at = '2022-09-15 08:00:00'")
+    return base
+
+
+def _compter(base, table):
+    cur = base.lecture(tuples=True)
+    cur.execute(f"SELECT COUNT(*) FROM {table}")
+    return cur.fetchone()[0]
+
+
+def test_annee_academique():
+    from datetime import date
+    assert annee_academique(date(2023, 8, 31)) == 2022
+    assert annee_academique(date(2023, 9, 1)) == 2023
+
+
+def test_archivage_et_historique(base):
+    service = ServiceArchive(base)
+    assert service.archiver(2024) == {'presences': 3, 'messages': 1}
+    assert _compter(base, "presences") == 1
+    assert _compter(base, "messages") == 0
+
+    # Taux courant sur la saison en cours, historique complet sur demande
+    assert db.MembresManager(base).calculer_taux_presence(1) == 100.0
+    assert service.taux_presence_historique(1) == 75.0
+    assert [l['annee'] for l in service.resume_membre(1)] == [2022, 2023, None]
+    assert [p['date'] for p in service.obtenir_presences_membre(1)] == \
+        ["2024-10-01", "2023-10-01", "2023-03-01", "2022-10-01"]
+    assert [m['content'] for m in service.obtenir_messages()] == ["Rentrée"]
+
+    # Relancer ne déplace rien de plus
+    assert service.archiver(2024) == {'presences': 0, 'messages': 0}
+    assert service.taux_presence_historique(1) == 75.0
+
+
+def test_archivage_interrompu_apres_copie(base, monkeypatch):
+    service = ServiceArchive(base)
+
+    def interrompre(cur, jour, limite):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(service, "_supprimer", interrompre)
+    with pytest.raises(KeyboardInterrupt):
+        service.archiver(2024)
+    monkeypatch.undo()
+    # Copie validée dans l'archive, rien de supprimé de la base courante
+    assert _compter(base, "presences") == 4
+    archive = sqlite3.connect(service.chemin)
+    assert archive.execute("SELECT COUNT(*) FROM presences").fetchone()[0] == 3
+    archive.close()
+
+    assert service.archiver(2024) == {'presences': 3, 'messages': 1}
+    assert service.taux_presence_historique(1) == 75.0
+
+
+def test_archivage_refuse_si_copie_differente(base):
+    service = ServiceArchive(base)
+    service.archiver(2023)
+    # Ligne de l'archive qui ne correspond pas à celle de la base courante
+    archive = sqlite3.connect(service.chemin)
+    archive.execute("INSERT INTO presences (id, member_id, date, present) VALUES (3, 99, '2020-01-01', 0)")
+    archive.commit()
+    archive.close()
+    with pytest.raises(sqlite3.IntegrityError):
+        service.archiver(2024)
+    assert _compter(base, "presences") == 2
+
+
+def test_archivage_dates_francaises(ouvrir_base):
+    base = ouvrir_base()
+    m = db.MembresManager(base).ajouter_membre("Yao", "Koffi")
+    presences = db.PresencesManager(base)
+    for jour, present in (("15/03/2023", True), ("2023-08-31", False), ("15/10/2024", True),
+                          ("2024-09-01", True), ("n/a", True)):
+        presences.enregistrer_presence(m, None, present, jour)
+    service = ServiceArchive(base)
+    assert service.archiver(2024)['presences'] == 2
+    cur = base.lecture(tuples=True)
+    cur.execute("SELECT date FROM presences ORDER BY id")
+    # Saison en cours et date illisible restent dans la base courante
+    assert [r[0] for r in cur.fetchall()] == ["15/10/2024", "2024-09-01", "n/a"]
+    assert [(l['annee'], l['present_count'], l['total_count']) for l in service.resume_membre(m)] == \
+        [(2022, 1, 2), (None, 3, 3)]
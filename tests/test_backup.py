@@ -0,0 +1,83 @@
+import db
+from changements import SUPPRESSION
+from db_backup import ServiceSauvegarde
+from stats_incremental import StatsIncrementales
+
+
+def _noms(base):
+    return [m['nom'] for m in db.MembresManager(base).obtenir_tous_membres()]
+
+
+def test_sauvegarde_puis_restauration(ouvrir_base, tmp_path):
+    base = ouvrir_base()
+    membres = db.MembresManager(base)
+    premier = membres.ajouter_membre("Kouassi", "Ama")
+    membres.ajouter_membre("Yao", "Koffi")
+    db.PresencesManager(base).enregistrer_presence(premier, None, True, "2024-10-01")
+    service = ServiceSauvegarde(base, tmp_path / "sauvegardes")
+
+    pages = []
+    sauvegarde = service.sauvegarder(progression=lambda restant, total: pages.append(total))
+    assert sauvegarde is not None and service.verifier(sauvegarde)
+    assert pages and service.lister() == [sauvegarde]
+
+    membres.supprimer_membre(premier)
+    membres.ajouter_membre("Koné", "Awa")
+    assert _noms(base) == ["Koné", "Yao"]
+
+    recus = []
+    base.bus.abonner(recus.append)
+    assert service.restaurer(sauvegarde)
+    assert _noms(base) == ["Kouassi", "Yao"]
+    assert membres.calculer_taux_presence(premier) == 100.0
+    # Les vues sont prévenues: le membre ajouté après la sauvegarde a disparu
+    assert any(c.table == "members" and c.operation == SUPPRESSION for c in recus)
+    # L'état d'avant la restauration a été sauvegardé
+    assert len(service.lister()) == 2
+
+    # La base restaurée reste utilisable normalement
+    membres.ajouter_membre("Bamba", "Jean")
+    assert _noms(base) == ["Bamba", "Kouassi", "Yao"]
+
+
+def test_restauration_statistiques_incrementales(ouvrir_base, tmp_path):
+    base = ouvrir_base()
+    membres, groupes = db.MembresManager(base), db.GroupesManager(base)
+    a, b = membres.ajouter_membre("Kouassi", "Ama"), membres.ajouter_membre("Yao", "Koffi")
+    g = groupes.ajouter_groupe("Chorale")
+    groupes.ajouter_membre_au_groupe(g, a)
+    db.PresencesManager(base).enregistrer_presence(a, None, True, "2024-10-01")
+    service = ServiceSauvegarde(base, tmp_path / "sauvegardes")
+    sauvegarde = service.sauvegarder()
+
+    incrementales = StatsIncrementales(base)
+    incrementales.resume()
+    groupes.retirer_membre_du_groupe(g, a)
+    groupes.ajouter_membre_au_groupe(g, b)
+    db.PresencesManager(base).enregistrer_presence(b, None, False, "2024-10-02")
+    assert service.restaurer(sauvegarde)
+    # Appartenances et présences restaurées prises en compte sans recalcul complet
+    assert not incrementales.perime
+    neuves = StatsIncrementales(base)
+    assert incrementales.resume() == neuves.resume()
+    assert incrementales.resume()['groupes'][g]['present'] == 1
+    neuves.fermer()
+    incrementales.fermer()
+
+
+def test_restauration_refusee_si_fichier_illisible(ouvrir_base, tmp_path):
+    base = ouvrir_base()
+    db.MembresManager(base).ajouter_membre("Kouassi", "Ama")
+    corrompu = tmp_path / "corrompu.db"
+    corrompu.write_bytes(b"pas une base sqlite" * 100)
+    service = ServiceSauvegarde(base, tmp_path / "sauvegardes")
+    assert not service.verifier(corrompu)
+    assert not service.restaurer(corrompu)
+    assert _noms(base) == ["Kouassi"]
+
+
+def test_rotation(ouvrir_base, tmp_path):
+    base = ouvrir_base()
+    service = ServiceSauvegarde(base, tmp_path / "sauvegardes", conserver=2)
+    chemins = [service.sauvegarder() for _ in range(4)]
+    assert service.lister() == chemins[:1:-1]
@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def base(ouvrir_base):
+    base = ouvrir_base()
+    membres = db.MembresManager(base)
+    a, b = membres.ajouter_membre("Kouassi", "Ama"), membres.ajouter_membre("Yao", "Koffi")
+    presences = db.PresencesManager(base)
+    presences.enregistrer_presence(a, None, True, "2024-10-01")
+    presences.enregistrer_presence(b, None, False, "2024-10-01")
+    return base
+
+
+def test_ecriture_sur_un_autre_membre(base):
+    membres = db.MembresManager(base)
+    assert membres.calculer_taux_presence(1) == 100.0
+    membres.modifier_membre(2, nom="YAO")
+    db.PresencesManager(base).enregistrer_presence(2, None, True, "2024-10-02")
+    assert membres.calculer_taux_presence(1) == 100.0
+    assert base.cache_taux.statistiques()['hits'] == 1
+
+
+def test_ecriture_sur_le_membre(base):
+    membres = db.MembresManager(base)
+    assert membres.calculer_taux_presence(2) == 0.0
+    db.PresencesManager(base).enregistrer_presence(2, None, True, "2024-10-02")
+    assert membres.calculer_taux_presence(2) == 50.0
+
+
+def test_ecriture_d_un_autre_processus(base):
+    membres = db.MembresManager(base)
+    assert membres.calculer_taux_presence(1) == 100.0
+    autre = sqlite3.connect(str(base.db_path))
+    autre.execute("UPDATE member_attendance_summary SET present_count = 0 WHERE member_id = 1")
+    autre.commit()
+    autre.close()
+    assert membres.calculer_taux_presence(1) == 0.0
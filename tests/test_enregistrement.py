@@ -0,0 +1,44 @@
+import pytest
+
+import db
+
+
+@pytest.fixture
+def base(ouvrir_base):
+    base = ouvrir_base()
+    db.MembresManager(base).ajouter_membre("Kouassi", "Ama", ecole="ENS")
+    return base
+
+
+def test_acces_dict_et_attribut(base):
+    membre = db.MembresManager(base).obtenir_tous_membres()[0]
+    assert isinstance(membre, db.Member)
+    assert membre['nom'] == membre.nom == "Kouassi"
+    assert membre.get('ecole') == "ENS"
+    assert membre.get('inconnue', "-") == "-"
+    assert 'prenoms' in membre and 'inconnue' not in membre
+    assert list(membre) == membre.keys() == list(db.Member.COLONNES)
+    with pytest.raises(KeyError):
+        membre['inconnue']
+    membre['filiere'] = "Math"
+    assert membre.filiere == "Math"
+
+
+def test_en_dict(base):
+    membre = db.MembresManager(base).obtenir_tous_membres()[0]
+    d = membre.en_dict()
+    assert type(d) is dict
+    assert list(d) == list(db.Member.COLONNES)
+    assert d['nom'] == "Kouassi" and d['inscription_jour'] == membre.inscription_jour
+    assert db.Member(**d) == membre
+
+
+def test_lecture_tuples(base):
+    membres = db.MembresManager(base)
+    lignes = list(membres.iter_membres(tuples=True))
+    assert type(lignes[0]) is tuple
+    assert lignes[0] == membres.obtenir_tous_membres()[0].en_tuple()
+
+    cur = base.lecture(tuples=True)
+    cur.execute("SELECT id, nom FROM members")
+    assert type(cur.fetchone()) is tuple
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+pytest.importorskip("bcrypt")
+pytest.importorskip("PySide6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication, QMessageBox  # noqa: E402
+
+import login  # noqa: E402
+
+
+@pytest.fixture
+def pages(ouvrir_base, monkeypatch):
+    application = QApplication.instance() or QApplication([])
+    base = ouvrir_base()
+    monkeypatch.setattr(login, "obtenir_gestionnaire_db", lambda: (base,))
+    messages = []
+    for nom in ("information", "warning", "critical"):
+        monkeypatch.setattr(QMessageBox, nom, lambda *args, _nom=nom: messages.append((_nom, args[2])))
+    yield login.SignupPage(), login.LoginPage(), messages
+    application.processEvents()
+
+
+def test_inscription_puis_connexion(pages):
+    inscription, connexion, messages = pages
+    inscription.invitation_code.setText(login.VALID_INVITATION_CODES[0])
+    inscription.first_name.setText("Ama")
+    inscription.last_name.setText("Kouassi")
+    inscription.username.setText("ama@example.org")
+    inscription.password.setText("secret123")
+    inscription.confirm.setText("secret123")
+    inscription.terms.setChecked(True)
+    inscrits = []
+    inscription.signup_successful.connect(inscrits.append)
+    inscription.signup()
+    assert inscrits == ["ama@example.org"], messages
+
+    connectes = []
+    connexion.login_successful.connect(connectes.append)
+    connexion.email_input.setText("ama@example.org")
+    connexion.password_input.setText("mauvais")
+    connexion.login()
+    assert connectes == [] and messages[-1][0] == "warning"
+    connexion.password_input.setText("secret123")
+    connexion.login()
+    assert connectes == ["ama@example.org"], messages
@@ -0,0 +1,122 @@
+import sqlite3
+
+import pytest
+
+import db
+
+# Schéma des bases créées avant les migrations (user_version = 0)
+SCHEMA_INITIAL = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, nom TEXT, prenoms TEXT, email TEXT UNIQUE,
+    password_hash TEXT, failed_attempts INTEGER DEFAULT 0, locked_until INTEGER DEFAULT 0,
+    remember_token_hash TEXT
+);
+CREATE TABLE members (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, nom TEXT NOT NULL, prenoms TEXT, contact TEXT,
+    email TEXT, residence TEXT, ecole TEXT, filiere TEXT,
+    date_inscription TEXT DEFAULT CURRENT_TIMESTAMP, created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE groups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, nom TEXT NOT NULL UNIQUE, description TEXT,
+    couleur TEXT, created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE group_members (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, group_id INTEGER NOT NULL, member_id INTEGER NOT NULL,
+    added_at TEXT DEFAULT CURRENT_TIMESTAMP, UNIQUE(group_id, member_id),
+    FOREIGN KEY(group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    FOREIGN KEY(member_id) REFERENCES members(id) ON DELETE CASCADE
+);
+CREATE TABLE events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, nom TEXT NOT NULL, date TEXT NOT NULL, heure TEXT,
+    lieu TEXT, description TEXT, groupe_id INTEGER, created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(groupe_id) REFERENCES groups(id) ON DELETE SET NULL
+);
+CREATE TABLE presences (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, member_id INTEGER NOT NULL, event_id INTEGER,
+    date TEXT NOT NULL, present INTEGER DEFAULT 0, created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(member_id) REFERENCES members(id) ON DELETE CASCADE,
+    FOREIGN KEY(event_id) REFERENCES events(id) ON DELETE SET NULL
+);
+CREATE TABLE messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, sender TEXT, recipient TEXT, groupe_id INTEGER,
+    content TEXT, sent_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO members (nom, prenoms, ecole, date_inscription) VALUES
+    ('Kouassi', 'Ama', 'ENS', '2023-09-15 10:00:00'),
+    ('Yao', NULL, 'INP', '01/10/2023'),
+    ('Koné', 'Awa', '', 'inconnue');
+INSERT INTO groups (nom) VALUES ('Chorale');
+INSERT INTO group_members (group_id, member_id) VALUES (1, 1), (1, 2);
+INSERT INTO events (nom, date, heure, groupe_id) VALUES
+    ('Répétition', '2023-10-05', '18:30', 1), ('Sortie', '12/11/2023', '9h00', NULL);
+INSERT INTO presences (member_id, event_id, date, present) VALUES
+    (1, 1, '2023-10-05', 1), (2, 1, '2023-10-05', 0), (1, 2, '2023-11-12', 1), (3, 2, '2023-11-12', 0);
+INSERT INTO messages (sender, recipient, content) VALUES ('admin', 'tous', 'Bienvenue');
+"""
+
+
+def _base_initiale(chemin, jusqu_a: int = 0):
+    """Base au schéma d'origine, migrée jusqu'à la version jusqu_a"""
+    conn = sqlite3.connect(chemin)
+    conn.executescript(SCHEMA_INITIAL)
+    conn.create_function("jour_depuis_texte", 1, db.jour_depuis_texte, deterministic=True)
+    for numero, migration in enumerate(db.MIGRATIONS[:jusqu_a], start=1):
+        migration(conn.cursor())
+        conn.execute(f"PRAGMA user_version = {numero}")
+        conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize("depart", range(len(db.MIGRATIONS)))
+def test_migrations_depuis_chaque_version(tmp_path, depart):
+    chemin = tmp_path / "ancienne.db"
+    _base_initiale(chemin, depart)
+    base = db.DBManager(chemin)
+    try:
+        assert base.version_schema() == len(db.MIGRATIONS)
+        cur = base.lecture(tuples=True)
+
+        # Données conservées, colonnes dérivées remplies
+        cur.execute("SELECT nom, prenoms, date_inscription, inscription_jour FROM members ORDER BY id")
+        membres = cur.fetchall()
+        assert [m[0] for m in membres] == ["Kouassi", "Yao", "Koné"]
+        assert membres[1][1] == ""
+        for _nom, _prenoms, texte, jour in membres:
+            assert jour == db.jour_depuis_texte(texte)
+        cur.execute("SELECT date, heure, date_jour, heure_minutes FROM events ORDER BY id")
+        for texte, heure, jour, minutes in cur.fetchall():
+            assert jour == db.jour_depuis_texte(texte)
+            assert minutes == db.minutes_depuis_heure(heure)
+
+        # Résumés de présence reconstruits depuis les présences
+        cur.execute("SELECT member_id, present_count, total_count FROM member_attendance_summary ORDER BY member_id")
+        assert cur.fetchall() == [(1, 2, 2), (2, 0, 1), (3, 0, 1)]
+        cur.execute("SELECT event_id, present_count, total_count FROM event_attendance_summary ORDER BY event_id")
+        assert cur.fetchall() == [(1, 1, 2), (2, 1, 2)]
+
+        # Synchronisation: uuid partout, lignes existantes dans le journal
+        for table in db.TABLES_SYNC:
+            cur.execute(f"SELECT COUNT(*) FROM {table} WHERE uuid IS NULL")
+            assert cur.fetchone()[0] == 0
+        cur.execute("SELECT COUNT(*) FROM change_log WHERE table_name = 'group_members'")
+        assert cur.fetchone()[0] == 2
+
+        membres_mgr = db.MembresManager(base)
+        if base.fts_disponible:
+            assert [m['nom'] for m in membres_mgr.rechercher_membres("kouas")] == ["Kouassi"]
+        assert membres_mgr.calculer_taux_presence(1) == 100.0
+
+        # Les triggers posés par les migrations suivent les écritures
+        db.PresencesManager(base).enregistrer_presence(2, 1, True, "2023-10-06")
+        membres_mgr.supprimer_membre(3)
+        cur.execute("SELECT present_count, total_count FROM member_attendance_summary WHERE member_id = 2")
+        assert cur.fetchone() == (1, 2)
+        cur.execute("SELECT member_id FROM member_departures")
+        assert cur.fetchall() == [(3,)]
+    finally:
+        base.fermer()
+
+    # Réouverture: rien à migrer
+    base = db.DBManager(chemin)
+    assert base.version_schema() == len(db.MIGRATIONS)
+    base.fermer()
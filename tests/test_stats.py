@@ -0,0 +1,135 @@
+import pytest
+
+import db
+import stats_engine
+from conftest import remplir
+from stats_engine import CacheResultats, StatsEngine
+from stats_incremental import StatsIncrementales
+
+pytestmark = pytest.mark.skipif(stats_engine.stats_numpy is None, reason="NumPy absent")
+
+
+@pytest.fixture
+def base(ouvrir_base):
+    return remplir(ouvrir_base())
+
+
+def _moteur(base, moteur):
+    return StatsEngine(db.MembresManager(base), db.EvenementsManager(base), db.GroupesManager(base), moteur=moteur)
+
+
+@pytest.mark.parametrize("periode", ["all", "month", "quarter", "year"])
+@pytest.mark.parametrize("groupe", [None, 2])
+def test_moteurs_sql_et_numpy_identiques(base, periode, groupe):
+    sql = _moteur(base, "sql").calculer(periode, groupe)
+    numpy = _moteur(base, "numpy").calculer(periode, groupe)
+    assert sql.keys() == numpy.keys()
+    for cle in sql:
+        assert sql[cle] == numpy[cle], cle
+
+
+def test_evolution_granularites(base):
+    moteur = _moteur(base, "sql")
+    total = db.MembresManager(base).db.lecture(tuples=True).execute(
+        "SELECT COUNT(*) FROM members WHERE inscription_jour IS NOT NULL").fetchone()[0]
+    for granularite in stats_engine.GRANULARITES:
+        serie = moteur.evolution(granularite)
+        assert serie['values'][-1] == total
+        assert sum(serie['inscriptions']) - sum(serie['departs']) == total
+
+
+def _comparer(incrementales, base):
+    neuves = StatsIncrementales(base)
+    try:
+        assert incrementales.resume() == neuves.resume()
+        assert incrementales.evolution() == _moteur(base, "sql").evolution("month")
+    finally:
+        neuves.fermer()
+
+
+def test_incremental_comme_recalcul_complet(base):
+    membres, groupes = db.MembresManager(base), db.GroupesManager(base)
+    presences = db.PresencesManager(base)
+    incrementales = StatsIncrementales(base)
+    resume = incrementales.resume()
+    moteur = _moteur(base, "sql").calculer()
+    assert resume['total_membres'] == moteur['total_membres']
+    assert resume['presence_moyenne'] == pytest.approx(moteur['presence_moyenne'])
+    assert resume['ecoles_data'] == moteur['ecoles_data']
+
+    m = membres.ajouter_membre("Nouveau", "Membre", ecole="ESATIC")
+    membres.modifier_membre(m, filiere="Info")
+    membres.modifier_membre(8, date_inscription="01/02/2020")
+    groupes.ajouter_membre_au_groupe(1, m)
+    presences.enregistrer_presence(m, 1, True)
+    presences.enregistrer_presences_bulk([(5, False), (6, True)], 2)
+    _comparer(incrementales, base)
+
+    groupes.retirer_membre_du_groupe(1, m)
+    membres.supprimer_membre(m)
+    membres.supprimer_membre(7)
+    groupes.supprimer_groupe(3)
+    g = groupes.ajouter_groupe("Nouveau groupe")
+    groupes.ajouter_membres_au_groupe_bulk(g, [1, 2, 3])
+    _comparer(incrementales, base)
+    assert incrementales.recalculs == 1
+
+    # Import massif: recalcul complet à la lecture suivante
+    incrementales.seuil_recalcul = 10
+    membres.ajouter_membres_bulk([{'nom': f"Import {i}", 'ecole': "ENS"} for i in range(20)])
+    assert incrementales.perime
+    _comparer(incrementales, base)
+    assert incrementales.recalculs == 2
+    incrementales.fermer()
+
+
+def test_incremental_changements_pendant_recalcul(base, monkeypatch):
+    membres = db.MembresManager(base)
+    incrementales = StatsIncrementales(base)
+    charger = incrementales._charger
+
+    def charger_avec_ecriture():
+        agregats = charger()
+        # Écriture validée après l'instantané: mise en file puis rejouée
+        membres.ajouter_membre("Pendant", "Recalcul", ecole="INP")
+        membres.supprimer_membre(4)
+        return agregats
+
+    monkeypatch.setattr(incrementales, "_charger", charger_avec_ecriture)
+    incrementales.recalculer()
+    monkeypatch.undo()
+    assert not incrementales.perime
+    _comparer(incrementales, base)
+    incrementales.fermer()
+
+
+def test_cache_resultats(base):
+    cache = CacheResultats(base, taille_max=2)
+    moteur = _moteur(base, "sql")
+    cle = ("all", None, "month")
+    version, generation = cache.version(), cache.generation
+    assert cache.lire(cle, version) is None
+    resultat = moteur.calculer(*cle)
+    cache.ecrire(cle, resultat, version, generation)
+    assert cache.lire(cle, cache.version()) is resultat
+
+    # Les messages n'entrent dans aucune statistique: cache conservé
+    db.MessagesManager(base).enregistrer_message("admin", "tous", "Réunion demain")
+    assert cache.lire(cle, cache.version()) is resultat
+
+    # Écriture de l'application: cache vidé par le bus
+    db.MembresManager(base).ajouter_membre("Autre")
+    assert cache.lire(cle, cache.version()) is None
+
+    # Résultat calculé pendant une écriture: pas mis en cache
+    generation = cache.generation
+    db.MembresManager(base).ajouter_membre("Encore")
+    cache.ecrire(cle, resultat, cache.version(), generation)
+    assert cache.lire(cle, cache.version()) is None
+
+    for periode in ("all", "month", "year"):
+        cache.ecrire((periode, None, "month"), resultat, cache.version(), cache.generation)
+    statistiques = cache.statistiques()
+    assert statistiques['taille'] == 2
+    assert statistiques['hits'] == 2 and statistiques['misses'] == 3
+    cache.fermer()
@@ -0,0 +1,124 @@
+import threading
+import urllib.error
+
+import pytest
+
+import db
+from changements import SUPPRESSION
+from db_archive import ServiceArchive
+from db_sync import MoteurSync, ServeurSync, TransportDossier, TransportHTTP
+from stats_incremental import StatsIncrementales
+
+
+def _presences(base):
+    cur = base.lecture(tuples=True)
+    cur.execute("SELECT uuid, date, present FROM presences ORDER BY uuid")
+    return cur.fetchall()
+
+
+def _postes(ouvrir_base, tmp_path):
+    a, b = ouvrir_base("a/perspectivo.db"), ouvrir_base("b/perspectivo.db")
+    transport = TransportDossier(tmp_path / "partage")
+    return a, b, MoteurSync(a, transport), MoteurSync(b, transport)
+
+
+def test_synchronisation_aller_retour(ouvrir_base, tmp_path):
+    a, b, sync_a, sync_b = _postes(ouvrir_base, tmp_path)
+    membres, groupes = db.MembresManager(a), db.GroupesManager(a)
+    g = groupes.ajouter_groupe("Chorale")
+    m = membres.ajouter_membre("Kouassi", "Ama")
+    groupes.ajouter_membre_au_groupe(g, m)
+    e = db.EvenementsManager(a).ajouter_evenement("Répétition", "2024-10-10", "18:00", groupe_id=g)
+    db.PresencesManager(a).enregistrer_presence(m, e, True, "2024-10-10")
+
+    sync_a.synchroniser()
+    sync_b.synchroniser()
+
+    assert [x['nom'] for x in db.MembresManager(b).obtenir_tous_membres()] == ["Kouassi"]
+    assert _presences(b) == _presences(a)
+
+    # Suppression sur B, propagée à A
+    id_b = db.MembresManager(b).obtenir_tous_membres()[0]['id']
+    db.MembresManager(b).supprimer_membre(id_b)
+    sync_b.synchroniser()
+    sync_a.synchroniser()
+    assert membres.obtenir_tous_membres() == []
+
+
+def test_archivage_non_synchronise(ouvrir_base, tmp_path):
+    a, b, sync_a, sync_b = _postes(ouvrir_base, tmp_path)
+    m = db.MembresManager(a).ajouter_membre("Kouassi", "Ama")
+    presences = db.PresencesManager(a)
+    for jour in ("2022-10-01", "2023-10-01", "2024-10-01"):
+        presences.enregistrer_presence(m, None, True, jour)
+    sync_a.synchroniser()
+    sync_b.synchroniser()
+    assert len(_presences(b)) == 3
+
+    # A archive les années passées: ce n'est pas une suppression pour B
+    assert ServiceArchive(a).archiver(2024)['presences'] == 2
+    cur = a.lecture(tuples=True)
+    cur.execute("SELECT COUNT(*) FROM change_log WHERE operation = 'delete'")
+    assert cur.fetchone()[0] == 0
+
+    sync_a.synchroniser()
+    sync_b.synchroniser()
+    assert len(_presences(a)) == 1
+    assert len(_presences(b)) == 3
+
+    # Une vraie suppression reste journalisée
+    with a.transaction():
+        a.cursor().execute("DELETE FROM presences")
+    sync_a.synchroniser()
+    sync_b.synchroniser()
+    assert len(_presences(b)) == 2
+
+
+def test_suppression_distante_de_presence(ouvrir_base, tmp_path):
+    a, b, sync_a, sync_b = _postes(ouvrir_base, tmp_path)
+    m = db.MembresManager(a).ajouter_membre("Kouassi", "Ama")
+    for jour, present in (("2024-10-01", True), ("2024-10-02", False)):
+        db.PresencesManager(a).enregistrer_presence(m, None, present, jour)
+    sync_a.synchroniser()
+    sync_b.synchroniser()
+    membres_b = db.MembresManager(b)
+    id_b = membres_b.obtenir_tous_membres()[0]['id']
+    incrementales = StatsIncrementales(b)
+    assert membres_b.calculer_taux_presence(id_b) == 50.0
+    assert incrementales.resume()['presences_total'] == 2
+
+    recus = []
+    b.bus.abonner(recus.append)
+    with a.transaction():
+        a.cursor().execute("DELETE FROM presences WHERE present = 0")
+    sync_a.synchroniser()
+    sync_b.synchroniser()
+    assert [(c.table, c.operation, c.ids) for c in recus] == [("presences", SUPPRESSION, (id_b,))]
+    assert membres_b.calculer_taux_presence(id_b) == 100.0
+    assert incrementales.resume()['presences_total'] == 1
+    incrementales.fermer()
+
+
+def test_serveur_http_secret(ouvrir_base, tmp_path):
+    serveur = ServeurSync(tmp_path / "serveur", "secret-partagé", port=0)
+    assert serveur.server_address[0] == "127.0.0.1"
+    thread = threading.Thread(target=serveur.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{serveur.server_address[1]}"
+        a, b = ouvrir_base("a/perspectivo.db"), ouvrir_base("b/perspectivo.db")
+        db.MembresManager(a).ajouter_membre("Kouassi", "Ama")
+        for transport in (TransportHTTP(url, "mauvais"), TransportHTTP(url, "")):
+            with pytest.raises(urllib.error.HTTPError) as erreur:
+                MoteurSync(a, transport).synchroniser()
+            assert erreur.value.code == 401
+        assert list((tmp_path / "serveur").iterdir()) == []
+
+        MoteurSync(a, TransportHTTP(url, "secret-partagé")).synchroniser()
+        MoteurSync(b, TransportHTTP(url, "secret-partagé")).synchroniser()
+        assert [x['nom'] for x in db.MembresManager(b).obtenir_tous_membres()] == ["Kouassi"]
+    finally:
+        serveur.shutdown()
+        serveur.server_close()
+    with pytest.raises(ValueError):
+        ServeurSync(tmp_path / "serveur", "")